@@ -11,7 +11,7 @@ from python.benchmarks.map import MapGenerator
 import pathlib
 
 from python.benchmarks.parse_map import MapParser
-from python.benchmarks.run_with_timeout import run_with_timeout
+from python.benchmarks.run_with_timeout import run_with_timeout_stats
 from python.mstar.rewrite import Config, MatchingStrategy
 from python.mstar.rewrite.config import GigaByte
 from python.solvers.configurable_mstar_solver import ConfigurableMStar
@@ -50,6 +50,8 @@ def run(config: Config, bm_name: str):
     parser = MapParser(batchdir)
 
     fname = batchdir / f"results_{bm_name}.txt"
+    # expansions and collision avoidance table counters of every solved problem, see solve_stats
+    stats_fname = batchdir / f"results_{bm_name}_stats.txt"
 
     if fname.exists():
         print(f"data exists for {bm_name}")
@@ -57,6 +59,8 @@ def run(config: Config, bm_name: str):
 
     # num agents : solutions
     results: dict[int, list[Optional[float]]] = {}
+    # num agents : stats
+    stats: dict[int, list[Optional[dict[str, int]]]] = {}
 
     all_problems = [[i[1] for i in parser.parse_batch(n.name)] for n in batchdir.iterdir() if n.is_dir()]
     all_problems.sort(key=lambda i: len(i[0].goals))
@@ -66,13 +70,19 @@ def run(config: Config, bm_name: str):
             num_agents = len(problems[0].goals)
 
             partname = pathlib.Path(str(fname) + f".{num_agents}agents")
+            stats_partname = pathlib.Path(str(stats_fname) + f".{num_agents}agents")
             if partname.exists():
                 print(f"found data for part {num_agents}")
                 results[num_agents] = read_from_file(partname, num_agents)
+                # parts written before the stats were kept have no stats file
+                if stats_partname.exists():
+                    stats[num_agents] = read_from_file(stats_partname, num_agents)
+                else:
+                    stats[num_agents] = [None for i in range(len(problems))]
                 continue
 
             if num_agents <= 1 or sum(1 for i in results[num_agents - 1] if i is not None) != 0:
-                sols_inmatch = run_with_timeout(p, ConfigurableMStar(
+                sols_inmatch, stats[num_agents] = run_with_timeout_stats(p, ConfigurableMStar(
                     config
                 ), problems, 2 * 60)
 
@@ -80,12 +90,15 @@ def run(config: Config, bm_name: str):
                 results[num_agents] = sols_inmatch
             else:
                 results[num_agents] = [None for i in range(len(problems))]
+                stats[num_agents] = [None for i in range(len(problems))]
 
             output_data(partname, results)
+            output_data(stats_partname, stats)
 
     tqdm.write(str(results))
 
     output_data(fname, results)
+    output_data(stats_fname, stats)
 
     return fname, bm_name
 
@@ -172,6 +185,21 @@ def main():
         "operator decomposition"
     ))
 
+    files.append(run(
+        Config(
+            operator_decomposition=True,
+            precompute_paths=False,
+            precompute_heuristic=True,
+            collision_avoidance_table=True,
+            recursive=False,
+            matching_strategy=MatchingStrategy.SortedPruningPrematch,
+            max_memory_usage=3 * GigaByte,
+            debug=False,
+            report_expansions=True,
+        ),
+        "collision avoidance table"
+    ))
+
     graph_results(
         *files,
         batchdir / f"{name}",
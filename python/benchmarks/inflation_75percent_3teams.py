@@ -0,0 +1,128 @@
+from multiprocessing import Pool
+from typing import Optional
+
+from func_timeout import func_timeout, FunctionTimedOut
+from mapfmclient import Problem
+from tqdm import tqdm
+
+from python.benchmarks import extensions_25percent_3teams, extensions_75percent_3teams
+from python.benchmarks.inmatch_vs_prematch_75percent_1teams import output_data
+import pathlib
+
+from python.benchmarks.parse_map import MapParser
+from python.mstar.rewrite import Config, MatchingStrategy, mstar
+from python.mstar.rewrite.config import GigaByte
+from python.mstar.rewrite.path import Path
+
+this_dir = pathlib.Path(__file__).parent.absolute()
+processes = 6
+timeout = 30
+
+inflations = [1, 1.1, 1.25, 1.5, 2, 3]
+map_sets = [extensions_75percent_3teams, extensions_25percent_3teams]
+
+
+def config(inflation: float) -> Config:
+    return Config(
+        operator_decomposition=True,
+        precompute_paths=False,
+        precompute_heuristic=True,
+        collision_avoidance_table=False,
+        recursive=False,
+        matching_strategy=MatchingStrategy.SortedPruningPrematch,
+        max_memory_usage=3 * GigaByte,
+        debug=False,
+        report_expansions=False,
+        inflation=inflation,
+    )
+
+
+def run_problem_cost(args) -> Optional[int]:
+    """
+    Returns the cost of the path found, or None when no path was found in time
+    """
+    cfg, problem = args
+    cfg: Config
+    problem: Problem
+
+    try:
+        path = func_timeout(timeout, mstar, (cfg, problem))
+    except FunctionTimedOut:
+        return None
+    except Exception as e:
+        print(e)
+        return None
+
+    if not isinstance(path, Path):
+        return None
+    return path.cost
+
+
+def run(map_set, inflation: float) -> dict[int, list[Optional[int]]]:
+    batchdir = this_dir / map_set.name
+    parser = MapParser(batchdir)
+
+    fname = batchdir / f"results_inflation_{inflation}.txt"
+
+    # num agents : costs
+    results: dict[int, list[Optional[int]]] = {}
+
+    all_problems = [[i[1] for i in parser.parse_batch(n.name)] for n in batchdir.iterdir() if n.is_dir()]
+    all_problems.sort(key=lambda i: len(i[0].goals))
+
+    with Pool(processes) as p:
+        for problems in tqdm(all_problems):
+            num_agents = len(problems[0].goals)
+
+            results[num_agents] = list(tqdm(
+                p.imap(
+                    run_problem_cost,
+                    [(config(inflation), problem) for problem in problems],
+                ),
+                total=len(problems),
+            ))
+
+            output_data(fname, results)
+
+    return results
+
+
+def success_rate(costs: list[Optional[int]]) -> float:
+    return sum(1 for i in costs if i is not None) / len(costs)
+
+
+def cost_ratio(costs: list[Optional[int]], optimal_costs: list[Optional[int]]) -> Optional[float]:
+    """
+    Mean ratio to the optimal cost, over the problems solved both with and without inflation
+    """
+    ratios = [
+        c / o
+        for c, o in zip(costs, optimal_costs)
+        if c is not None and o is not None and o != 0
+    ]
+    if len(ratios) == 0:
+        return None
+    return sum(ratios) / len(ratios)
+
+
+def main():
+    for map_set in map_sets:
+        map_set.generate_maps()
+
+        results = {
+            inflation: run(map_set, inflation)
+            for inflation in inflations
+        }
+        optimal = results[1]
+
+        print(map_set.name)
+        print("agents  inflation  success rate  cost ratio")
+        for num_agents in sorted(optimal):
+            for inflation in inflations:
+                costs = results[inflation][num_agents]
+                ratio = cost_ratio(costs, optimal[num_agents])
+                print(f"{num_agents:>6}  {inflation:>9}  {success_rate(costs):>12.2f}  {ratio or 0:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
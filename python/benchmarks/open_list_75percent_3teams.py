@@ -0,0 +1,108 @@
+import time
+from multiprocessing import Pool
+from typing import Optional
+
+from func_timeout import func_timeout, FunctionTimedOut
+from mapfmclient import Problem
+from tqdm import tqdm
+
+from python.benchmarks.extensions_75percent_3teams import generate_maps, name
+from python.benchmarks.inmatch_vs_prematch_75percent_1teams import output_data
+import pathlib
+
+from python.benchmarks.parse_map import MapParser
+from python.mstar.rewrite import Config, MatchingStrategy, OpenListStrategy
+from python.mstar.rewrite.config import GigaByte
+from python.solvers.configurable_mstar_solver import ConfigurableMStar
+
+this_dir = pathlib.Path(__file__).parent.absolute()
+processes = 6
+timeout = 30
+
+
+def config(open_list: OpenListStrategy) -> Config:
+    return Config(
+        operator_decomposition=True,
+        precompute_paths=False,
+        precompute_heuristic=True,
+        collision_avoidance_table=False,
+        recursive=False,
+        matching_strategy=MatchingStrategy.SortedPruningPrematch,
+        max_memory_usage=3 * GigaByte,
+        debug=False,
+        report_expansions=True,
+        open_list=open_list,
+    )
+
+
+def run_problem_throughput(args) -> tuple[int, float]:
+    """
+    Returns the number of expansions and the time spent on them. Unlike the other
+    benchmarks, timed out runs still count, as expansions per second is what's measured.
+    """
+    algorithm, problem = args
+    algorithm: ConfigurableMStar
+    problem: Problem
+
+    start = time.time()
+    try:
+        func_timeout(timeout, algorithm.solve, (problem,))
+    except FunctionTimedOut:
+        pass
+    end = time.time()
+
+    return len(algorithm.cfg.expansions), end - start
+
+
+def run(open_list: OpenListStrategy, bm_name: str) -> dict[int, list[tuple[int, float]]]:
+    batchdir = this_dir / name
+    parser = MapParser(batchdir)
+
+    fname = batchdir / f"results_{bm_name}_throughput.txt"
+
+    # num agents : (expansions, seconds) per problem
+    results: dict[int, list[tuple[int, float]]] = {}
+
+    all_problems = [[i[1] for i in parser.parse_batch(n.name)] for n in batchdir.iterdir() if n.is_dir()]
+    all_problems.sort(key=lambda i: len(i[0].goals))
+
+    with Pool(processes) as p:
+        for problems in tqdm(all_problems):
+            num_agents = len(problems[0].goals)
+
+            results[num_agents] = list(tqdm(
+                p.imap(
+                    run_problem_throughput,
+                    [(ConfigurableMStar(config(open_list)), problem) for problem in problems],
+                ),
+                total=len(problems),
+            ))
+
+            output_data(fname, results)
+
+    return results
+
+
+def expansions_per_second(results: list[tuple[int, float]]) -> Optional[float]:
+    total_time = sum(t for _, t in results)
+    if total_time == 0:
+        return None
+    return sum(e for e, _ in results) / total_time
+
+
+def main():
+    generate_maps()
+
+    heap = run(OpenListStrategy.Heap, "heap")
+    buckets = run(OpenListStrategy.Buckets, "buckets")
+
+    print("agents  heap exp/s  buckets exp/s  speedup")
+    for num_agents in sorted(heap):
+        h = expansions_per_second(heap[num_agents])
+        b = expansions_per_second(buckets[num_agents])
+        speedup = b / h if h and b else None
+        print(f"{num_agents:>6}  {h or 0:>10.0f}  {b or 0:>13.0f}  {speedup or 0:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
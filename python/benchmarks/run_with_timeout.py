@@ -53,3 +53,58 @@ def run_with_timeout(
             total=len(problems)
         )
     )
+
+
+def solve_stats(algorithm: MapfAlgorithm) -> dict[str, int]:
+    """
+    Counters of the config the algorithm solved a problem with: the number of expanded
+    and generated states, and the stats of the collision avoidance table if it was used.
+    Only filled in when the config has report_expansions set.
+    """
+    cfg = algorithm.cfg
+    return {
+        "expanded": len(cfg.expansions),
+        "generated": sum(cfg.expansions),
+        **cfg.collision_avoidance_stats,
+    }
+
+
+def run_problem_with_timeout_stats_star(args):
+    return run_problem_with_timeout_stats(*args)
+
+
+def run_problem_with_timeout_stats(
+    algorithm: MapfAlgorithm,
+    problem: Problem,
+    timeout: int = 2 * 60,
+) -> tuple[Optional[float], Optional[dict[str, int]]]:
+    """
+    Like run_problem_with_timeout, but also returns the solve_stats. The algorithm
+    is a copy in the worker process, so its counters are lost unless they're returned.
+    """
+
+    duration = run_problem_with_timeout(algorithm, problem, timeout)
+    if duration is None:
+        return None, None
+
+    return duration, solve_stats(algorithm)
+
+
+def run_with_timeout_stats(
+    p: Pool,
+    algorithm: MapfAlgorithm,
+    problems: list[Problem],
+    timeout: int = 2 * 60,
+) -> tuple[list[Optional[float]], list[Optional[dict[str, int]]]]:
+
+    results = list(
+        tqdm(
+            p.imap(
+                run_problem_with_timeout_stats_star,
+                [(algorithm, problem, timeout) for problem in problems],
+            ),
+            total=len(problems)
+        )
+    )
+
+    return [duration for duration, _ in results], [stats for _, stats in results]
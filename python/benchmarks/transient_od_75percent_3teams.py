@@ -0,0 +1,108 @@
+from multiprocessing import Pool
+from typing import Optional
+
+from func_timeout import func_timeout, FunctionTimedOut
+from mapfmclient import Problem
+from tqdm import tqdm
+
+from python.benchmarks.extensions_75percent_3teams import generate_maps, name
+from python.benchmarks.inmatch_vs_prematch_75percent_1teams import output_data
+import pathlib
+
+from python.benchmarks.parse_map import MapParser
+from python.mstar.rewrite import Config, MatchingStrategy
+from python.mstar.rewrite.config import GigaByte, MegaByte
+from python.mstar.rewrite.memory import STATE_BYTES, AGENT_SLOT_BYTES
+from python.solvers.configurable_mstar_solver import ConfigurableMStar
+
+this_dir = pathlib.Path(__file__).parent.absolute()
+processes = 6
+timeout = 30
+
+
+def config(transient_od_states: bool) -> Config:
+    return Config(
+        operator_decomposition=True,
+        precompute_paths=False,
+        precompute_heuristic=True,
+        collision_avoidance_table=False,
+        recursive=False,
+        matching_strategy=MatchingStrategy.SortedPruningPrematch,
+        max_memory_usage=3 * GigaByte,
+        debug=False,
+        report_expansions=False,
+        transient_od_states=transient_od_states,
+    )
+
+
+def run_problem_states(args) -> Optional[int]:
+    """
+    Returns the number of states in the state cache after solving the problem,
+    or None when it timed out.
+    """
+    algorithm, problem = args
+    algorithm: ConfigurableMStar
+    problem: Problem
+
+    try:
+        func_timeout(timeout, algorithm.solve, (problem,))
+    except FunctionTimedOut:
+        return None
+
+    return algorithm.cfg.state_cache_stats.get("states")
+
+
+def run(transient_od_states: bool, bm_name: str) -> dict[int, list[Optional[int]]]:
+    batchdir = this_dir / name
+    parser = MapParser(batchdir)
+
+    fname = batchdir / f"results_{bm_name}_states.txt"
+
+    # num agents : cached states per problem
+    results: dict[int, list[Optional[int]]] = {}
+
+    all_problems = [[i[1] for i in parser.parse_batch(n.name)] for n in batchdir.iterdir() if n.is_dir()]
+    all_problems.sort(key=lambda i: len(i[0].goals))
+
+    with Pool(processes) as p:
+        for problems in tqdm(all_problems):
+            num_agents = len(problems[0].goals)
+
+            results[num_agents] = list(tqdm(
+                p.imap(
+                    run_problem_states,
+                    [(ConfigurableMStar(config(transient_od_states)), problem) for problem in problems],
+                ),
+                total=len(problems),
+            ))
+
+            output_data(fname, results)
+
+    return results
+
+
+def main():
+    generate_maps()
+
+    cached = run(False, "od cached")
+    transient = run(True, "od transient")
+
+    print("agents  cached states  transient states  estimated MB saved")
+    for num_agents in sorted(cached):
+        # only compare problems solved in both modes
+        pairs = [
+            (c, t)
+            for c, t in zip(cached[num_agents], transient[num_agents])
+            if c is not None and t is not None
+        ]
+        if len(pairs) == 0:
+            continue
+
+        c = sum(c for c, _ in pairs) / len(pairs)
+        t = sum(t for _, t in pairs) / len(pairs)
+        saved = (c - t) * (STATE_BYTES + 2 * num_agents * AGENT_SLOT_BYTES) / MegaByte
+        print(f"{num_agents:>6}  {c:>13.0f}  {t:>16.0f}  {saved:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
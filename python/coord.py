@@ -6,15 +6,17 @@ from mapfmclient import MarkedLocation
 
 
 class Coord:
+    __slots__ = ("x", "y")
+
     def __init__(self, x: int, y: int):
         self.x = x
         self.y = y
 
     def __hash__(self) -> int:
-        return tuple.__hash__((self.x, self.y))
+        return (self.y << 16) ^ self.x
 
     def __eq__(self, other: Coord):
-        return (self.x, self.y) == (other.x, other.y)
+        return self is other or (self.x == other.x and self.y == other.y)
 
     def __repr__(self):
         return f"Coord({self.x}, {self.y})"
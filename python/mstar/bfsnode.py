@@ -4,6 +4,8 @@ from python.coord import Coord
 
 
 class BFSNode:
+    __slots__ = ("pos", "move_cost", "prev_pos")
+
     def __init__(self, pos: Coord, move_cost, prev_pos):
         self.pos = pos
         self.move_cost = move_cost
@@ -14,10 +14,37 @@ from python.mstar.statecache import StateCache
 from python.mstar.visualizer import Visualizer
 from python.priority_queue.fast_contains import FastContainsPriorityQueue
 
+def find_colliding_agents(old_state: List[Agent], new_state: List[Agent]) -> Set[int]:
+    """
+    Indices of agents which are on the same position in new_state (vertex conflict), or
+    which swapped positions between old_state and new_state (edge conflict). Linear in
+    the number of agents: positions and moves are looked up in dictionaries instead of
+    comparing every pair of agents.
+    """
 
+    assert len(old_state) == len(new_state)
 
+    res = set()
 
+    # position -> index of the first agent on it
+    positions: dict[Agent, int] = {}
+    # (from, to) -> index of the agent making that move
+    moves: dict[tuple[Agent, Agent], int] = {}
 
+    for index, (old, new) in enumerate(zip(old_state, new_state)):
+        other = positions.setdefault(new, index)
+        if other != index:
+            res.add(index)
+            res.add(other)
+
+        if old != new:
+            other = moves.get((new, old))
+            if other is not None:
+                res.add(index)
+                res.add(other)
+            moves[(old, new)] = index
+
+    return res
 
 
 class MStar:
@@ -130,21 +157,7 @@ class MStar:
         :return: A set of agent indices (TODO!)
         """
 
-        assert len(old_state) == len(new_state)
-
-        res = set()
-
-        for a1 in range(len(old_state)):
-            for a2 in range(min(a1, len(new_state))):
-                if new_state[a1] == new_state[a2]:
-                    res.add(a1)
-                    res.add(a2)
-
-                elif old_state[a1] == new_state[a2] and new_state[a1] == old_state[a2]:
-                    res.add(a1)
-                    res.add(a2)
-
-        return res
+        return find_colliding_agents(old_state, new_state)
 
     def final_state(self, state: State) -> bool:
         # implied by constraints on move
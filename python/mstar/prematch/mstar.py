@@ -4,6 +4,7 @@ from collections import defaultdict, deque
 import time
 from typing import List, Iterator, Optional, Dict, Iterable, Set, Tuple
 
+import numpy as np
 from mapfmclient import MarkedLocation
 from tqdm import tqdm
 
@@ -12,6 +13,10 @@ from python.astar.no_solution import NoSolutionError
 from python.coord import Coord
 from python.mstar.bfsnode import BFSNode
 from python.mstar.identifier import Identifier
+from python.mstar.mstar import find_colliding_agents
+from python.mstar.rewrite.distance_cache import DistanceCache, grid_digest
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.path_cache import DistanceTable, UNREACHABLE, cached_BFS
 from python.mstar.state import State
 from python.mstar.statecache import StateCache
 from python.mstar.visualizer import Visualizer
@@ -56,7 +61,8 @@ def matchings(starts: List[MarkedLocation], goals: List[MarkedLocation]) -> Iter
 class PrematchMStar:
     directions = [Coord(0, 0), Coord(0, -1), Coord(0, 1), Coord(1, 0), Coord(-1, 0)]
 
-    def __init__(self, grid, starts: List[MarkedLocation], goals: List[MarkedLocation], width: int, height: int):
+    def __init__(self, grid, starts: List[MarkedLocation], goals: List[MarkedLocation], width: int, height: int,
+                 distance_cache: Optional[DistanceCache] = None):
         self.grid = grid
         self.width = width
         self.height = height
@@ -67,6 +73,8 @@ class PrematchMStar:
         self.height = height
 
         self.joint_policy_graphs: Dict[Coord, Dict[Coord, BFSNode]] = None
+        # when given, BFS results are loaded from (and stored in) this cache
+        self.distance_cache = distance_cache
 
         self.v_len = len(starts)
         self.state_cache: StateCache = StateCache()
@@ -81,8 +89,28 @@ class PrematchMStar:
         assert len(starts) == len(goals), Exception("start and end positions have to be of same length")
 
         self.joint_policy_graphs = {}
-        for goal in goals:
-            self.joint_policy_graphs[Coord(goal.x, goal.y)] = self.BFS(Coord(goal.x, goal.y))
+        if self.distance_cache is None:
+            for goal in goals:
+                self.joint_policy_graphs[Coord(goal.x, goal.y)] = self.BFS(Coord(goal.x, goal.y))
+        else:
+            grid = Grid(self.grid, self.width, self.height)
+            digest = grid_digest(grid)
+            for goal in goals:
+                table = cached_BFS(Coord(goal.x, goal.y), grid, self.distance_cache, digest)
+                self.joint_policy_graphs[Coord(goal.x, goal.y)] = self.graph_from_table(table)
+
+    def graph_from_table(self, table: DistanceTable) -> dict[Coord, BFSNode]:
+        """
+        The result of BFS for the goal of a distance table. The previous
+        positions of nodes aren't known, but they're not used either.
+        """
+        distances = table.distances.reshape(self.height, self.width)
+
+        graph = {}
+        for y, x in zip(*np.nonzero(distances != UNREACHABLE)):
+            pos = Coord(int(x), int(y))
+            graph[pos] = BFSNode(pos, int(distances[y, x]), None)
+        return graph
 
     def wall_at(self, coord: Coord) -> bool:
         return self.grid[coord.y][coord.x] == 1
@@ -294,21 +322,7 @@ class PrematchMStar:
         :return: A set of agent indices (TODO!)
         """
 
-        assert len(old_state) == len(new_state)
-
-        res = set()
-
-        for a1 in range(len(old_state)):
-            for a2 in range(min(a1, len(new_state))):
-                if new_state[a1] == new_state[a2]:
-                    res.add(a1)
-                    res.add(a2)
-
-                elif old_state[a1] == new_state[a2] and new_state[a1] == old_state[a2]:
-                    res.add(a1)
-                    res.add(a2)
-
-        return res
+        return find_colliding_agents(old_state, new_state)
 
     def expand_OD(self, state: State, goal_pos: List[MarkedLocation], debug=False) -> List[Identifier]:
         next_partial = []
@@ -10,6 +10,7 @@ from python.agent import UncalculatedAgent, Agent
 from python.astar.no_solution import NoSolutionError
 from python.coord import Coord
 from python.mstar.identifier import Identifier
+from python.mstar.mstar import find_colliding_agents
 from python.mstar.prematch.mstar import PrematchMStar
 from python.mstar.state import State
 from python.mstar.visualizer import Visualizer
@@ -323,21 +324,7 @@ class RecursivePrematchMStar(PrematchMStar):
         :return: A set of agent indices (TODO!)
         """
 
-        assert len(old_state) == len(new_state)
-
-        res = set()
-
-        for a1 in range(len(old_state)):
-            for a2 in range(min(a1, len(new_state))):
-                if new_state[a1] == new_state[a2]:
-                    res.add(a1)
-                    res.add(a2)
-
-                elif old_state[a1] == new_state[a2] and new_state[a1] == old_state[a2]:
-                    res.add(a1)
-                    res.add(a2)
-
-        return frozenset(res)
+        return frozenset(find_colliding_agents(old_state, new_state))
 
     def expand_rOD(self,
                    state: RecursiveState,
@@ -1,30 +1,38 @@
-from typing import Optional
+from typing import Iterable, Optional, Union
 
 from mapfmclient import Problem, MarkedLocation
 from tqdm import tqdm
 
-from python.mstar.rewrite.config import Config, MatchingStrategy
+from python.mstar.rewrite.config import Config, MatchingStrategy, OpenListStrategy
 from python.mstar.rewrite.find_path_params import FindPathParams
 from python.mstar.rewrite.grid import Grid
-from python.mstar.rewrite.heuristic import Heuristic
+from python.mstar.rewrite.heuristic import Heuristic, AssignmentHeuristic
 from python.mstar.rewrite.identifier import Identifier
 from python.mstar.rewrite.find_path import find_path
 from python.mstar.rewrite.optimal_path import OptimalPath
 from python.mstar.rewrite.path import Path
 from python.mstar.rewrite.path_cache import PathCache
+from python.mstar.rewrite.memory import OutOfMemory
 from python.mstar.rewrite.state import State
 from python.mstar.rewrite.statecache import StateCache
 from python.mstar.rewrite.goal import StateGoal, AllAgentGoal
-from python.mstar.rewrite.matchings import matchings
+from python.mstar.rewrite.matchings import matchings, ranked_matchings, matching_lower_bound
 from python.mstar.rewrite.state_cache_cache import StateCacheCache
+from python.mstar.rewrite.independence_detection import independence_detection
+from python.mstar.rewrite.incumbent import Incumbent
+from python.mstar.rewrite.parallel_prematch import parallel_prematch
+from python.mstar.rewrite.unified_prematch import unified_prematch
 
 
 class MatchingWithHeuristic:
-    def __init__(self, cfg: Config, matching: list[MarkedLocation], start_state: State, state_cache: StateCache, path_cache: PathCache):
+    def __init__(self, cfg: Config, matching: list[MarkedLocation], start_state: State, state_cache: StateCache, path_cache: PathCache, avoid: list[list[int]], lower_bound: Optional[int] = None):
+        """
+        lower_bound is used as heuristic_value when it's already known, see ranked_matchings
+        """
         self.matching = matching
 
 
-        self.goal_identifier = Identifier.from_marked_locations(matching)
+        self.goal_identifier = Identifier.from_marked_locations(matching, path_cache.grid.agents)
         self.goal_state = state_cache.get(self.goal_identifier)
         self.goal = StateGoal(self.goal_state)
 
@@ -38,8 +46,13 @@ class MatchingWithHeuristic:
 
         self.heuristic = Heuristic(cfg, self.optimal_path)
 
-        if cfg.pruning_prematch:
-            self.heuristic_value = self.heuristic.heuristic(start_state)
+        if cfg.collision_avoidance_table:
+            self.optimal_path.build_collision_avoidance_table(start_state.identifier.actual, avoid)
+
+        if lower_bound is not None:
+            self.heuristic_value = lower_bound
+        elif cfg.pruning_prematch:
+            self.heuristic_value = self.heuristic.lower_bound(start_state)
 
         if cfg.recursive:
             self.state_cache_cache = StateCacheCache(self.goal_state, state_cache)
@@ -47,7 +60,62 @@ class MatchingWithHeuristic:
             self.state_cache_cache = None
 
 
-def mstar(cfg: Config, problem: Problem) -> Optional[Path]:
+def search_matching(
+        cfg: Config,
+        matching: MatchingWithHeuristic,
+        start_state: State,
+        grid: Grid,
+        state_cache: StateCache,
+        path_cache: PathCache,
+        incumbent: Optional[Incumbent],
+) -> Union[Path, OutOfMemory, None]:
+    """
+    Search for the path of one matching. With an incumbent, None is also
+    returned when the path can't be cheaper than the incumbent.
+    """
+    state_cache.reset()
+    # resets the start state, if it was used for an earlier matching
+    start_state = state_cache.get(start_state.identifier)
+
+    found_path = find_path(
+        start_state,
+
+        FindPathParams(
+            cfg=cfg,
+            goal=matching.goal,
+
+            num_agents=len(start_state.identifier.actual),
+
+            grid=grid,
+            optimal_path=matching.optimal_path,
+            state_cache=state_cache,
+            heuristic=matching.heuristic,
+            state_cache_cache=matching.state_cache_cache,
+            path_cache=path_cache,
+            incumbent=incumbent,
+        )
+    )
+
+    if cfg.collision_avoidance_table:
+        cfg.report_collision_avoidance(matching.optimal_path.collision_avoidance_table.stats())
+
+    return found_path
+
+
+def mstar(cfg: Config, problem: Problem, avoid: Optional[list[list[int]]] = None) -> Union[Path, OutOfMemory, None]:
+    """
+    Returns None when the problem has no solution, and OutOfMemory
+    when the search used more than cfg.max_memory_usage.
+
+    avoid holds paths (packed positions at every step) of agents which are not part of
+    the problem, and which are put in the collision avoidance table if it's used.
+    """
+    if cfg.independence_detection:
+        return independence_detection(cfg, problem)
+
+    if avoid is None:
+        avoid = []
+
     grid = Grid(problem.grid)
 
     state_cache = StateCache(cfg, State)
@@ -57,57 +125,71 @@ def mstar(cfg: Config, problem: Problem) -> Optional[Path]:
         problem.goals
     )
 
-    start_identifier = Identifier.from_marked_locations(problem.starts)
+    start_identifier = Identifier.from_marked_locations(problem.starts, grid.agents)
     start_state = state_cache.get(start_identifier)
 
     num_agents = len(problem.starts)
 
 
-    if cfg.prematch:
+    if cfg.matching_strategy == MatchingStrategy.UnifiedPrematch:
+        return unified_prematch(cfg, problem, grid, path_cache, avoid)
 
-        best_path: Optional[Path] = None
+    elif cfg.prematch:
 
-        all_matchings: list[MatchingWithHeuristic] = [
-            MatchingWithHeuristic(cfg, i, start_state, state_cache, path_cache)
-            for i in matchings(problem.starts, problem.goals)
-        ]
+        best_path: Optional[Path] = None
 
+        # (lower bound, goals) of every matching. The lower bound is checked against the best path
+        # before the matching is set up, so pruned matchings don't build their goal state and tables
+        all_matchings: Iterable[tuple[Optional[int], list[MarkedLocation]]]
         if cfg.matching_strategy == MatchingStrategy.SortedPruningPrematch:
-            all_matchings.sort(key=lambda i: i.heuristic_value)
+            # cheapest matchings first, only made when they're needed
+            ranked = ranked_matchings(problem.starts, problem.goals, path_cache)
 
+            if cfg.processes > 1:
+                return parallel_prematch(cfg, problem, ((goals, lower_bound) for lower_bound, goals in ranked), avoid)
 
-        for matching in tqdm(all_matchings, disable=False):
+            all_matchings = ranked
+        else:
+            if cfg.processes > 1:
+                return parallel_prematch(cfg, problem, ((goals, None) for goals in matchings(problem.starts, problem.goals)), avoid)
+
+            all_matchings = (
+                (matching_lower_bound(problem.starts, goals, path_cache) if cfg.pruning_prematch else None, goals)
+                for goals in matchings(problem.starts, problem.goals)
+            )
+
+        incumbent = Incumbent() if cfg.pruning_prematch else None
+
+        for lower_bound, goals in tqdm(all_matchings, disable=False):
             if cfg.pruning_prematch:
-                # if cfg.debug:
-                if best_path is not None and matching.heuristic_value >= best_path.cost:
+                # paths found for this matching cost at least lower_bound, so
+                # best_path is within the suboptimality bound of anything it could find
+                if best_path is not None and lower_bound * cfg.suboptimality_bound >= best_path.cost:
                     #tqdm.write("pruned")
+                    if cfg.matching_strategy == MatchingStrategy.SortedPruningPrematch:
+                        # the next matchings don't have a lower bound either
+                        break
                     continue
 
-            state_cache.reset()
-
-            found_path = find_path(
-                start_state,
+            matching = MatchingWithHeuristic(cfg, goals, start_state, state_cache, path_cache, avoid, lower_bound)
 
-                FindPathParams(
-                    cfg=cfg,
-                    goal=matching.goal,
+            found_path = search_matching(cfg, matching, start_state, grid, state_cache, path_cache, incumbent)
 
-                    num_agents=num_agents,
-
-                    grid=grid,
-                    optimal_path=matching.optimal_path,
-                    state_cache=state_cache,
-                    heuristic=matching.heuristic,
-                    state_cache_cache=matching.state_cache_cache,
-                )
-            )
+            # the state cache is shared between matchings, so the next ones won't fit either
+            if isinstance(found_path, OutOfMemory):
+                cfg.report_state_cache(state_cache.stats())
+                return found_path
 
             if found_path is not None:
                 if best_path is None or found_path.cost < best_path.cost:
                     best_path = found_path
-            else:
+                    if incumbent is not None:
+                        incumbent.offer(best_path.cost)
+            elif incumbent is None or best_path is None:
+                # with an incumbent, None may also mean it couldn't be beaten
                 tqdm.write("no solution found")
 
+        cfg.report_state_cache(state_cache.stats())
 
         return best_path
 
@@ -118,9 +200,15 @@ def mstar(cfg: Config, problem: Problem) -> Optional[Path]:
             path_cache,
         )
 
-        heuristic = Heuristic(cfg, optimal_path)
+        if cfg.assignment_heuristic:
+            heuristic = AssignmentHeuristic(cfg, optimal_path)
+        else:
+            heuristic = Heuristic(cfg, optimal_path)
+
+        if cfg.collision_avoidance_table:
+            optimal_path.build_collision_avoidance_table(start_state.identifier.actual, avoid)
 
-        return find_path(
+        found_path = find_path(
             start_state,
 
             FindPathParams(
@@ -134,5 +222,11 @@ def mstar(cfg: Config, problem: Problem) -> Optional[Path]:
                 state_cache=state_cache,
                 heuristic=heuristic,
                 state_cache_cache=None,  # only valid with prematching
+                path_cache=path_cache,
             )
         )
+
+        if cfg.collision_avoidance_table:
+            cfg.report_collision_avoidance(optimal_path.collision_avoidance_table.stats())
+
+        return found_path
@@ -6,17 +6,34 @@ from mapfmclient import MarkedLocation
 
 from python.coord import Coord, UncalculatedCoord
 
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from python.mstar.rewrite.grid import Grid
+
+# Agents are packed into a single int: their cell (the flat index of their location on
+# the grid, see Grid.cell_index) shifted left by one, with the lowest bit set when the
+# agent is uncalculated. Tables of the grid are indexed by the cell, see Agent.cell.
+UNCALCULATED_BIT = 1
+
 
 class Agent:
+    __slots__ = ("location", "accumulated_cost", "colour", "index", "uncalculated", "cell", "packed", "table")
+
     def __init__(
             self,
             location: Coord,
             colour: int,
             accumulated_cost: Optional[int],
             index: int,
+            cell: int,
 
             uncalculated=False,
+            table: Optional[AgentTable] = None,
     ):
+        """
+        cell is the flat index of location on the grid, see Grid.cell_index
+        """
         self.location = location
         self.accumulated_cost = accumulated_cost if accumulated_cost else 0
         self.colour = colour
@@ -24,8 +41,24 @@ class Agent:
 
         self.uncalculated = uncalculated
 
+        if uncalculated:
+            self.cell = 0
+            self.packed = UNCALCULATED_BIT
+        else:
+            self.cell = cell
+            self.packed = cell << 1
+
+        # the table this agent is interned in, see AgentTable
+        self.table = table
+
+    def __reduce__(self):
+        # the intern table stays behind, agents are unpickled as plain agents
+        return Agent, (self.location, self.colour, self.accumulated_cost, self.index, self.cell, self.uncalculated)
+
     def make_uncalculated(self) -> Agent:
-        return Agent(Coord(0, 0), self.colour, self.index, self.accumulated_cost, uncalculated=True)
+        if self.table is not None:
+            return self.table.uncalculated(self.colour, self.index)
+        return Agent(Coord(0, 0), self.colour, self.accumulated_cost, self.index, 0, uncalculated=True)
 
     def is_uncalculated(self) -> bool:
         return self.uncalculated
@@ -39,12 +72,16 @@ class Agent:
         return self.location.y
 
     def __eq__(self, other: Agent):
+        """
+        Agents are equal when they're the same agent (index and colour) at the same position.
+        Interned agents are only equal to themselves. Compare Agent.packed to only compare positions.
+        """
         if other is self:
             return True
-        return self.location == other and self.accumulated_cost == other.accumulated_cost
+        return self.packed == other.packed and self.index == other.index and self.colour == other.colour
 
     def __hash__(self):
-        return hash(self.location) ^ hash(self.accumulated_cost)
+        return (self.colour << 16 | self.index) << 32 | self.packed
 
     def __repr__(self):
         if self.is_uncalculated():
@@ -52,10 +89,60 @@ class Agent:
         else:
             return f"Agent({self.location}, {self.accumulated_cost}, {self.index})"
 
-    @classmethod
-    def from_marked_location(cls, location: MarkedLocation, accumulated_cost: int, index: int) -> Agent:
-        return cls(Coord(location.x, location.y), location.color, accumulated_cost, index)
-
     def with_new_position(self, new_pos: Coord) -> Agent:
-        return Agent(new_pos, self.colour, self.accumulated_cost, self.index)
-
+        """
+        Only for agents interned in a table, plain agents don't know the width of the grid
+        """
+        return self.table.get(new_pos, self.colour, self.index)
+
+    def with_new_cell(self, cell: int) -> Agent:
+        """
+        This agent on another cell. Only for agents interned in a table
+        """
+        return self.table.get_cell(cell, self.colour, self.index)
+
+
+class AgentTable:
+    """
+    Interns the agents of a grid, so there's only one agent for every (cell, colour, index)
+    and comparing them is an identity check. Agents made from an interned agent (with
+    with_new_position and make_uncalculated) are interned in the same table. Their locations
+    are the coordinates of Grid.cell_coords. Interned agents have no accumulated cost.
+    """
+
+    __slots__ = ("agents", "width", "cell_coords")
+
+    def __init__(self, grid: Grid):
+        # (colour << 16 | index) << 32 | packed agent -> agent
+        self.agents: dict[int, Agent] = {}
+        self.width = grid.width
+        self.cell_coords = grid.cell_coords
+
+    def get(self, location: Coord, colour: int, index: int) -> Agent:
+        return self.get_cell(location.y * self.width + location.x, colour, index)
+
+    def get_cell(self, cell: int, colour: int, index: int) -> Agent:
+        key = (colour << 16 | index) << 32 | cell << 1
+
+        agent = self.agents.get(key)
+        if agent is None:
+            agent = Agent(self.cell_coords[cell], colour, 0, index, cell, table=self)
+            self.agents[key] = agent
+        return agent
+
+    def uncalculated(self, colour: int, index: int) -> Agent:
+        key = (colour << 16 | index) << 32 | UNCALCULATED_BIT
+
+        agent = self.agents.get(key)
+        if agent is None:
+            agent = Agent(Coord(0, 0), colour, 0, index, 0, uncalculated=True, table=self)
+            self.agents[key] = agent
+        return agent
+
+    def from_packed(self, packed: int, colour: int, index: int) -> Agent:
+        if packed & UNCALCULATED_BIT:
+            return self.uncalculated(colour, index)
+        return self.get_cell(packed >> 1, colour, index)
+
+    def from_marked_location(self, location: MarkedLocation, index: int) -> Agent:
+        return self.get(Coord(location.x, location.y), location.color, index)
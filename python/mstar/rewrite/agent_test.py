@@ -0,0 +1,19 @@
+import unittest
+
+from python.coord import Coord
+from python.mstar.rewrite.agent import Agent
+
+
+class TestAgent(unittest.TestCase):
+    def test_equality(self):
+        agent = Agent(Coord(1, 2), 0, 0, 0, 9)
+
+        self.assertEqual(agent, Agent(Coord(1, 2), 0, 0, 0, 9))
+        # other agents on the same position
+        self.assertNotEqual(agent, Agent(Coord(1, 2), 1, 0, 0, 9))
+        self.assertNotEqual(agent, Agent(Coord(1, 2), 0, 0, 1, 9))
+        self.assertNotEqual(agent, Agent(Coord(2, 1), 0, 0, 0, 6))
+
+        # agents of different teams aren't merged in sets
+        self.assertEqual(len({agent, Agent(Coord(1, 2), 1, 0, 0, 9), Agent(Coord(1, 2), 0, 0, 0, 9)}), 2)
+
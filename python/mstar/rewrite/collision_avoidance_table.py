@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from typing import Iterator, Optional
+
+from python.mstar.rewrite.agent import Agent
+from python.mstar.rewrite.collisionset import popcount
+from python.mstar.rewrite.identifier import Identifier
+
+
+class CollisionAvoidanceTable:
+    """
+    Space-time table of where agents are planned to be. Initially these are the
+    individually optimal paths, with recursive M* the paths found for groups of
+    agents replace them. After the end of its path an agent stays on its last position.
+
+    Used to prefer moves which don't run into the planned paths of other agents,
+    so fewer collisions (and thus bigger collision sets) are found. Like find_collisions,
+    that includes swapping positions with another agent.
+    """
+
+    def __init__(self):
+        # time << 32 | packed position -> mask of agents planned to be there
+        self.occupied: dict[int, int] = {}
+        # time << 64 | packed from << 32 | packed to -> mask of agents planned to move from
+        # one position to the other, arriving at time. Waiting isn't recorded
+        self.moves: dict[int, int] = {}
+        # packed position -> (time, agent index) for every agent which stays there from that time on
+        self.parked: dict[int, list[tuple[int, int]]] = {}
+        # agent index -> (start time, packed positions)
+        self.paths: dict[int, tuple[int, list[int]]] = {}
+
+        # number of times the table was queried
+        self.lookups = 0
+        # total number of conflicts found with the table
+        self.conflicts = 0
+        # number of times a different move was picked because of the table
+        self.tie_breaks = 0
+
+    def set_path(self, index: int, start_time: int, path: list[int]):
+        """
+        Plan the packed positions of agent `index`, starting at start_time. Replaces
+        the part of its old path from start_time on.
+        """
+
+        old_start_time, old_path = self.paths.get(index, (start_time, []))
+        if old_start_time < start_time and len(old_path) != 0:
+            # keep the old path up to start_time, waiting at its end if it was shorter
+            kept = old_path[:start_time - old_start_time]
+            kept += [old_path[-1]] * (start_time - old_start_time - len(kept))
+            path = kept + path
+            start_time = old_start_time
+
+        self.remove_path(index)
+        if len(path) == 0:
+            return
+
+        bit = 1 << index
+        for time, packed in enumerate(path, start_time):
+            key = time << 32 | packed
+            self.occupied[key] = self.occupied.get(key, 0) | bit
+        for key in self.move_keys(start_time, path):
+            self.moves[key] = self.moves.get(key, 0) | bit
+
+        self.parked.setdefault(path[-1], []).append((start_time + len(path), index))
+        self.paths[index] = (start_time, path)
+
+    def remove_path(self, index: int):
+        if index not in self.paths:
+            return
+
+        start_time, path = self.paths.pop(index)
+
+        bit = 1 << index
+        for time, packed in enumerate(path, start_time):
+            key = time << 32 | packed
+            mask = self.occupied[key] & ~bit
+            if mask == 0:
+                del self.occupied[key]
+            else:
+                self.occupied[key] = mask
+        for key in self.move_keys(start_time, path):
+            mask = self.moves[key] & ~bit
+            if mask == 0:
+                del self.moves[key]
+            else:
+                self.moves[key] = mask
+
+        parked = self.parked[path[-1]]
+        parked.remove((start_time + len(path), index))
+        if len(parked) == 0:
+            del self.parked[path[-1]]
+
+    @staticmethod
+    def move_keys(start_time: int, path: list[int]) -> Iterator[int]:
+        for time in range(1, len(path)):
+            if path[time - 1] != path[time]:
+                yield (start_time + time) << 64 | path[time - 1] << 32 | path[time]
+
+    def num_conflicts(self, agent: Agent, time: int, prev: Optional[Agent] = None) -> int:
+        """
+        Number of other agents planned to be on the position of `agent` at `time`, plus,
+        when `agent` moved there from `prev`, the other agents planned to make the opposite
+        move at the same time (swapping positions with it).
+        """
+
+        self.lookups += 1
+
+        others = ~(1 << agent.index)
+        res = popcount(self.occupied.get(time << 32 | agent.packed, 0) & others)
+        for parked_time, index in self.parked.get(agent.packed, ()):
+            if parked_time <= time and index != agent.index:
+                res += 1
+
+        if prev is not None and prev.packed != agent.packed:
+            res += popcount(self.moves.get(time << 64 | agent.packed << 32 | prev.packed, 0) & others)
+
+        self.conflicts += res
+        return res
+
+    def num_conflicts_move(self, curr: Identifier, new: Identifier, time: int) -> int:
+        """
+        Conflicts of the agents which were assigned a move going from curr to new.
+        """
+
+        index = curr.first_uncalculated
+        if index is not None:
+            # operator decomposition only assigns the first uncalculated agent
+            return self.num_conflicts(new.partial[index], time, curr.actual[index])
+
+        return sum(
+            self.num_conflicts(agent, time, prev)
+            for agent, prev in zip(new.partial, curr.actual)
+            if not agent.uncalculated
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "lookups": self.lookups,
+            "conflicts": self.conflicts,
+            "tie breaks": self.tie_breaks,
+        }
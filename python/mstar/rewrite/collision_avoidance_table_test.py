@@ -0,0 +1,56 @@
+import unittest
+
+from python.coord import Coord
+from python.mstar.rewrite.agent import Agent
+from python.mstar.rewrite.collision_avoidance_table import CollisionAvoidanceTable
+from python.mstar.rewrite.grid import Grid
+
+GRID = Grid([[0] * 3 for _ in range(3)])
+
+
+def agent(x: int, y: int, index: int) -> Agent:
+    return GRID.agents.get(Coord(x, y), 0, index)
+
+
+class TestCollisionAvoidanceTable(unittest.TestCase):
+    def test_conflicts(self):
+        cat = CollisionAvoidanceTable()
+        cat.set_path(0, 0, [agent(0, 0, 0).packed, agent(1, 0, 0).packed, agent(2, 0, 0).packed])
+
+        self.assertEqual(cat.num_conflicts(agent(1, 0, 1), 1), 1)
+        self.assertEqual(cat.num_conflicts(agent(1, 0, 1), 0), 0)
+        # an agent doesn't conflict with its own path
+        self.assertEqual(cat.num_conflicts(agent(1, 0, 0), 1), 0)
+        # after its path, the agent stays on its last position
+        self.assertEqual(cat.num_conflicts(agent(2, 0, 1), 10), 1)
+        self.assertEqual(cat.num_conflicts(agent(2, 0, 1), 1), 0)
+
+    def test_swap(self):
+        cat = CollisionAvoidanceTable()
+        cat.set_path(0, 0, [agent(0, 0, 0).packed, agent(1, 0, 0).packed, agent(1, 0, 0).packed])
+
+        # moving from (1, 0) to (0, 0) while agent 0 moves the other way
+        self.assertEqual(cat.num_conflicts(agent(0, 0, 1), 1, agent(1, 0, 1)), 1)
+        # the same move a step later, when agent 0 waits
+        self.assertEqual(cat.num_conflicts(agent(0, 0, 1), 2, agent(1, 0, 1)), 0)
+        # following agent 0 only conflicts on the position
+        self.assertEqual(cat.num_conflicts(agent(1, 0, 1), 1, agent(0, 0, 1)), 1)
+        # without a previous position only the position is checked
+        self.assertEqual(cat.num_conflicts(agent(0, 0, 1), 1), 0)
+
+    def test_replace_path(self):
+        cat = CollisionAvoidanceTable()
+        cat.set_path(0, 0, [agent(0, 0, 0).packed, agent(1, 0, 0).packed])
+        cat.set_path(0, 3, [agent(0, 1, 0).packed, agent(0, 2, 0).packed])
+
+        self.assertEqual(cat.num_conflicts(agent(0, 0, 1), 0), 1)
+        # waits at the end of the old path until the new one starts
+        self.assertEqual(cat.num_conflicts(agent(1, 0, 1), 2), 1)
+        self.assertEqual(cat.num_conflicts(agent(1, 0, 1), 3), 0)
+        self.assertEqual(cat.num_conflicts(agent(0, 1, 1), 3), 1)
+        self.assertEqual(cat.num_conflicts(agent(0, 2, 1), 5), 1)
+
+        cat.remove_path(0)
+        self.assertEqual(cat.occupied, {})
+        self.assertEqual(cat.moves, {})
+        self.assertEqual(cat.parked, {})
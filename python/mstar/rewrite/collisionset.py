@@ -1,13 +1,77 @@
 from __future__ import annotations
 
 from abc import ABCMeta, abstractmethod
-from typing import Optional, Iterator
-
-import itertools
+from typing import Optional, Iterator, Iterable
 
 from python.mstar.rewrite.agent import Agent
 
 
+def to_mask(indices: Iterable[int]) -> int:
+    mask = 0
+    for i in indices:
+        mask |= 1 << i
+    return mask
+
+
+def from_mask(mask: int) -> frozenset[int]:
+    res = []
+    index = 0
+    while mask:
+        if mask & 1:
+            res.append(index)
+        mask >>= 1
+        index += 1
+    return frozenset(res)
+
+
+def popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+def insert_group(groups: list[int], group: int) -> list[int]:
+    """
+    Add a group to a partition of disjoint groups (bitmasks), merging every group it overlaps.
+    Since the groups are disjoint, a group can only overlap the merged result
+    if it overlaps the inserted group itself, so one pass suffices.
+    """
+    res = []
+    for g in groups:
+        if g & group:
+            group |= g
+        else:
+            res.append(g)
+    res.append(group)
+    return res
+
+
+def find_collisions(curr_agents: tuple[Agent, ...], new_agents: tuple[Agent, ...]) -> list[tuple[int, int]]:
+    """
+    Pairs of agent indices which are on the same position in new_agents (vertex conflict),
+    or which swapped positions between curr_agents and new_agents (edge conflict).
+    Linear in the number of agents: positions and moves are looked up in dictionaries
+    instead of comparing every pair of agents.
+    """
+    res: list[tuple[int, int]] = []
+
+    # packed position -> agent on it
+    positions: dict[int, Agent] = {}
+    # packed (from, to) move -> agent making it
+    moves: dict[int, Agent] = {}
+
+    for curr, new in zip(curr_agents, new_agents):
+        other = positions.setdefault(new.packed, new)
+        if other is not new:
+            res.append((new.index, other.index))
+
+        if curr.packed != new.packed:
+            other = moves.get(new.packed << 32 | curr.packed)
+            if other is not None:
+                res.append((new.index, other.index))
+            moves[curr.packed << 32 | new.packed] = new
+
+    return res
+
+
 class CollisionSet(metaclass=ABCMeta):
     @abstractmethod
     def subset(self, other: CollisionSet) -> bool:
@@ -34,112 +98,135 @@ class CollisionSet(metaclass=ABCMeta):
 
 
 class NormalCollisionSet(CollisionSet):
-    def __init__(self, inp: Optional[frozenset[int]] = None):
-        if inp is None:
-            inp = frozenset()
+    """
+    Set of agent indices, stored as a bitmask with bit i set when agent i is in the set
+    """
 
-        self.set: frozenset[int] = inp
+    def __init__(self, mask: int = 0):
+        self.mask: int = mask
 
     @classmethod
     def from_colliding_indices(cls, indices: list[tuple[int, int]]):
-        return cls(frozenset(itertools.chain(*indices)))
+        mask = 0
+        for a, b in indices:
+            mask |= (1 << a) | (1 << b)
+        return cls(mask)
+
+    @property
+    def set(self) -> frozenset[int]:
+        return from_mask(self.mask)
 
     def subset(self, other: NormalCollisionSet) -> bool:
         """
         True if this set is a subset of another set
         """
 
-        return self.set.issubset(other.set)
+        return self.mask & ~other.mask == 0
 
     def merge(self, other: NormalCollisionSet) -> NormalCollisionSet:
-        return self.__class__(other.set.union(self.set))
+        mask = self.mask | other.mask
+        if mask == self.mask:
+            return self
+        return self.__class__(mask)
 
     def is_colliding(self, agent: Agent) -> bool:
-        return agent.index in self.set
+        return (self.mask >> agent.index) & 1 == 1
 
     def __len__(self) -> int:
-        return len(self.set)
+        return popcount(self.mask)
+
+    def __eq__(self, other):
+        return self.mask == other.mask
 
     def __repr__(self):
-        return f"CollisionSet({self.set})"
+        return f"CollisionSet({set(self.set)})"
 
     def contains_agent(self, agent: Agent) -> bool:
-        return agent.index in self.set
+        return (self.mask >> agent.index) & 1 == 1
 
 
 class RecursiveCollisionSet(CollisionSet):
-    def __init__(self, inp: Optional[frozenset[frozenset[int]]] = None):
-        if inp is None:
-            inp = frozenset()
-
-        self.set: frozenset[frozenset[int]] = inp
+    """
+    Partition of the colliding agents into disjoint groups which have to be planned
+    together. Every group is a bitmask like in NormalCollisionSet, and the groups are
+    kept as a sorted tuple so equal partitions have equal representations.
+    """
+
+    def __init__(self, inp: Optional[frozenset[frozenset[int]]] = None, groups: tuple[int, ...] = ()):
+        if inp is not None:
+            masks = []
+            for i in inp:
+                if len(i) != 0:
+                    masks = insert_group(masks, to_mask(i))
+            groups = tuple(sorted(masks))
+
+        self.masks: tuple[int, ...] = groups
+        # union of all groups
+        self.mask = 0
+        for g in groups:
+            self.mask |= g
+
+    @property
+    def set(self) -> frozenset[frozenset[int]]:
+        return frozenset(from_mask(g) for g in self.masks)
 
     def __repr__(self):
         return "RecursiveCollisionSet({" + ", ".join(
-            "{" + ", ".join(repr(j) for j in i) + "}" for i in self.set
+            "{" + ", ".join(repr(j) for j in sorted(i)) + "}" for i in self.groups()
         ) + "})"
 
     def __eq__(self, other):
-        return self.set == other.set
+        return self.masks == other.masks
 
     @classmethod
     def from_colliding_indices(cls, indices: list[tuple[int, int]]):
-        sets: list[frozenset] = []
-        for i in indices:
-            for index, s in enumerate(sets):
-                if i[0] in s or i[1] in s:
-                    sets[index] = s.union(frozenset(i))
-                    break
-            else:
-                sets.append(frozenset(i))
+        masks = []
+        for a, b in indices:
+            masks = insert_group(masks, (1 << a) | (1 << b))
 
-        return cls(frozenset(sets))
+        return cls(groups=tuple(sorted(masks)))
 
     def contains_agent(self, agent: Agent) -> bool:
-        return any(agent.index in s for s in self.set)
+        return (self.mask >> agent.index) & 1 == 1
 
     def subset(self, other: RecursiveCollisionSet) -> bool:
         """
         True if this set is a subset of another set
         """
 
-        for s in self.set:
-            for os in other.set:
-                if s.issubset(os):
+        if self.mask & ~other.mask:
+            return False
+
+        for s in self.masks:
+            # the group of other containing the lowest agent of s
+            lowest = s & -s
+            for o in other.masks:
+                if o & lowest:
+                    if s & ~o:
+                        return False
                     break
-            else:
-                return False
+
         return True
 
     def merge(self, other: RecursiveCollisionSet) -> RecursiveCollisionSet:
-        sets: list[frozenset] = list(self.set)
+        if other.subset(self):
+            return self
 
-        # merge
-        for i in other.set:
-            for index, s in enumerate(sets):
-                if any(item in s for item in i):
-                    sets[index] = s.union(frozenset(i))
-                    break
-            else:
-                sets.append(frozenset(i))
+        masks = list(self.masks)
+        for g in other.masks:
+            masks = insert_group(masks, g)
 
-        # filter overlapping
-        merged_set = frozenset(
-            i
-            for i in sets
-            if not any(i.issubset(j) for j in sets if j is not i)
-        )
-        return self.__class__(merged_set)
+        return self.__class__(groups=tuple(sorted(masks)))
 
     def is_colliding(self, agent: Agent) -> bool:
-        return any(agent.index in s for s in self.set)
+        return (self.mask >> agent.index) & 1 == 1
 
     def __len__(self) -> int:
-        return sum(len(s) for s in self.set)
+        return popcount(self.mask)
 
     def num_groups(self) -> int:
-        return len(self.set)
+        return len(self.masks)
 
     def groups(self) -> Iterator[frozenset[int]]:
-        yield from self.set
-
+        for g in self.masks:
+            yield from_mask(g)
@@ -1,6 +1,6 @@
 import unittest
 
-from python.mstar.rewrite.collisionset import RecursiveCollisionSet
+from python.mstar.rewrite.collisionset import RecursiveCollisionSet, NormalCollisionSet
 
 
 class TestRecursiveCollisionSet(unittest.TestCase):
@@ -69,5 +69,32 @@ class TestRecursiveCollisionSet(unittest.TestCase):
             self.assertEqual(ans, one.merge(two), f"{one.set} {two.set}")
 
 
+class TestNormalCollisionSet(unittest.TestCase):
+    def tests_from_colliding_indices(self):
+        s = NormalCollisionSet.from_colliding_indices([
+            (1, 2),
+            (2, 3),
+            (4, 5),
+        ])
+
+        self.assertEqual(s.set, frozenset([1, 2, 3, 4, 5]))
+        self.assertEqual(len(s), 5)
+
+    def test_subset_and_merge(self):
+        for a, b, subset in [
+            ([], [1, 2, 3], True),
+            ([1], [1, 2, 3], True),
+            ([1, 2, 3], [1, 2, 3], True),
+            ([4], [1, 2, 3], False),
+            ([1, 4], [1, 2, 3], False),
+        ]:
+            one = NormalCollisionSet.from_colliding_indices([(i, i) for i in a])
+            two = NormalCollisionSet.from_colliding_indices([(i, i) for i in b])
+
+            self.assertEqual(one.subset(two), subset, f"{one.set} {two.set}")
+            self.assertEqual(one.merge(two).set, frozenset(a + b))
+            self.assertEqual(two.merge(one).set, frozenset(a + b))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,13 +1,20 @@
 from __future__ import annotations
 from enum import Enum
-
-import resource
+from typing import Optional
 
 class MatchingStrategy(Enum):
     Prematch = 0,
     PruningPrematch = 1,
     SortedPruningPrematch = 2,
     Inmatch = 3,
+    # one best-first search over the states of all matchings, see unified_prematch.py
+    UnifiedPrematch = 4,
+
+
+class OpenListStrategy(Enum):
+    Heap = 0,
+    Buckets = 1,
+    Focal = 2,
 
 
 Byte = 1
@@ -27,6 +34,18 @@ class Config:
             max_memory_usage: int = 3 * GigaByte,
             debug: bool = False,
             report_expansions: bool = False,
+            open_list: OpenListStrategy = OpenListStrategy.Heap,
+            inflation: float = 1,
+            focal_weight: float = 1,
+            independence_detection: bool = False,
+            processes: int = 1,
+            reuse_collision_sets: bool = True,
+            transient_od_states: bool = False,
+            partial_expansion: bool = False,
+            distance_cache: Optional[str] = None,
+            distance_cache_max_bytes: int = 256 * MegaByte,
+            vectorized_expansion: bool = False,
+            assignment_heuristic: bool = False,
     ):
         self.operator_decomposition = operator_decomposition
         self.precompute_paths = precompute_paths
@@ -44,15 +63,83 @@ class Config:
         self.report_expansions = report_expansions
         self.expansions = []
 
+        self.open_list = open_list
+
+        # only with OpenListStrategy.Focal. States are expanded from those
+        # with a priority of at most focal_weight times the lowest priority
+        assert focal_weight >= 1, "focal weight must be at least 1"
+        self.focal_weight = focal_weight
+
+        # only plan agents together when their paths collide, see independence_detection.py
+        self.independence_detection = independence_detection
+
+        # number of processes searching matchings in parallel, only with prematch.
+        # Every process gets an equal share of max_memory_usage
+        assert processes >= 1, "at least one process is needed"
+        self.processes = processes
+
+        # keep the collision sets of states when the state cache is reused for the next matching,
+        # and share them between the matchings of unified prematch
+        self.reuse_collision_sets = reuse_collision_sets
+
+        # keep the intermediate states of operator decomposition out of the state cache,
+        # they only live on the open list (and as parents of the states made from them)
+        self.transient_od_states = transient_od_states
+        if self.transient_od_states:
+            assert self.operator_decomposition, "transient OD states need operator decomposition"
+
+        # enhanced partial expansion: only generate the children of a state with the same f as
+        # its priority, and put it back on the open list with the Δf of the next children
+        self.partial_expansion = partial_expansion
+        if self.partial_expansion:
+            assert not self.operator_decomposition, "partial expansion replaces operator decomposition"
+
+        if self.collision_avoidance_table:
+            assert self.open_list != OpenListStrategy.Buckets, "the collision avoidance table can't be used with buckets"
+        if self.matching_strategy == MatchingStrategy.UnifiedPrematch:
+            assert self.open_list == OpenListStrategy.Heap, "unified prematch needs to look at the lowest priority on the heap"
+        # directory in which the distance tables of goals are kept between runs, see DistanceCache.
+        # When its files take up more than distance_cache_max_bytes, the least recently used are deleted
+        self.distance_cache = distance_cache
+        self.distance_cache_max_bytes = distance_cache_max_bytes
+
+        # filter the joint moves of states with many of them with numpy, see expand_batch
+        self.vectorized_expansion = vectorized_expansion
+
+        # with inmatch, estimate every team by the cheapest assignment of its agents to its goals,
+        # instead of the distance of every agent to its closest goal. See AssignmentHeuristic
+        self.assignment_heuristic = assignment_heuristic
+        if self.assignment_heuristic:
+            assert self.inmatch, "the assignment heuristic is only for inmatch"
+            assert not self.partial_expansion, "partial expansion needs a heuristic which is a sum over agents"
+
+        # heuristic inflation factor. Found paths cost at most inflation times the optimal cost
+        assert inflation >= 1, "the heuristic can't be deflated"
+        self.inflation = inflation
+
+        # summed stats of the collision avoidance tables, see CollisionAvoidanceTable.stats
+        self.collision_avoidance_stats: dict[str, int] = {}
+        # summed stats of the state caches, see StateCache.stats
+        self.state_cache_stats: dict[str, int] = {}
+
     def report_expansion(self, size: int):
         self.expansions.append(size)
 
+    def report_collision_avoidance(self, stats: dict[str, int]):
+        for k, v in stats.items():
+            self.collision_avoidance_stats[k] = self.collision_avoidance_stats.get(k, 0) + v
+
+    def report_state_cache(self, stats: dict[str, int]):
+        for k, v in stats.items():
+            self.state_cache_stats[k] = self.state_cache_stats.get(k, 0) + v
+
     @property
     def prematch(self) -> bool:
         return (
                 self.matching_strategy == MatchingStrategy.Prematch or
                 self.matching_strategy == MatchingStrategy.PruningPrematch or
-                self.matching_strategy == MatchingStrategy.SortedPruningPrematch
+                self.matching_strategy == MatchingStrategy.SortedPruningPrematch or
+                self.matching_strategy == MatchingStrategy.UnifiedPrematch
         )
 
     @property
@@ -62,12 +149,23 @@ class Config:
                 self.matching_strategy == MatchingStrategy.SortedPruningPrematch
         )
 
+    @property
+    def suboptimality_bound(self) -> float:
+        """
+        Found paths cost at most this factor times the optimal cost
+        """
+        if self.open_list == OpenListStrategy.Focal:
+            return self.inflation * self.focal_weight
+        return self.inflation
+
     @property
     def inmatch(self) -> bool:
         return self.matching_strategy == MatchingStrategy.Inmatch
 
-    def memory_usage_ok(self) -> bool:
-        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    def memory_usage_ok(self, usage: int) -> bool:
+        """
+        usage is an estimate in bytes, see MemoryStats
+        """
 
         if self.debug:
             print(f"{usage / MegaByte} megabytes used out of {self.max_memory_usage / MegaByte}")
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from python.coord import Coord
+from python.mstar.rewrite.config import MegaByte
+from python.mstar.rewrite.grid import Grid
+
+# a file is this header followed by width * height little endian uint16 distances
+MAGIC = b"MSDT"
+HEADER = struct.Struct("<4sII")  # magic, width, height
+SUFFIX = ".dist"
+
+
+def grid_digest(grid: Grid) -> str:
+    """
+    Hash of the size and walls of a grid, the part of a cache key shared by all its goals.
+    """
+    h = hashlib.sha1()
+    h.update(struct.pack("<II", grid.width, grid.height))
+    h.update(np.packbits(grid.padded_free).tobytes())
+    return h.hexdigest()
+
+
+class DistanceCache:
+    """
+    Distance tables (see DistanceTable) kept on disk between runs and processes, keyed by
+    the grid and the goal cell. Files are memory mapped read only, so processes using the
+    same tables share them through the page cache.
+
+    When the files together take up more than max_bytes, evict deletes the least recently
+    used ones. Using a table touches its file, so the modification time is the time it was
+    last used. It scans the whole directory, so it's called once after storing all tables
+    of a PathCache, not after every table.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * MegaByte):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        # number of tables stored since the last evict
+        self.stored = 0
+
+    def path(self, digest: str, goal: Coord) -> Path:
+        return self.directory / f"{digest}_{goal.x}_{goal.y}{SUFFIX}"
+
+    def load(self, digest: str, grid: Grid, goal: Coord) -> Optional[np.ndarray]:
+        """
+        The memory mapped distances of goal, or None when they're not cached
+        (or the file doesn't belong to this grid, which is then overwritten later).
+        """
+        path = self.path(digest, goal)
+        try:
+            with open(path, "rb") as f:
+                magic, width, height = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or width != grid.width or height != grid.height or \
+                    path.stat().st_size != HEADER.size + 2 * width * height:
+                self.misses += 1
+                return None
+
+            distances = np.memmap(path, dtype="<u2", mode="r", offset=HEADER.size, shape=(width * height,))
+            os.utime(path)
+        except (FileNotFoundError, struct.error):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return distances
+
+    def store(self, digest: str, grid: Grid, goal: Coord, distances: np.ndarray):
+        path = self.path(digest, goal)
+
+        # write to a temporary file first, so other processes never see half a table
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, grid.width, grid.height))
+            f.write(distances.astype("<u2", copy=False).tobytes())
+        os.replace(tmp, path)
+
+        self.stored += 1
+
+    def evict(self):
+        """
+        Delete the least recently used files until the rest fit in max_bytes.
+        Tables which are already memory mapped stay valid after their file is deleted.
+        """
+        self.stored = 0
+
+        files = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # evicted by another process
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+from mapfmclient import MarkedLocation
+
+from python.coord import Coord
+from python.mstar.rewrite.config import Config
+from python.mstar.rewrite.distance_cache import DistanceCache, SUFFIX, grid_digest
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.path_cache import BFS, PathCache
+
+
+class TestDistanceCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+        grid = [[0] * 5 for _ in range(4)]
+        grid[1][2] = 1
+        grid[2][2] = 1
+        self.grid = Grid(grid)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_reused_between_runs(self):
+        cfg = Config(distance_cache=self.directory.name)
+        goals = [MarkedLocation(0, 4, 3), MarkedLocation(0, 0, 0)]
+
+        first = PathCache(cfg, self.grid, goals)
+        self.assertEqual(first.distance_cache.stats(), {"hits": 0, "misses": 2})
+
+        second = PathCache(cfg, self.grid, goals)
+        self.assertEqual(second.distance_cache.stats(), {"hits": 2, "misses": 0})
+
+        for goal in goals:
+            coord = Coord(goal.x, goal.y)
+            expected = BFS(coord, self.grid)
+            self.assertEqual(list(second.per_goal[coord].distances), list(expected.distances))
+
+    def test_other_grid_misses(self):
+        cache = DistanceCache(self.directory.name)
+        goal = Coord(0, 0)
+        cache.store(grid_digest(self.grid), self.grid, goal, BFS(goal, self.grid).distances)
+
+        other = Grid([[0] * 5 for _ in range(4)])
+        self.assertIsNone(cache.load(grid_digest(other), other, goal))
+        self.assertIsNotNone(cache.load(grid_digest(self.grid), self.grid, goal))
+
+    def test_evicts_least_recently_used(self):
+        digest = grid_digest(self.grid)
+        goals = [Coord(0, 0), Coord(1, 0), Coord(2, 0)]
+        tables = [BFS(goal, self.grid).distances for goal in goals]
+
+        # room for two tables
+        cache = DistanceCache(self.directory.name, max_bytes=2 * os.path.getsize(self.store_one(digest, goals[0], tables[0])))
+        cache.store(digest, self.grid, goals[1], tables[1])
+        os.utime(cache.path(digest, goals[0]), (0, 0))
+        os.utime(cache.path(digest, goals[1]), (1, 1))
+
+        # using goals[0] makes goals[1] the least recently used
+        self.assertIsNotNone(cache.load(digest, self.grid, goals[0]))
+        cache.store(digest, self.grid, goals[2], tables[2])
+        cache.evict()
+
+        remaining = sorted(name for name in os.listdir(self.directory.name) if name.endswith(SUFFIX))
+        self.assertEqual(remaining, sorted(cache.path(digest, goal).name for goal in (goals[0], goals[2])))
+
+    def store_one(self, digest, goal, distances) -> str:
+        cache = DistanceCache(self.directory.name)
+        cache.store(digest, self.grid, goal, distances)
+        return str(cache.path(digest, goal))
+
+    def test_evicts_after_path_cache(self):
+        goals = [MarkedLocation(0, 4, 3), MarkedLocation(0, 0, 0), MarkedLocation(0, 1, 0)]
+
+        # no room for any table, the path cache keeps its tables in memory anyway
+        cfg = Config(distance_cache=self.directory.name, distance_cache_max_bytes=1)
+        path_cache = PathCache(cfg, self.grid, goals)
+        self.assertEqual(path_cache.distance_cache.stored, 0)
+
+        remaining = [name for name in os.listdir(self.directory.name) if name.endswith(SUFFIX)]
+        self.assertEqual(remaining, [])
@@ -1,29 +1,67 @@
-from typing import Iterable
+from typing import Optional
+
+import numpy as np
 
 from python.mstar.rewrite.find_path_params import FindPathParams
 from python.mstar.rewrite.agent import Agent
+from python.mstar.rewrite.collisionset import find_collisions
 from python.mstar.rewrite.grid import Grid
 from python.mstar.rewrite.identifier import Identifier
 from python.mstar.rewrite.state import State
 
 import itertools
 
+# number of joint moves from which expand uses expand_batch, with cfg.vectorized_expansion
+BATCH_MIN_CHILDREN = 16
+# most moves an agent can make: waiting and the four directions
+MAX_MOVES = 5
+
+
+class Expansion:
+    """
+    Result of expanding a state. Children in which agents collide are never turned into
+    states, instead only the indices of the colliding agents are remembered, so they can
+    be added to the collision set of the expanded state.
+    """
+
+    def __init__(self):
+        self.children: list[Identifier] = []
+        self.collisions: list[tuple[int, int]] = []
+        self.num_colliding = 0
+
+        # heuristics of the children, when they were calculated together (see expand_batch)
+        self.heuristics: Optional[list[int]] = None
+
+    def add(self, curr_agents: tuple[Agent, ...], new_agents: tuple[Agent, ...]):
+        """
+        Add a complete joint move from curr_agents to new_agents,
+        unless two agents collide while making it.
+        """
+        collisions = find_collisions(curr_agents, new_agents)
+        if len(collisions) == 0:
+            self.children.append(Identifier(new_agents, new_agents))
+        else:
+            self.collisions.extend(collisions)
+            self.num_colliding += 1
+
+    def __len__(self) -> int:
+        return len(self.children) + self.num_colliding
+
 
 def expand_position(agent: Agent, grid: Grid) -> list[Agent]:
     """
     Find all positions an agent can move to from its current position.
     Only returns positions which are not walls and are in bounds.
     """
-    # TODO: verify
     return [
-        agent.with_new_position(n_pos)
-        for n_pos in grid.get_empty_moves(agent.location)
+        agent.with_new_cell(cell)
+        for cell in grid.empty_move_cells(agent.cell)
     ]
 
 
-def expand(curr_state: State, params: FindPathParams) -> Iterable[Identifier]:
+def agent_moves(curr_state: State, params: FindPathParams) -> list[list[Agent]]:
     """
-    Expand a state into it's children states
+    The moves every agent makes in the children of a state, see expand.
     """
 
     per_agent_expansion = []
@@ -36,13 +74,108 @@ def expand(curr_state: State, params: FindPathParams) -> Iterable[Identifier]:
 
         # otherwise, expand following the individually optimal path
         else:
-            res = params.optimal_path.best_move(agent)
+            res = params.optimal_path.best_move(agent, curr_state.time, curr_state.identifier)
 
         per_agent_expansion.append(res)
 
-    new_identifiers = itertools.product(*per_agent_expansion)
+    return per_agent_expansion
 
-    return [
-        Identifier(part, part)
-        for part in new_identifiers
-    ]
+
+def num_joint_moves(per_agent_expansion: list[list[Agent]]) -> int:
+    num_children = 1
+    for moves in per_agent_expansion:
+        num_children *= len(moves)
+    return num_children
+
+
+def expand(curr_state: State, params: FindPathParams, per_agent_expansion: Optional[list[list[Agent]]] = None) -> Expansion:
+    """
+    Expand a state into it's children states. per_agent_expansion are
+    the moves of every agent, when they were already found with agent_moves.
+    """
+    if per_agent_expansion is None:
+        per_agent_expansion = agent_moves(curr_state, params)
+
+    if params.cfg.vectorized_expansion:
+        if num_joint_moves(per_agent_expansion) >= BATCH_MIN_CHILDREN:
+            return expand_batch(curr_state, per_agent_expansion, params)
+
+    expansion = Expansion()
+    curr_agents = curr_state.identifier.actual
+
+    for part in itertools.product(*per_agent_expansion):
+        expansion.add(curr_agents, part)
+
+    return expansion
+
+
+def expand_batch(curr_state: State, per_agent_expansion: list[list[Agent]], params: FindPathParams) -> Expansion:
+    """
+    The same expansion as expand, but the joint moves are filtered with numpy: which moves
+    of two agents collide is worked out once for every pair of agents, and only looked up for
+    every joint move. The heuristics of the children are summed from per move differences.
+    Only the children without collisions are turned into identifiers.
+    """
+    curr_agents = curr_state.identifier.actual
+    num_agents = len(curr_agents)
+
+    # packed position after every move of every agent. Missing moves get
+    # distinct negative values, so they're never equal to anything
+    moves = -np.arange(1, num_agents * MAX_MOVES + 1, dtype=np.int64).reshape(num_agents, MAX_MOVES)
+    for index, agent_moves in enumerate(per_agent_expansion):
+        moves[index, :len(agent_moves)] = [agent.packed for agent in agent_moves]
+    curr = np.array([agent.packed for agent in curr_agents], dtype=np.int64)
+
+    # conflicts[i, j, a, b]: agent i making move a collides with agent j making move b,
+    # because they end up on the same position or because they swap positions
+    vertex = moves[:, None, :, None] == moves[None, :, None, :]
+    swap = (moves[:, None, :, None] == curr[None, :, None, None]) & (moves[None, :, None, :] == curr[:, None, None, None])
+    conflicts = vertex | swap
+    pairs = np.argwhere(np.triu(conflicts.any(axis=(2, 3)), k=1)).tolist()
+
+    # the move every agent with a choice makes in every joint move, in the order of itertools.product
+    varying = [index for index, agent_moves in enumerate(per_agent_expansion) if len(agent_moves) > 1]
+    counts = [len(per_agent_expansion[index]) for index in varying]
+    num_children = int(np.prod(counts))
+    choices = np.indices(counts, dtype=np.int8).reshape(len(varying), num_children)
+    # agents without a choice always make move 0
+    choice = {index: choices[row] for row, index in enumerate(varying)}
+
+    expansion = Expansion()
+
+    colliding = np.zeros(num_children, dtype=bool)
+    for i, j in pairs:
+        colliding |= conflicts[i, j][choice.get(i, 0), choice.get(j, 0)]
+        expansion.collisions.append((curr_agents[i].index, curr_agents[j].index))
+
+    survivors = np.flatnonzero(~colliding)
+    expansion.num_colliding = num_children - len(survivors)
+
+    # the assignment heuristic isn't a sum over agents, so it can't be computed from per move changes
+    with_heuristics = curr_state.heuristic is not None and not params.cfg.assignment_heuristic
+    agent_heuristic = params.heuristic.agent_heuristic
+    heuristics = np.zeros(len(survivors), dtype=np.int64)
+
+    columns = []
+    for index, (agent, agent_moves) in enumerate(zip(curr_agents, per_agent_expansion)):
+        if with_heuristics:
+            deltas = np.array([agent_heuristic(move) - agent_heuristic(agent) for move in agent_moves], dtype=np.int64)
+
+        if index in choice:
+            chosen = choice[index][survivors]
+            options = np.empty(len(agent_moves), dtype=object)
+            options[:] = agent_moves
+
+            columns.append(options[chosen].tolist())
+            if with_heuristics:
+                heuristics += deltas[chosen]
+        else:
+            columns.append(itertools.repeat(agent_moves[0], len(survivors)))
+            if with_heuristics:
+                heuristics += deltas[0]
+
+    expansion.children = [Identifier(agents, agents) for agents in zip(*columns)]
+    if with_heuristics:
+        expansion.heuristics = (heuristics + curr_state.heuristic).tolist()
+
+    return expansion
@@ -1,15 +1,15 @@
 from __future__ import annotations
 
-from typing import Iterable
 from python.mstar.rewrite.config import Config
 from python.mstar.rewrite.agent import Agent
 from python.mstar.rewrite.collisionset import RecursiveCollisionSet
 from python.mstar.rewrite.recurse import optimal_policy
 from python.mstar.rewrite.state import State
 from python.mstar.rewrite.identifier import Identifier
-from python.mstar.rewrite.expand import expand_position
+from python.mstar.rewrite.expand import expand_position, Expansion
+from python.mstar.rewrite.memory import OutOfMemory
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Union
 
 if TYPE_CHECKING:
     from python.mstar.rewrite.find_path_params import FindPathParams
@@ -20,7 +20,11 @@ def expand_od(
         cfg: Config,
         curr_state: State,
         params: FindPathParams
-) -> Iterable[Identifier]:
+) -> Union[Expansion, OutOfMemory]:
+    """
+    With cfg.recursive, OutOfMemory is returned when a sub search of a collision
+    group used more than cfg.max_memory_usage.
+    """
     next_partial = []
 
     if curr_state.is_standard:
@@ -47,11 +51,14 @@ def expand_od(
                     res = optimal_policy(
                         disjoint_collision_group,
                         curr_state.identifier.actual,
-                        params
+                        params,
+                        curr_state.time,
                     )
-                    # if res is None:
-                    #     return []
-
+                    if isinstance(res, OutOfMemory):
+                        return res
+                    if res is None:
+                        # the group can't reach its goals, so no path goes through this state
+                        return Expansion()
 
                     for k, v in res.items():
                         next_partial_table[k] = v
@@ -64,7 +71,8 @@ def expand_od(
                 for k, val in optimal_policy(
                         frozenset((d, )),  # just one agent in the collision set, aka not colliding with anything else
                         curr_state.identifier.actual,
-                        params
+                        params,
+                        curr_state.time,
                 ).items():
                     next_partial_table[k] = val
             next_partial = list(next_partial_table.values())
@@ -76,7 +84,7 @@ def expand_od(
                 if curr_state.collision_set.contains_agent(agent):
                     next_partial.append(agent.make_uncalculated())
                 else:
-                    next_partial.append(params.optimal_path.best_move(agent)[-1])
+                    next_partial.append(params.optimal_path.best_move(agent, curr_state.time, curr_state.identifier)[-1])
     else:
         # we're already at a partial node, expand it
         next_partial = list(curr_state.identifier.partial)
@@ -88,6 +96,7 @@ def expand_od(
             last_partial_index = i
             break
 
+    expansion = Expansion()
     next_states = []
     if last_partial_index is None:
         # there's no uncalculated part found, so this node must be complete
@@ -99,29 +108,26 @@ def expand_od(
         actual_pos: Agent = curr_state.identifier.actual[last_partial_index]
         new_agent_positions = expand_position(actual_pos, params.grid)
 
-        # make sure no other agent is partially at this partial position
-        positions_taken = [p for p in next_partial if not p.is_uncalculated()]
-        valid_new_agent_positions = [
-            p
-            for p in new_agent_positions
-            if p not in positions_taken
-        ]
-
-        # none were valid, this partial expansion was useless so discard it
-        if len(valid_new_agent_positions) == 0:
-            return []
+        # make sure no other agent is partially at this partial position. When there is,
+        # they collide, and the other agent may have to make another move too
+        positions_taken = {p.packed: p.index for p in next_partial if not p.is_uncalculated()}
+        valid_new_agent_positions = []
+        for p in new_agent_positions:
+            other = positions_taken.get(p.packed)
+            if other is None:
+                valid_new_agent_positions.append(p)
+            else:
+                expansion.collisions.append((actual_pos.index, other))
+
         for agent in valid_new_agent_positions:
             next_partial[last_partial_index] = agent
             next_states.append(tuple(next_partial))
 
-    return [
-        Identifier(
-            tuple(next_state),
-
-            curr_state.identifier.actual
-            if any(i.is_uncalculated() for i in next_state) else
-            tuple(next_state)
-        )
+    for next_state in next_states:
+        if any(i.is_uncalculated() for i in next_state):
+            expansion.children.append(Identifier(next_state, curr_state.identifier.actual))
+        else:
+            # a complete state, check the whole joint move for collisions
+            expansion.add(curr_state.identifier.actual, next_state)
 
-        for next_state in next_states
-    ]
+    return expansion
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from typing import Iterator, Optional
+
+from python.mstar.rewrite.agent import Agent
+from python.mstar.rewrite.expand import Expansion, expand_position
+from python.mstar.rewrite.goal import stays_on_goal
+from python.mstar.rewrite.state import State
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from python.mstar.rewrite.find_path_params import FindPathParams
+
+# moves of one agent, sorted by the change in f (Δf) they cause
+Operators = list[tuple[int, Agent]]
+
+
+class OperatorTable:
+    """
+    Every move of an agent changes f (cost + heuristic) of the state it is made from by
+    the cost of the move plus the change in the agent's heuristic. Because the heuristic
+    is a sum over agents, the Δf of a joint move is the sum of the Δf of its per agent moves.
+
+    The moves of colliding agents only depend on their position, so they're sorted by Δf
+    once per position and kept. Moves of other agents may depend on the time through the
+    collision avoidance table, so those are sorted every time.
+    """
+
+    def __init__(self, params: FindPathParams):
+        self.params = params
+
+        # agent index << 32 | packed agent -> all moves of that agent
+        self.tables: dict[int, Operators] = {}
+
+    def delta(self, agent: Agent, move: Agent) -> int:
+        goal = self.params.goal
+        agent_heuristic = self.params.heuristic.agent_heuristic
+
+        # waiting on the goal is free, see transition_cost
+        cost = 0 if stays_on_goal(goal, agent, move) else 1
+        return cost + agent_heuristic(move) - agent_heuristic(agent)
+
+    def sort(self, agent: Agent, moves: list[Agent]) -> Operators:
+        return sorted(((self.delta(agent, move), move) for move in moves), key=lambda i: i[0])
+
+    def all_moves(self, agent: Agent) -> Operators:
+        key = agent.index << 32 | agent.packed
+
+        operators = self.tables.get(key)
+        if operators is None:
+            operators = self.sort(agent, expand_position(agent, self.params.grid))
+            self.tables[key] = operators
+        return operators
+
+
+def reachable_deltas(per_agent: list[Operators]) -> list[set[int]]:
+    """
+    For every index i, the sums of Δf the agents from i onwards can make together.
+    """
+    reachable = [{0}]
+    for operators in reversed(per_agent):
+        deltas = {delta for delta, _ in operators}
+        reachable.append({delta + rest for delta in deltas for rest in reachable[-1]})
+
+    reachable.reverse()
+    return reachable
+
+
+def joint_moves(
+        per_agent: list[Operators],
+        reachable: list[set[int]],
+        delta: int,
+        index: int = 0,
+) -> Iterator[tuple[Agent, ...]]:
+    """
+    All joint moves of the agents from index onwards with a total Δf of exactly delta.
+    Moves after which the other agents can't make up the rest of delta are never tried.
+    """
+    if index == len(per_agent):
+        yield ()
+        return
+
+    # an inflated heuristic can make Δf negative, so the rest may make up for a larger one
+    lowest_rest = min(reachable[index + 1])
+    for agent_delta, move in per_agent[index]:
+        if agent_delta + lowest_rest > delta:
+            break
+
+        if delta - agent_delta in reachable[index + 1]:
+            for rest in joint_moves(per_agent, reachable, delta - agent_delta, index + 1):
+                yield (move,) + rest
+
+
+def expand_partial(curr_state: State, params: FindPathParams, operators: OperatorTable) -> tuple[Expansion, Optional[int]]:
+    """
+    Enhanced partial expansion: only generate the children with a Δf of curr_state.partial_delta,
+    or the ones with a Δf of at most 0 when it is None. The other children would have a higher
+    priority, so they're only generated once the state comes up again with that priority.
+
+    Returns the expansion and the next Δf to expand the state with, or None when all
+    children have been generated.
+    """
+
+    per_agent: list[Operators] = []
+    for agent in curr_state.identifier.actual:
+        agent: Agent
+
+        # like expand: colliding agents make all moves, the others follow their optimal path
+        if curr_state.collision_set.is_colliding(agent):
+            per_agent.append(operators.all_moves(agent))
+        else:
+            per_agent.append(operators.sort(agent, params.optimal_path.best_move(agent, curr_state.time)))
+
+    reachable = reachable_deltas(per_agent)
+
+    if curr_state.partial_delta is None:
+        # an inflated heuristic may decrease by more than the cost of a move
+        deltas = sorted(delta for delta in reachable[0] if delta <= 0)
+        current = 0
+    else:
+        deltas = [curr_state.partial_delta]
+        current = curr_state.partial_delta
+
+    expansion = Expansion()
+    curr_agents = curr_state.identifier.actual
+
+    for delta in deltas:
+        for part in joint_moves(per_agent, reachable, delta):
+            expansion.add(curr_agents, part)
+
+    next_delta = min((delta for delta in reachable[0] if delta > current), default=None)
+    return expansion, next_delta
@@ -0,0 +1,41 @@
+import itertools
+import unittest
+
+from python.mstar.rewrite import mstar
+from python.mstar.rewrite.config import Config, MatchingStrategy
+from python.mstar.rewrite.expand_partial import joint_moves, reachable_deltas
+from python.mstar.rewrite.find_path_test import obstacles_problem
+
+
+class TestJointMoves(unittest.TestCase):
+    def test_partitioned_by_delta(self):
+        # moves are stand-in strings, only the Δf matters
+        per_agent = [
+            [(0, "a0"), (1, "a1"), (2, "a2")],
+            [(0, "b0"), (2, "b2")],
+            [(-1, "c-1"), (1, "c1")],
+        ]
+        reachable = reachable_deltas(per_agent)
+
+        found = []
+        for delta in sorted(reachable[0]):
+            moves = list(joint_moves(per_agent, reachable, delta))
+            self.assertNotEqual(len(moves), 0)
+            found.extend(moves)
+
+        expected = list(itertools.product(*([move for _, move in operators] for operators in per_agent)))
+        self.assertEqual(sorted(found), sorted(expected))
+
+
+class TestPartialExpansion(unittest.TestCase):
+    def test_same_cost(self):
+        p = obstacles_problem(4)
+
+        for kwargs in (
+                {"matching_strategy": MatchingStrategy.Prematch},
+                {"matching_strategy": MatchingStrategy.Inmatch},
+                {"matching_strategy": MatchingStrategy.UnifiedPrematch, "collision_avoidance_table": True},
+        ):
+            expected = mstar(Config(**kwargs), p)
+            found = mstar(Config(partial_expansion=True, **kwargs), p)
+            self.assertEqual(found.cost, expected.cost)
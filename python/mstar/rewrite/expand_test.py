@@ -0,0 +1,80 @@
+import itertools
+import unittest
+
+from mapfmclient import MarkedLocation
+
+from python.coord import Coord
+from python.mstar.rewrite import Config, MatchingWithHeuristic
+from python.mstar.rewrite.collisionset import NormalCollisionSet
+from python.mstar.rewrite.expand import Expansion, expand_batch, expand_position
+from python.mstar.rewrite.expand_od import expand_od
+from python.mstar.rewrite.find_path_params import FindPathParams
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.identifier import Identifier
+from python.mstar.rewrite.path_cache import PathCache
+from python.mstar.rewrite.state import State
+from python.mstar.rewrite.statecache import StateCache
+
+
+class TestExpandBatch(unittest.TestCase):
+    def test_same_as_product(self):
+        grid = [[0] * 4 for _ in range(4)]
+        grid[1][2] = 1
+        # agents next to each other, so they can collide and swap
+        starts = [MarkedLocation(0, 1, 1), MarkedLocation(0, 2, 2), MarkedLocation(1, 1, 2), MarkedLocation(1, 3, 3)]
+        goals = [MarkedLocation(0, 3, 0), MarkedLocation(0, 0, 3), MarkedLocation(1, 0, 0), MarkedLocation(1, 3, 1)]
+
+        cfg = Config()
+        g = Grid(grid)
+        path_cache = PathCache(cfg, g, goals)
+        state_cache = StateCache(cfg, State)
+        start = state_cache.get(Identifier.from_marked_locations(starts, g.agents))
+        matching = MatchingWithHeuristic(cfg, goals, start, state_cache, path_cache, [])
+        params = FindPathParams(cfg, matching.goal, len(starts), g, matching.optimal_path, state_cache, matching.heuristic)
+
+        start.set_heuristic(matching.heuristic)
+        start.collision_set = NormalCollisionSet(0b0111)
+
+        per_agent_expansion = [
+            expand_position(agent, g) if start.collision_set.is_colliding(agent) else matching.optimal_path.best_move(agent)
+            for agent in start.identifier.actual
+        ]
+
+        expected = Expansion()
+        for part in itertools.product(*per_agent_expansion):
+            expected.add(start.identifier.actual, part)
+
+        found = expand_batch(start, per_agent_expansion, params)
+
+        self.assertEqual([i.key for i in found.children], [i.key for i in expected.children])
+        self.assertEqual(found.num_colliding, expected.num_colliding)
+        self.assertEqual(
+            NormalCollisionSet.from_colliding_indices(found.collisions).mask,
+            NormalCollisionSet.from_colliding_indices(expected.collisions).mask,
+        )
+
+        for identifier, heuristic in zip(found.children, found.heuristics):
+            self.assertEqual(heuristic, matching.heuristic.heuristic(State(cfg, identifier)))
+
+
+class TestExpandOd(unittest.TestCase):
+    def test_partial_collision(self):
+        starts = [MarkedLocation(0, 0, 0), MarkedLocation(0, 2, 0), MarkedLocation(0, 3, 0)]
+        goals = [MarkedLocation(0, 3, 0), MarkedLocation(0, 1, 0), MarkedLocation(0, 0, 0)]
+
+        cfg = Config(operator_decomposition=True)
+        g = Grid([[0, 0, 0, 0]])
+        path_cache = PathCache(cfg, g, goals)
+        state_cache = StateCache(cfg, State)
+        start = state_cache.get(Identifier.from_marked_locations(starts, g.agents))
+        matching = MatchingWithHeuristic(cfg, goals, start, state_cache, path_cache, [])
+        params = FindPathParams(cfg, matching.goal, len(starts), g, matching.optimal_path, state_cache, matching.heuristic)
+
+        # agent 0 already moved to (1, 0), agents 1 and 2 have yet to move
+        actual = start.identifier.actual
+        partial = (actual[0].with_new_position(Coord(1, 0)), actual[1].make_uncalculated(), actual[2].make_uncalculated())
+        found = expand_od(cfg, state_cache.get(Identifier(partial, actual)), params)
+
+        self.assertEqual(sorted(i.partial[1].x for i in found.children), [2, 3])
+        # agent 1 moving to (1, 0) too collides with agent 0
+        self.assertEqual(found.collisions, [(1, 0)])
@@ -1,43 +1,62 @@
-from typing import Optional
+from math import inf
+from typing import Callable, Optional, Union
 
 from python.mstar.rewrite.find_path_params import FindPathParams
 from python.mstar.rewrite.heuristic import Heuristic
+from python.mstar.rewrite.identifier import Identifier
 from python.mstar.rewrite.state import State
-from python.mstar.rewrite.expand import expand
+from python.mstar.rewrite.expand import agent_moves, expand, num_joint_moves
 from python.mstar.rewrite.expand_od import expand_od
-from python.mstar.rewrite.goal import Goal
+from python.mstar.rewrite.expand_partial import OperatorTable, expand_partial
+from python.mstar.rewrite.goal import Goal, stays_on_goal
 from python.mstar.rewrite.path import Path
 from python.mstar.rewrite.collisionset import CollisionSet
-from python.priority_queue.fast_contains import FastContainsPriorityQueue
+from python.mstar.rewrite.config import Config, OpenListStrategy
+from python.mstar.rewrite.memory import MemoryStats, OutOfMemory, SAMPLE_INTERVAL
+from python.mstar.rewrite.path_cache import UNREACHABLE
+from python.priority_queue.bucket import BucketPriorityQueue
+from python.priority_queue.focal import FocalPriorityQueue
+from python.priority_queue.lazy_deletion import LazyDeletionPriorityQueue
 
 from tqdm import tqdm
 
 
-def find_collisions(curr_state: State, new_state: State) -> CollisionSet:
-    res: list[tuple[int, int]] = []
+def nearest_standard(state: State) -> Optional[State]:
+    """
+    The state itself if it's standard, otherwise its closest standard ancestor
+    """
+    while state is not None and not state.is_standard:
+        state = state.parent
+    return state
 
-    curr_agents = curr_state.identifier.actual
-    new_agents = new_state.identifier.actual
 
-    for a1 in range(len(curr_agents)):
-        for a2 in range(min(a1, len(new_agents))):
-            if new_agents[a1] == new_agents[a2]:
-                res.append((new_agents[a1].index, new_agents[a2].index))
+def tie_break(state: State, cfg: Config):
+    """
+    States with the same priority are ordered by heuristic. With a collision
+    avoidance table, states with fewer conflicts on the way there go first after that.
+    """
+    if cfg.collision_avoidance_table:
+        return state.heuristic, state.conflicts
+    return state.heuristic
 
-            elif curr_agents[a1] == new_agents[a2] and new_agents[a1] == curr_agents[a2]:
-                res.append((new_agents[a1].index, new_agents[a2].index))
 
-    return curr_state.collision_set.__class__.from_colliding_indices(res)
+def focal_key(state: State):
+    """
+    With focal search, states with the fewest colliding agents are expanded first,
+    as every colliding agent multiplies the number of children.
+    """
+    return len(state.collision_set), state.conflicts
 
 
 def backprop(
         curr_state: State,
-        new_state: State,
-        pq: FastContainsPriorityQueue,
+        collision_set: CollisionSet,
+        pq: LazyDeletionPriorityQueue,
         heuristic: Heuristic,
+        cfg: Config,
 ):
     stack: list[tuple[State, CollisionSet]] = [
-        (curr_state, new_state.collision_set)
+        (curr_state, collision_set)
     ]
 
     while len(stack) != 0:
@@ -46,14 +65,32 @@ def backprop(
         if parent_state.is_standard and \
                 not current_collision_set.subset(parent_state.collision_set):
             parent_state.merge_collision_sets(current_collision_set)
-            if parent_state not in pq:
+            # states left over from an earlier search (cost reset to inf) aren't
+            # reachable in this one, so they don't have to be expanded again.
+            # A partially expanded state has to be expanded from the start with
+            # its new collision set, at its own priority
+            if (parent_state not in pq or parent_state.partial_delta is not None) and parent_state.cost != inf:
+                parent_state.partial_delta = None
                 parent_state.set_heuristic(heuristic)
-                pq.enqueue(parent_state)
+                pq.enqueue(parent_state, parent_state.priority, tie_break(parent_state, cfg))
 
             for v_m in parent_state.get_back_set():
                 stack.append((v_m, parent_state.collision_set))
 
 
+def memory_stats(params: FindPathParams, pq: LazyDeletionPriorityQueue) -> MemoryStats:
+    states = len(params.state_cache)
+    if params.state_cache_cache is not None:
+        states += params.state_cache_cache.num_states()
+
+    return MemoryStats(
+        num_agents=params.num_agents,
+        states=states,
+        open_list_entries=pq.stats()["entries"],
+        path_cache_bytes=params.path_cache.nbytes if params.path_cache is not None else 0,
+    )
+
+
 def transition_cost(
     curr_state: State,
     new_state: State,
@@ -74,7 +111,7 @@ def transition_cost(
                 curr_state.identifier.actual,
                 new_state.identifier.actual
         ):
-            if goal.on_goal(curr_agent) and goal.on_goal(new_agent):
+            if stays_on_goal(goal, curr_agent, new_agent):
                 num_agents_stay_on_goal += 1
 
         return num_agents - num_agents_stay_on_goal
@@ -86,7 +123,7 @@ def transition_cost(
             new_state.identifier.partial
         ):
             if not new_agent.is_uncalculated() and \
-                    not (goal.on_goal(curr_agent) and goal.on_goal(new_agent)):
+                    not stays_on_goal(goal, curr_agent, new_agent):
                 cost += 1
         return cost
     elif not curr_state.is_standard and new_state.is_standard:
@@ -97,7 +134,7 @@ def transition_cost(
                 curr_state.identifier.actual,
         ):
             if curr_agent.is_uncalculated() and \
-                    not (goal.on_goal(curr_agent_actual) and goal.on_goal(new_agent)):
+                    not stays_on_goal(goal, curr_agent_actual, new_agent):
                 cost += 1
         return cost
     else:
@@ -109,89 +146,252 @@ def transition_cost(
         ):
             if curr_agent.is_uncalculated() and \
                     not new_agent.is_uncalculated() and \
-                    not (goal.on_goal(curr_agent_actual) and goal.on_goal(new_agent)):
+                    not stays_on_goal(goal, curr_agent_actual, new_agent):
                 cost += 1
         return cost
 
 
-def find_path(
-        start: State,
-
-        params: FindPathParams
-) -> Optional[Path]:
-    pq = FastContainsPriorityQueue()
-    start.cost = 0
-    start.set_heuristic(params.heuristic)
-    pq.enqueue(start)
+class Search:
+    """
+    A search from a start state to params.goal, which is advanced one expansion
+    at a time with step. See find_path.
+    """
 
-    while not pq.empty():
-        # if not params.cfg.memory_usage_ok():
-        #     tqdm.write("memory limiter")
-        #     return None
+    def __init__(self, start: State, params: FindPathParams, shared_memory_stats: Optional[Callable[[], MemoryStats]] = None):
+        """
+        shared_memory_stats samples the memory of all searches which share cfg.max_memory_usage,
+        when it's not just this one.
+        """
+        self.params = params
+
+        if params.cfg.open_list == OpenListStrategy.Buckets:
+            self.pq = BucketPriorityQueue(int(UNREACHABLE))
+        elif params.cfg.open_list == OpenListStrategy.Focal:
+            self.pq = FocalPriorityQueue(params.cfg.focal_weight, focal_key)
+        else:
+            self.pq = LazyDeletionPriorityQueue()
+
+        self.cat = params.optimal_path.collision_avoidance_table
+
+        # set when the open list ran out, or nothing left can beat the incumbent
+        self.done = False
+
+        # only with cfg.transient_od_states: key -> partial state, for the partial states on the open list
+        self.open_partial: dict[bytes, State] = {}
+        # number of partial states made outside the state cache
+        self.transient_states = 0
+
+        # number of states made by expansions, the memory usage is sampled
+        # whenever this grows past next_sample (see check_memory)
+        self.generated = 0
+        self.next_sample = SAMPLE_INTERVAL
+        self.shared_memory_stats = shared_memory_stats if shared_memory_stats is not None else self.memory_stats
+
+        # only with cfg.partial_expansion
+        self.operators = OperatorTable(params) if params.cfg.partial_expansion else None
+
+        start.cost = 0
+        start.conflicts = 0
+        start.set_heuristic(params.heuristic)
+        self.pq.enqueue(start, start.priority, tie_break(start, params.cfg))
+
+    def memory_stats(self) -> MemoryStats:
+        stats = memory_stats(self.params, self.pq)
+        stats.states += len(self.open_partial)
+        return stats
+
+    def check_memory(self, new_states: int) -> Optional[OutOfMemory]:
+        """
+        Sample the memory usage once every SAMPLE_INTERVAL generated states. A single
+        expansion can make many states, so the (at most) new_states about to be added
+        are counted in the sample, and the search is aborted before they're made.
+        """
+        self.generated += new_states
+        if self.generated < self.next_sample:
+            return None
+        self.next_sample = self.generated + SAMPLE_INTERVAL
+
+        stats = self.shared_memory_stats()
+        stats.states += new_states
+        stats.open_list_entries += new_states
+        if self.params.cfg.memory_usage_ok(stats.estimated_bytes):
+            return None
+
+        tqdm.write("memory limiter")
+        self.done = True
+        return OutOfMemory(stats, self.params.cfg.max_memory_usage)
+
+    def get_state(self, identifier: Identifier) -> State:
+        """
+        With cfg.transient_od_states, partial states are only looked up on the open
+        list, and made outside the state cache. Other states come from the state cache.
+        """
+        if not self.params.cfg.transient_od_states or identifier.is_standard:
+            return self.params.state_cache.get(identifier)
+
+        state = self.open_partial.get(identifier.key)
+        if state is None:
+            state = self.params.state_cache.constructor(self.params.cfg, identifier)
+            self.transient_states += 1
+        return state
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "transient states": self.transient_states,
+        }
+
+    def step(self) -> Union[Path, OutOfMemory, None]:
+        """
+        Expand the next state on the open list. Returns the path
+        when it was a goal state, after which the search is done.
+        Returns OutOfMemory when the search (or with cfg.recursive, a sub
+        search) used more than cfg.max_memory_usage.
+        """
+        params = self.params
+        pq = self.pq
+        cat = self.cat
+        incumbent = params.incumbent
 
         curr_state: State = pq.dequeue()
 
+        if params.cfg.transient_od_states and not curr_state.is_standard:
+            # after this, the state is only kept alive by the states made from it
+            del self.open_partial[curr_state.identifier.key]
+            pq.forget(curr_state)
+
+        if incumbent is not None and curr_state.priority >= incumbent.cost:
+            # the open list is ordered by priority, so nothing left can beat the incumbent.
+            # Focal search doesn't dequeue in order of priority, cheaper states may be left
+            self.done = params.cfg.open_list != OpenListStrategy.Focal or pq.empty()
+            return None
+
         if params.cfg.debug:
             tqdm.write(repr(curr_state))
 
         if params.goal.is_goal(curr_state):
+            if params.cfg.debug:
+                tqdm.write(repr(pq.stats()))
+
             if params.cfg.recursive:
                 curr_state.set_child_pointers()
 
+            self.done = True
             return curr_state.backtrack()
 
         if params.cfg.recursive and curr_state.has_child():
             curr_state.set_child_pointers()
             child = curr_state.find_deepest_child()
             assert params.goal.is_goal(child)
+            self.done = True
             return child.backtrack()
 
 
         if params.cfg.operator_decomposition:
             expansion = expand_od(params.cfg, curr_state, params)
+            if isinstance(expansion, OutOfMemory):
+                self.done = True
+                return expansion
+            out_of_memory = self.check_memory(len(expansion.children))
+        elif params.cfg.partial_expansion:
+            expansion, next_delta = expand_partial(curr_state, params, self.operators)
+            # the children with a higher Δf come later, at the priority they'll have
+            curr_state.partial_delta = next_delta
+            if next_delta is not None and (incumbent is None or curr_state.priority + next_delta < incumbent.cost):
+                pq.enqueue(curr_state, curr_state.priority + next_delta, tie_break(curr_state, params.cfg))
+            out_of_memory = self.check_memory(len(expansion.children))
         else:
-            expansion = expand(curr_state, params)
-
-        if params.cfg.report_expansions:
-            params.cfg.report_expansion(len(list(expansion)))
+            # with many colliding agents, making the joint moves alone can take more memory than
+            # is left, so they're counted before expand makes them
+            per_agent_expansion = agent_moves(curr_state, params)
+            out_of_memory = self.check_memory(num_joint_moves(per_agent_expansion))
+            if out_of_memory is None:
+                expansion = expand(curr_state, params, per_agent_expansion)
 
+        if out_of_memory is not None:
+            return out_of_memory
 
-        for new_identifier in expansion:
-            new_state = params.state_cache.get(new_identifier)
-
-            collisions: Optional[CollisionSet]
-            if new_state.is_standard:
-                collisions = find_collisions(
-                    curr_state,
-                    new_state
-                )
+        if params.cfg.report_expansions:
+            params.cfg.report_expansion(len(expansion))
+
+        standard_ancestor = nearest_standard(curr_state)
+
+        # joint moves in which agents collided were left out of the expansion,
+        # their collisions go straight to the collision set of the state they were made from
+        if len(expansion.collisions) != 0 and standard_ancestor is not None:
+            colliding_indices = expansion.collisions
+            if params.cfg.assignment_heuristic:
+                colliding_indices = params.optimal_path.team_assignments.with_teams(curr_state.identifier, colliding_indices)
+            collisions = curr_state.collision_set.__class__.from_colliding_indices(colliding_indices)
+            backprop(standard_ancestor, collisions, pq, params.heuristic, params.cfg)
+
+        for index, new_identifier in enumerate(expansion.children):
+            new_state = self.get_state(new_identifier)
+
+            if new_state.is_standard and standard_ancestor is not None:
+                # with operator decomposition, the partial states in between have no collision
+                # sets, so collisions found later are passed straight to the standard state
+                new_state.add_back_set(standard_ancestor)
+                backprop(standard_ancestor, new_state.collision_set, pq, params.heuristic, params.cfg)
+
+            if curr_state.cost + (cost := transition_cost(curr_state, new_state, params.num_agents, params.goal)) < new_state.cost:
+                new_state.cost = curr_state.cost + cost
+                if new_state.heuristic is None and expansion.heuristics is not None:
+                    new_state.heuristic = expansion.heuristics[index]
+                new_state.set_heuristic(params.heuristic, curr_state)
+                # all children of the state are cheaper now
+                new_state.partial_delta = None
+
+                new_state.parent = curr_state
+
+                # partial states keep the actual positions of their parent
+                new_state.time = curr_state.time + 1 if new_state.is_standard else curr_state.time
+                if cat is not None:
+                    new_state.conflicts = curr_state.conflicts + cat.num_conflicts_move(
+                        curr_state.identifier,
+                        new_state.identifier,
+                        curr_state.time + 1,
+                    )
+
+                if incumbent is not None and new_state.priority >= incumbent.cost:
+                    continue
+
+                pq.enqueue(new_state, new_state.priority, tie_break(new_state, params.cfg))
+                if params.cfg.transient_od_states and not new_state.is_standard:
+                    self.open_partial[new_state.identifier.key] = new_state
+
+        self.done = pq.empty()
+        return None
 
-                new_state.add_back_set(curr_state)
-                new_state.merge_collision_sets(collisions)
 
-                if curr_state.is_standard:
-                    backprop(curr_state, new_state, pq, params.heuristic)
-                else:
-                    p = curr_state
-                    while p is not None and not p.is_standard:
-                        p = p.parent
+def find_path(
+        start: State,
 
-                    if p is not None:
-                        backprop(p, new_state, pq, params.heuristic)
-            else:
-                collisions = None
+        params: FindPathParams
+) -> Union[Path, OutOfMemory, None]:
+    """
+    Search from start to params.goal. Returns None when the goal can't be reached,
+    and OutOfMemory when the search had to be aborted because it used more than
+    cfg.max_memory_usage.
+
+    With params.incumbent, states with a priority at or above the incumbent cost are
+    not expanded, and None is also returned when no cheaper path can be found. The
+    priority is at most the suboptimality bound times a lower bound on the cost of
+    paths through the state, so the incumbent is within that bound of them.
+    """
 
+    search = Search(start, params)
+    found_path = run_search(search)
 
-            # if collisions is not None and len(collisions) != 0:
-            #     print(collisions)
+    if params.cfg.transient_od_states:
+        params.cfg.report_state_cache(search.stats())
 
-            if collisions is None or len(collisions) == 0 or not new_state.is_standard:
-                if curr_state.cost + (cost := transition_cost(curr_state, new_state, params.num_agents, params.goal)) < new_state.cost:
-                    new_state.cost = curr_state.cost + cost
-                    new_state.set_heuristic(params.heuristic)
+    return found_path
 
-                    new_state.parent = curr_state
 
-                    pq.enqueue(new_state)
+def run_search(search: Search) -> Union[Path, OutOfMemory, None]:
+    while not search.done:
+        path = search.step()
+        if path is not None:
+            return path
 
     return None
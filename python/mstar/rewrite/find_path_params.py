@@ -10,6 +10,8 @@ if TYPE_CHECKING:
     from python.mstar.rewrite.statecache import StateCache
     from python.mstar.rewrite.heuristic import Heuristic
     from python.mstar.rewrite.state_cache_cache import StateCacheCache
+    from python.mstar.rewrite.path_cache import PathCache
+    from python.mstar.rewrite.incumbent import Incumbent
 
 from typing import Optional
 
@@ -31,7 +33,9 @@ class FindPathParams:
                  state_cache: StateCache,
                  heuristic: Heuristic,
 
-                 state_cache_cache: Optional[StateCacheCache] = None  # only needed when cfg.recursive=True
+                 state_cache_cache: Optional[StateCacheCache] = None,  # only needed when cfg.recursive=True
+                 path_cache: Optional[PathCache] = None,  # only used to account for memory usage
+                 incumbent: Optional[Incumbent] = None,  # only with pruning prematch
                  ):
 
         self.cfg = cfg
@@ -42,3 +46,5 @@ class FindPathParams:
         self.state_cache = state_cache
         self.heuristic = heuristic
         self.state_cache_cache = state_cache_cache
+        self.path_cache = path_cache
+        self.incumbent = incumbent
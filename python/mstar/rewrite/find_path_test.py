@@ -0,0 +1,137 @@
+import random
+import tracemalloc
+import unittest
+
+from mapfmclient import MarkedLocation, Problem
+
+from python.mstar.rewrite import mstar
+from python.mstar.rewrite.config import Config, KiloByte, MatchingStrategy, MegaByte
+from python.mstar.rewrite.memory import OutOfMemory
+
+
+def connected(free: list[tuple[int, int]]) -> bool:
+    remaining = set(free)
+    todo = [remaining.pop()]
+    while len(todo) != 0:
+        x, y = todo.pop()
+        for n in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if n in remaining:
+                remaining.remove(n)
+                todo.append(n)
+    return len(remaining) == 0
+
+
+def random_problem(seed: int, num_agents: int = 4, num_teams: int = 2, size: int = 5) -> Problem:
+    """
+    Agents on a grid with 20% walls. Grids which are split in multiple parts are skipped,
+    searches for problems without a solution take too long for a test.
+    """
+    rng = random.Random(seed)
+    while True:
+        grid = [[1 if rng.random() < 0.2 else 0 for _ in range(size)] for _ in range(size)]
+        free = [(x, y) for y in range(size) for x in range(size) if grid[y][x] == 0]
+        if connected(free):
+            break
+    rng.shuffle(free)
+
+    starts = [MarkedLocation(i % num_teams, *free[i]) for i in range(num_agents)]
+    goals = [MarkedLocation(i % num_teams, *free[num_agents + i]) for i in range(num_agents)]
+    return Problem(grid, size, size, starts, goals)
+
+
+def problem(grid: list[list[int]], starts: list[tuple[int, int, int]], goals: list[tuple[int, int, int]]) -> Problem:
+    return Problem(
+        grid,
+        len(grid[0]),
+        len(grid),
+        [MarkedLocation(*i) for i in starts],
+        [MarkedLocation(*i) for i in goals],
+    )
+
+
+def obstacles() -> list[list[int]]:
+    """
+    4x4 grid with walls at (1, 1) and (2, 2)
+    """
+    grid = [[0] * 4 for _ in range(4)]
+    grid[1][1] = 1
+    grid[2][2] = 1
+    return grid
+
+
+def obstacles_problem(num_agents: int = 3) -> Problem:
+    """
+    Two teams crossing the obstacles grid, with 3 or 4 agents
+    """
+    starts = [(0, 0, 0), (0, 3, 0), (1, 0, 3), (1, 3, 3)]
+    goals = [(0, 3, 3), (1, 2, 0), (0, 1, 3), (1, 0, 0)]
+    return problem(obstacles(), starts[:num_agents], goals[:num_agents])
+
+
+def cost(cfg: Config, problem: Problem):
+    return getattr(mstar(cfg, problem), "cost", None)
+
+
+class TestTransientOdStates(unittest.TestCase):
+    def test_same_cost_as_od(self):
+        for strategy in (MatchingStrategy.Prematch, MatchingStrategy.SortedPruningPrematch, MatchingStrategy.Inmatch):
+            for seed in range(30):
+                p = random_problem(seed, size=4)
+                with self.subTest(strategy=strategy, seed=seed):
+                    self.assertEqual(
+                        cost(Config(matching_strategy=strategy, operator_decomposition=True, transient_od_states=True), p),
+                        cost(Config(matching_strategy=strategy, operator_decomposition=True), p),
+                    )
+
+
+class TestInmatch(unittest.TestCase):
+    def test_same_cost_as_prematch(self):
+        for seed in range(30):
+            p = random_problem(seed, size=4)
+            expected = cost(Config(matching_strategy=MatchingStrategy.SortedPruningPrematch), p)
+            for kwargs in ({}, {"operator_decomposition": True}):
+                with self.subTest(seed=seed, **kwargs):
+                    self.assertEqual(cost(Config(matching_strategy=MatchingStrategy.Inmatch, **kwargs), p), expected)
+
+    def test_moving_between_goals_costs(self):
+        # agent 0 has to move from one goal to the other, to make room for agent 1
+        grid = [[0, 0, 0]]
+        starts = [MarkedLocation(0, 1, 0), MarkedLocation(0, 2, 0)]
+        goals = [MarkedLocation(0, 0, 0), MarkedLocation(0, 1, 0)]
+        p = Problem(grid, 3, 1, starts, goals)
+
+        for kwargs in ({}, {"operator_decomposition": True}):
+            with self.subTest(**kwargs):
+                self.assertEqual(cost(Config(matching_strategy=MatchingStrategy.Inmatch, **kwargs), p), 2)
+
+
+class TestMemoryLimit(unittest.TestCase):
+    def test_recursive_sub_search_out_of_memory(self):
+        cfg = Config(recursive=True, operator_decomposition=True, max_memory_usage=300 * KiloByte)
+        self.assertIsInstance(mstar(cfg, random_problem(0, num_agents=8, size=8)), OutOfMemory)
+
+    def test_large_expansion_out_of_memory(self):
+        # the first collisions put many agents in the collision set, and expanding
+        # them all at once would make far more states than fit in the limit
+        cfg = Config(matching_strategy=MatchingStrategy.Inmatch, max_memory_usage=40 * MegaByte)
+        p = random_problem(0, num_agents=12, num_teams=3, size=10)
+
+        tracemalloc.start()
+        try:
+            found = mstar(cfg, p)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertIsInstance(found, OutOfMemory)
+        self.assertLess(peak, cfg.max_memory_usage)
+
+
+class TestRecursive(unittest.TestCase):
+    def test_same_cost_as_prematch(self):
+        for seed in range(10):
+            p = random_problem(seed, size=4)
+            expected = cost(Config(), p)
+            for kwargs in ({}, {"operator_decomposition": True}):
+                with self.subTest(seed=seed, **kwargs):
+                    self.assertEqual(cost(Config(recursive=True, **kwargs), p), expected)
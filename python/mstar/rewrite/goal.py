@@ -5,7 +5,7 @@ from typing import Iterable
 
 from mapfmclient import MarkedLocation
 
-from python.mstar.identifier import Identifier
+from python.mstar.rewrite.identifier import Identifier
 from python.mstar.rewrite.state import State
 from python.mstar.rewrite.agent import Agent
 
@@ -21,12 +21,21 @@ class Goal(metaclass=ABCMeta):
     def for_agents(self, agents: Iterable[Agent]) -> Goal: ...
 
 
+def stays_on_goal(goal: Goal, curr_agent: Agent, new_agent: Agent) -> bool:
+    """
+    Waiting on a goal is free. With inmatch, moving from one goal to another (of the
+    same colour) is not, even though the agent is on a goal before and after the move.
+    """
+    return curr_agent.packed == new_agent.packed and goal.on_goal(curr_agent)
+
+
 class StateGoal(Goal):
     def __init__(self, state: State):
         self.final_state = state
+        self.actual_key_length = len(state.identifier.key)
 
     def is_goal(self, state: State) -> bool:
-        return state.identifier.actual == self.final_state.identifier.actual
+        return state.identifier.key[:self.actual_key_length] == self.final_state.identifier.key
 
     def on_goal(self, agent: Agent) -> bool:
 
@@ -1,6 +1,9 @@
 from typing import Optional, Iterable
 
+import numpy as np
+
 from python.coord import Coord
+from python.mstar.rewrite.agent import AgentTable
 
 directions = [Coord(0, -1), Coord(0, 1), Coord(1, 0), Coord(-1, 0)]
 
@@ -28,6 +31,73 @@ class Grid:
         if height is not None:
             assert self.height == height
 
+        # free cells of the grid, with a border of walls around it so
+        # shifted masks never need bounds checks
+        self.padded_free: np.ndarray = np.pad(
+            np.array(grid, dtype=np.int8).reshape(self.height, self.width) == 0,
+            1,
+            constant_values=False,
+        )
+
+        # adjacency of flat cell indices (see cell_index) in compressed sparse row form: the free
+        # neighbours of cell c are neighbour_cells[neighbour_offsets[c]:neighbour_offsets[c + 1]],
+        # in the order of directions
+        self.neighbour_offsets, self.neighbour_cells = self.__adjacency()
+        # indexing memoryviews returns plain ints, and is a lot faster than indexing numpy
+        self.offsets_lookup = memoryview(self.neighbour_offsets)
+        self.neighbours_lookup = memoryview(self.neighbour_cells)
+        self.free_lookup = memoryview(np.ascontiguousarray(self.padded_free[1:-1, 1:-1]).reshape(-1))
+
+        # every cell's coordinate, so neighbour queries don't allocate new ones
+        self.cell_coords: list[Coord] = [
+            Coord(x, y)
+            for y in range(self.height)
+            for x in range(self.width)
+        ]
+
+        # every agent on this grid, see AgentTable
+        self.agents = AgentTable(self)
+
+    def __adjacency(self) -> tuple[np.ndarray, np.ndarray]:
+        height, width = self.height, self.width
+        free = self.padded_free
+
+        # for every cell (rows) and direction (columns), whether moving there ends on a free cell
+        valid = np.stack([
+            free[1 + d.y:1 + d.y + height, 1 + d.x:1 + d.x + width]
+            for d in directions
+        ], axis=-1).reshape(height * width, len(directions))
+
+        cells = np.arange(height * width, dtype=np.int32)
+        steps = np.array([d.y * width + d.x for d in directions], dtype=np.int32)
+
+        offsets = np.zeros(height * width + 1, dtype=np.int32)
+        np.cumsum(valid.sum(axis=1), out=offsets[1:])
+        # boolean indexing is row major, so the neighbours of a cell stay in direction order
+        neighbours = (cells[:, None] + steps[None, :])[valid]
+
+        return offsets, np.ascontiguousarray(neighbours, dtype=np.int32)
+
+    def cell_index(self, coord: Coord) -> int:
+        """
+        Flat (row major) index of a position on the grid
+        """
+        return coord.y * self.width + coord.x
+
+    def empty_neighbour_cells(self, cell: int) -> memoryview:
+        """
+        Flat indices of the free cells next to a cell
+        """
+        return self.neighbours_lookup[self.offsets_lookup[cell]:self.offsets_lookup[cell + 1]]
+
+    def empty_move_cells(self, cell: int) -> list[int]:
+        """
+        Flat indices of the cells an agent on a cell can move to, waiting first
+        """
+        moves = [cell] if self.free_lookup[cell] else []
+        moves.extend(self.empty_neighbour_cells(cell))
+        return moves
+
     def wall_at(self, coord: Coord) -> bool:
         return self.grid[coord.y][coord.x] == 1
 
@@ -53,13 +123,9 @@ class Grid:
         """
         Lists all neighbour grid positions which are in bounds and not walls
         """
-        return filter(
-            lambda i: not self.wall_at(i),
-            self.get_neighbours(position)
-        )
+        cell_coords = self.cell_coords
+        return [cell_coords[cell] for cell in self.empty_neighbour_cells(self.cell_index(position))]
 
     def get_empty_moves(self, position: Coord) -> Iterable[Coord]:
-        return filter(
-            lambda i: not self.wall_at(i),
-            self.get_moves(position)
-        )
+        cell_coords = self.cell_coords
+        return [cell_coords[cell] for cell in self.empty_move_cells(self.cell_index(position))]
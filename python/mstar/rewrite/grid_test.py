@@ -0,0 +1,32 @@
+import unittest
+
+from python.coord import Coord
+from python.mstar.rewrite.grid import Grid, directions
+
+
+class TestGrid(unittest.TestCase):
+    def test_adjacency(self):
+        grid = [
+            [0, 0, 1, 0],
+            [1, 0, 0, 0],
+            [0, 0, 1, 1],
+        ]
+        g = Grid(grid)
+
+        for y in range(g.height):
+            for x in range(g.width):
+                position = Coord(x, y)
+                expected = [
+                    n
+                    for n in (position + d for d in directions)
+                    if not n.out_of_bounds(g.width, g.height) and grid[n.y][n.x] == 0
+                ]
+
+                self.assertEqual(list(g.get_empty_neighbours(position)), expected)
+                if grid[y][x] == 0:
+                    self.assertEqual(list(g.get_empty_moves(position)), [position] + expected)
+
+                self.assertEqual(
+                    list(g.empty_neighbour_cells(g.cell_index(position))),
+                    [g.cell_index(n) for n in expected],
+                )
@@ -1,4 +1,5 @@
-from python.coord import Coord
+from typing import Callable
+
 from python.mstar.rewrite.optimal_path import OptimalPath
 from python.mstar.rewrite.state import State
 from python.mstar.rewrite.config import Config
@@ -6,27 +7,36 @@ from python.mstar.rewrite.agent import Agent
 
 
 class Heuristic:
+    """
+    Sum over all agents of a per agent estimate of the distance to its goal. For
+    agents which haven't been assigned a move yet in a partial (operator decomposition)
+    state, the estimate for their actual position is used.
+
+    With cfg.inflation > 1, every per agent estimate is multiplied by it (rounded down,
+    so priorities stay integers). This still never overestimates the optimal cost by more
+    than a factor cfg.inflation, so paths found cost at most that factor more than optimal.
+    """
+
     def __init__(self, cfg: Config, optimal_path: OptimalPath):
         self.cfg = cfg
         self.optimal_path = optimal_path
 
-    def precalculated_heuristic(self, state: State) -> int:
-        total_cost = 0
-        for partial, actual in zip(state.identifier.partial, state.identifier.actual):
-            if partial.is_uncalculated():
-                total_cost += self.optimal_path.shortest_path_for_agent(actual)
-            else:
-                total_cost += self.optimal_path.shortest_path_for_agent(partial)
+        if self.cfg.precompute_heuristic:
+            self.admissible_agent_heuristic = self.optimal_path.shortest_path_for_agent
+        else:
+            self.admissible_agent_heuristic = self.manhattan_distance_to_goal
 
-        return total_cost
+        if self.cfg.inflation == 1:
+            self.agent_heuristic = self.admissible_agent_heuristic
+        else:
+            self.agent_heuristic = self.inflated_agent_heuristic
 
+    def inflated_agent_heuristic(self, agent: Agent) -> int:
+        return int(self.cfg.inflation * self.admissible_agent_heuristic(agent))
 
     def manhattan_distance_to_goal_inmatch(self, agent: Agent) -> int:
-        return min(
-            Coord.from_marked_location(i).manhattan_distance(agent.location)
-            for i in self.optimal_path.path_cache.goals
-            if i.color == agent.colour
-        )
+        path_cache = self.optimal_path.path_cache
+        return path_cache.nearest_manhattan_for_colour(agent.colour).lookup[agent.cell]
 
     def manhattan_distance_to_goal_prematch(self, agent: Agent) -> int:
         gs = self.optimal_path.goal_state
@@ -40,18 +50,116 @@ class Heuristic:
         else:
             return self.manhattan_distance_to_goal_prematch(agent)
 
-    def distance_heuristic(self, state: State) -> int:
+    @staticmethod
+    def __sum_over_agents(state: State, agent_heuristic: Callable[[Agent], int]) -> int:
         total_cost = 0
-        for partial, actual in zip(state.identifier.partial, state.identifier.partial):
+        for partial, actual in zip(state.identifier.partial, state.identifier.actual):
             if partial.is_uncalculated():
-                total_cost += self.manhattan_distance_to_goal(actual)
+                total_cost += agent_heuristic(actual)
             else:
-                total_cost += self.manhattan_distance_to_goal(partial)
+                total_cost += agent_heuristic(partial)
 
         return total_cost
 
     def heuristic(self, state: State) -> int:
-        if self.cfg.precompute_heuristic:
-            return self.precalculated_heuristic(state)
+        return self.__sum_over_agents(state, self.agent_heuristic)
+
+    def lower_bound(self, state: State) -> int:
+        """
+        The heuristic without inflation, a lower bound on the cost of the optimal path.
+        """
+        return self.__sum_over_agents(state, self.admissible_agent_heuristic)
+
+    def child_heuristic(self, parent: State, child: State) -> int:
+        """
+        Heuristic of a state generated from `parent`, derived from the parent's heuristic.
+        """
+
+        parent_identifier = parent.identifier
+        child_identifier = child.identifier
+
+        index = parent_identifier.first_uncalculated
+        if index is not None:
+            # the parent is a partial state, so the child only assigned a move to
+            # its first uncalculated agent (which was estimated from its actual position)
+            return parent.heuristic \
+                - self.agent_heuristic(parent_identifier.actual[index]) \
+                + self.agent_heuristic(child_identifier.partial[index])
+
+        # the parent is a standard state, only evaluate agents which moved. Agents which
+        # became uncalculated are still estimated from the same (actual) position.
+        total_cost = parent.heuristic
+        for parent_agent, partial, actual in zip(
+                parent_identifier.actual,
+                child_identifier.partial,
+                child_identifier.actual,
+        ):
+            if partial.uncalculated:
+                partial = actual
+
+            if parent_agent.packed != partial.packed:
+                total_cost += self.agent_heuristic(partial) - self.agent_heuristic(parent_agent)
+
+        return total_cost
+
+
+class AssignmentHeuristic(Heuristic):
+    """
+    Inmatch heuristic in which agents of a team can't share a goal: the sum over all colours of
+    the cost of the cheapest assignment of the team's agents to its goals (see TeamAssignments).
+    Every assignment is a possible matching, so this never overestimates either, but it's never
+    lower than the sum of the distances of agents to their closest goal.
+
+    Agents which don't collide follow their assignment (see OptimalPath.best_move), so like
+    with the other heuristics, the priority stays the same along the individually optimal paths.
+    Because that couples the agents of a team, a collision puts the whole team in the collision
+    set (see TeamAssignments.with_teams).
+    A child is only reevaluated for the teams of the agents which moved, which is a single
+    team in a partial (operator decomposition) state.
+
+    Inflation is applied per team instead of per agent.
+    """
+
+    def __init__(self, cfg: Config, optimal_path: OptimalPath):
+        super().__init__(cfg, optimal_path)
+        self.team_assignments = optimal_path.team_assignments
+
+    def team_cost(self, state: State, colour: int) -> int:
+        return self.team_assignments.for_team(state.identifier, colour).cost
+
+    def inflated_team_cost(self, state: State, colour: int) -> int:
+        if self.cfg.inflation == 1:
+            return self.team_cost(state, colour)
+        return int(self.cfg.inflation * self.team_cost(state, colour))
+
+    def heuristic(self, state: State) -> int:
+        return sum(self.inflated_team_cost(state, colour) for colour in self.team_assignments.teams(state.identifier))
+
+    def lower_bound(self, state: State) -> int:
+        return sum(self.team_cost(state, colour) for colour in self.team_assignments.teams(state.identifier))
+
+    def child_heuristic(self, parent: State, child: State) -> int:
+        parent_identifier = parent.identifier
+        child_identifier = child.identifier
+
+        index = parent_identifier.first_uncalculated
+        if index is not None:
+            # only the first uncalculated agent of the parent was assigned a move
+            changed = {parent_identifier.actual[index].colour}
         else:
-            return self.distance_heuristic(state)
+            changed = set()
+            for parent_agent, partial, actual in zip(
+                    parent_identifier.actual,
+                    child_identifier.partial,
+                    child_identifier.actual,
+            ):
+                if partial.uncalculated:
+                    partial = actual
+
+                if parent_agent.packed != partial.packed:
+                    changed.add(parent_agent.colour)
+
+        total_cost = parent.heuristic
+        for colour in changed:
+            total_cost += self.inflated_team_cost(child, colour) - self.inflated_team_cost(parent, colour)
+        return total_cost
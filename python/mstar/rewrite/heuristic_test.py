@@ -0,0 +1,80 @@
+import unittest
+
+from mapfmclient import Problem, MarkedLocation
+
+from python.coord import Coord
+from python.mstar.rewrite import mstar
+from python.mstar.rewrite.config import Config, MatchingStrategy
+from python.mstar.rewrite.find_path_test import cost, random_problem
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.heuristic import AssignmentHeuristic, Heuristic
+from python.mstar.rewrite.identifier import Identifier
+from python.mstar.rewrite.optimal_path import OptimalPath
+from python.mstar.rewrite.path_cache import PathCache
+from python.mstar.rewrite.state import State
+
+GRID = [
+    [0, 0, 0, 0, 0],
+    [0, 1, 1, 0, 0],
+    [0, 0, 0, 0, 0],
+]
+
+# both agents of colour 0 are closest to the goal at (1, 0)
+STARTS = [MarkedLocation(0, 0, 0), MarkedLocation(0, 1, 0), MarkedLocation(1, 0, 2), MarkedLocation(1, 4, 2)]
+GOALS = [MarkedLocation(0, 1, 0), MarkedLocation(0, 4, 0), MarkedLocation(1, 2, 2), MarkedLocation(1, 4, 1)]
+
+
+class TestAssignmentHeuristic(unittest.TestCase):
+    def setUp(self):
+        self.cfg = Config(matching_strategy=MatchingStrategy.Inmatch, assignment_heuristic=True)
+        self.grid = Grid(GRID)
+        self.heuristic = AssignmentHeuristic(self.cfg, OptimalPath(self.cfg, PathCache(self.cfg, self.grid, GOALS)))
+        self.start = State(self.cfg, Identifier.from_marked_locations(STARTS, self.grid.agents))
+
+    def test_goals_not_shared(self):
+        cfg = Config(matching_strategy=MatchingStrategy.Inmatch, precompute_heuristic=True)
+        nearest = Heuristic(cfg, OptimalPath(cfg, PathCache(cfg, self.grid, GOALS)))
+
+        # colour 0: 1 + 3 instead of 1 + 0, colour 1: 2 + 1
+        self.assertEqual(nearest.heuristic(self.start), 4)
+        self.assertEqual(self.heuristic.heuristic(self.start), 7)
+        self.assertEqual(self.heuristic.lower_bound(self.start), 7)
+
+    def test_child_heuristic(self):
+        self.start.heuristic = self.heuristic.heuristic(self.start)
+
+        agents = list(self.start.identifier.actual)
+        agents[1] = agents[1].with_new_position(Coord(2, 0))
+        agents[3] = agents[3].with_new_position(Coord(4, 1))
+        child = State(self.cfg, Identifier(tuple(agents), tuple(agents)))
+
+        self.assertEqual(self.heuristic.child_heuristic(self.start, child), self.heuristic.heuristic(child))
+
+    def test_same_cost_as_prematch(self):
+        problems = [Problem(GRID, len(GRID[0]), len(GRID), STARTS, GOALS)]
+        problems.extend(random_problem(seed, size=4) for seed in range(20))
+
+        for index, p in enumerate(problems):
+            expected = cost(Config(matching_strategy=MatchingStrategy.SortedPruningPrematch), p)
+            for kwargs in ({}, {"operator_decomposition": True}):
+                with self.subTest(problem=index, **kwargs):
+                    found = cost(Config(matching_strategy=MatchingStrategy.Inmatch, assignment_heuristic=True, **kwargs), p)
+                    self.assertEqual(found, expected)
+
+    def test_teams_collide_together(self):
+        # colour 1 has two cheapest assignments, only the one the policy doesn't follow
+        # lets agent 1 avoid agent 0
+        grid = [
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 1],
+            [0, 0, 1, 0, 0],
+            [0, 0, 0, 0, 0],
+            [0, 0, 0, 0, 1],
+        ]
+        starts = [MarkedLocation(0, 4, 3), MarkedLocation(1, 2, 3), MarkedLocation(0, 0, 1), MarkedLocation(1, 0, 2)]
+        goals = [MarkedLocation(0, 2, 4), MarkedLocation(1, 3, 1), MarkedLocation(0, 0, 0), MarkedLocation(1, 1, 4)]
+        p = Problem(grid, 5, 5, starts, goals)
+
+        for kwargs in ({}, {"operator_decomposition": True}):
+            found = mstar(Config(matching_strategy=MatchingStrategy.Inmatch, assignment_heuristic=True, **kwargs), p)
+            self.assertEqual(found.cost, 10)
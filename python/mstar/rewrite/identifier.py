@@ -1,33 +1,108 @@
 from __future__ import annotations
 
+import struct
 from typing import Iterable, Tuple
 
 from mapfmclient import MarkedLocation
 
-from python.mstar.rewrite.agent import Agent
+from python.coord import Coord
+from python.mstar.rewrite.agent import Agent, AgentTable
+
+
+def pack(agents: Iterable[Agent]) -> bytes:
+    """
+    Pack the agents of a joint state into one bytes object, 4 bytes per agent.
+    """
+    packed = [agent.packed for agent in agents]
+    return struct.pack(f"<{len(packed)}I", *packed)
+
+
+def unpack(key: bytes) -> Tuple[int, ...]:
+    return struct.unpack(f"<{len(key) // 4}I", key)
 
 
 class Identifier:
+    """
+    Identifies a joint state. The agents are kept around for expansion, but equality and
+    hashing only look at `key`: the packed agents of `actual`, followed by the packed
+    agents of `partial` when this is not a standard (fully calculated) state.
+    """
+
+    __slots__ = ("partial", "actual", "is_standard", "key", "first_uncalculated", "hash")
+
     def __init__(self, partial: Tuple[Agent, ...], actual: Tuple[Agent, ...]):
         self.partial = tuple(partial)
         self.actual = tuple(actual)
 
+        actual_key = pack(self.actual)
+        if self.partial is self.actual:
+            partial_key = actual_key
+        else:
+            partial_key = pack(self.partial)
+
+        self.is_standard = partial_key == actual_key
+        if self.is_standard:
+            self.partial = self.actual
+            self.key = actual_key
+            self.first_uncalculated = None
+        else:
+            self.key = actual_key + partial_key
+            # the agent which is assigned next in operator decomposition
+            self.first_uncalculated = next(
+                (i for i, agent in enumerate(self.partial) if agent.uncalculated),
+                None
+            )
+
+        self.hash = hash(self.key)
+
     @classmethod
-    def from_marked_locations(cls, starts: Iterable[MarkedLocation]) -> Identifier:
+    def from_marked_locations(cls, starts: Iterable[MarkedLocation], table: AgentTable) -> Identifier:
+        """
+        The agents are interned in table (and so are all agents made from them)
+        """
         agents = tuple(
-            Agent.from_marked_location(start, 0, index)
+            table.from_marked_location(start, index)
             for index, start in enumerate(starts)
         )
         return cls(agents, agents)
 
+    @classmethod
+    def from_key(cls, key: bytes, template: Identifier) -> Identifier:
+        """
+        Decode a packed key back into an identifier. Colours and indices are
+        not part of the key, so they are taken from `template`, and so is the
+        table the agents are interned in.
+        """
+        packed = unpack(key)
+        num_agents = len(template.actual)
+
+        actual = tuple(
+            a.table.from_packed(p, a.colour, a.index)
+            for p, a in zip(packed[:num_agents], template.actual)
+        )
+        if len(packed) == num_agents:
+            return cls(actual, actual)
+
+        partial = tuple(
+            a.table.from_packed(p, a.colour, a.index)
+            for p, a in zip(packed[num_agents:], template.actual)
+        )
+        return cls(partial, actual)
+
+    def positions(self) -> list[Coord]:
+        """
+        Positions of the agents in `actual`
+        """
+        return [agent.location for agent in self.actual]
+
     def __eq__(self, other: Identifier):
-        return self.partial == other.partial and self.actual == other.actual
+        return self.key == other.key
 
     def __hash__(self):
-        return hash((self.partial, self.actual))
+        return self.hash
 
     def __repr__(self):
-        if self.actual == self.partial:
+        if self.is_standard:
             return f"actual: {self.actual}"
         else:
             return f"partial: {self.partial}, actual: {self.actual}"
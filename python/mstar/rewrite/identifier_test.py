@@ -0,0 +1,81 @@
+import unittest
+
+import pickle
+
+from mapfmclient import MarkedLocation
+
+from python.coord import Coord
+from python.mstar.rewrite.agent import Agent
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.identifier import Identifier
+
+GRID = Grid([[0] * 20 for _ in range(9)])
+
+
+def agent(location: Coord, colour: int, index: int) -> Agent:
+    return GRID.agents.get(location, colour, index)
+
+
+class TestIdentifier(unittest.TestCase):
+    def test_equality(self):
+        a = Identifier(
+            (agent(Coord(1, 2), 0, 0), agent(Coord(3, 4), 1, 1)),
+            (agent(Coord(1, 2), 0, 0), agent(Coord(3, 4), 1, 1)),
+        )
+        b = Identifier(
+            (agent(Coord(1, 2), 0, 0), agent(Coord(3, 4), 1, 1)),
+            (agent(Coord(1, 2), 0, 0), agent(Coord(3, 4), 1, 1)),
+        )
+        swapped = Identifier(
+            (agent(Coord(3, 4), 0, 0), agent(Coord(1, 2), 1, 1)),
+            (agent(Coord(3, 4), 0, 0), agent(Coord(1, 2), 1, 1)),
+        )
+
+        self.assertTrue(a.is_standard)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, swapped)
+
+    def test_uncalculated(self):
+        actual = (agent(Coord(0, 0), 0, 0), agent(Coord(3, 4), 0, 1))
+        partial = (actual[0].make_uncalculated(), actual[1])
+
+        standard = Identifier(actual, actual)
+        intermediate = Identifier(partial, actual)
+
+        self.assertFalse(intermediate.is_standard)
+        self.assertNotEqual(standard, intermediate)
+
+    def test_decode(self):
+        actual = (agent(Coord(5, 7), 2, 0), agent(Coord(19, 0), 1, 1))
+        partial = (actual[0].with_new_position(Coord(5, 8)), actual[1].make_uncalculated())
+
+        for identifier in [Identifier(actual, actual), Identifier(partial, actual)]:
+            decoded = Identifier.from_key(identifier.key, identifier)
+
+            self.assertEqual(decoded, identifier)
+            self.assertEqual(decoded.partial, identifier.partial)
+            self.assertEqual([a.colour for a in decoded.actual], [2, 1])
+            self.assertEqual(identifier.positions(), [Coord(5, 7), Coord(19, 0)])
+
+    def test_interned(self):
+        grid = Grid([[0] * 4 for _ in range(3)])
+        starts = [MarkedLocation(0, 1, 1), MarkedLocation(1, 2, 1)]
+        a = Identifier.from_marked_locations(starts, grid.agents)
+        b = Identifier.from_marked_locations(starts, grid.agents)
+
+        self.assertIs(a.actual[0], b.actual[0])
+        self.assertIs(a.actual[0].with_new_position(Coord(1, 2)), b.actual[0].with_new_position(Coord(1, 2)))
+        self.assertIs(a.actual[1].make_uncalculated(), b.actual[1].make_uncalculated())
+        self.assertIs(Identifier.from_key(a.key, a).actual[1], a.actual[1])
+        # the same position for another agent is another agent
+        self.assertIsNot(a.actual[0].with_new_position(Coord(2, 1)), a.actual[1])
+
+        # the table isn't pickled along
+        unpickled = pickle.loads(pickle.dumps(a))
+        self.assertEqual(unpickled, a)
+        self.assertIsNone(unpickled.actual[0].table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import multiprocessing
+from math import inf
+
+
+class Incumbent:
+    """
+    Cost of the best path found so far while searching all matchings with pruning prematch.
+    It lives in shared memory, so processes searching other matchings in parallel see it as
+    soon as it goes down. Searches stop expanding states with a priority at or above it.
+    """
+
+    def __init__(self):
+        # reads don't take the lock, a stale value only means pruning a little later
+        self.shared = multiprocessing.RawValue("d", inf)
+        self.lock = multiprocessing.Lock()
+
+    @property
+    def cost(self) -> float:
+        return self.shared.value
+
+    def offer(self, cost: int):
+        """
+        Lower the incumbent to cost if that's better than the current one
+        """
+        with self.lock:
+            if cost < self.shared.value:
+                self.shared.value = cost
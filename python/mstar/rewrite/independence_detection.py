@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import copy
+from typing import Iterable, Optional, Union
+
+from mapfmclient import Problem, MarkedLocation
+
+from python.coord import Coord
+from python.mstar.rewrite.agent import Agent
+from python.mstar.rewrite.collisionset import find_collisions
+from python.mstar.rewrite.config import Config, MatchingStrategy
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.identifier import Identifier
+from python.mstar.rewrite.matchings import matchings, ranked_matchings
+from python.mstar.rewrite.memory import OutOfMemory
+from python.mstar.rewrite.path import Path
+from python.mstar.rewrite.path_cache import PathCache
+from python.mstar.rewrite.state import State
+
+
+class Group:
+    """
+    Agents (indices into the starts of the problem) which are planned together,
+    and the positions of those agents at every step of the path found for them.
+    """
+
+    def __init__(self, agents: list[int], positions: list[list[Coord]], cost: int):
+        self.agents = agents
+        self.positions = positions
+        self.cost = cost
+
+    def position(self, index: int, time: int) -> Coord:
+        """
+        Position of the index-th agent of this group. After the end of
+        the path, agents stay on their goal.
+        """
+        return self.positions[min(time, len(self.positions) - 1)][index]
+
+    def agent(self, problem: Problem, index: int, time: int) -> Agent:
+        """
+        The index-th agent of this group at the given time, with the colour and
+        index it has in the problem
+        """
+        position = self.position(index, time)
+        agent = self.agents[index]
+        return Agent(position, problem.starts[agent].color, 0, agent, position.y * problem.width + position.x)
+
+    def packed_path(self, index: int, width: int) -> list[int]:
+        """
+        The positions of the index-th agent of this group as packed agents (see Agent.packed),
+        on a grid of the given width
+        """
+        return [(p[index].y * width + p[index].x) << 1 for p in self.positions]
+
+
+def plan_group(
+        cfg: Config,
+        problem: Problem,
+        agents: list[int],
+        groups: list[Group],
+) -> Union[Group, OutOfMemory, None]:
+    """
+    Find the optimal path for only the given agents, and all goals of their colours.
+    The paths of the other groups are put in the collision avoidance table, if it's used.
+    """
+    from python.mstar.rewrite import mstar
+
+    colours = {problem.starts[i].color for i in agents}
+
+    sub_problem = Problem(
+        problem.grid,
+        problem.width,
+        problem.height,
+        [problem.starts[i] for i in agents],
+        [g for g in problem.goals if g.color in colours],
+    )
+
+    avoid = [
+        group.packed_path(index, problem.width)
+        for group in groups
+        for index in range(len(group.agents))
+    ]
+
+    res = mstar(cfg, sub_problem, avoid)
+    if res is None or isinstance(res, OutOfMemory):
+        return res
+
+    return Group(agents, [state.identifier.positions() for state in res.path], res.cost)
+
+
+def first_conflict(groups: list[Group], problem: Problem) -> Optional[tuple[int, int]]:
+    """
+    Indices of two groups whose paths collide, or None if all groups are independent
+    """
+    group_of = {}
+    for group_index, group in enumerate(groups):
+        for agent in group.agents:
+            group_of[agent] = group_index
+
+    def agents_at(time: int) -> tuple[Agent, ...]:
+        return tuple(
+            group.agent(problem, index, time)
+            for group in groups
+            for index in range(len(group.agents))
+        )
+
+    curr_agents = agents_at(0)
+    for time in range(1, max(len(group.positions) for group in groups)):
+        new_agents = agents_at(time)
+
+        for a, b in find_collisions(curr_agents, new_agents):
+            if group_of[a] != group_of[b]:
+                return group_of[a], group_of[b]
+
+        curr_agents = new_agents
+
+    return None
+
+
+def detect(cfg: Config, problem: Problem, initial_groups: list[list[int]]) -> Union[Path, OutOfMemory, None]:
+    """
+    Plan every group on its own, and merge groups whose paths collide until
+    all paths are independent.
+    """
+    groups: list[Group] = []
+    for agents in initial_groups:
+        group = plan_group(cfg, problem, agents, groups)
+        if group is None or isinstance(group, OutOfMemory):
+            return group
+        groups.append(group)
+
+    while (conflict := first_conflict(groups, problem)) is not None:
+        a, b = conflict
+        agents = sorted(groups[a].agents + groups[b].agents)
+        groups = [group for index, group in enumerate(groups) if index not in conflict]
+
+        group = plan_group(cfg, problem, agents, groups)
+        if group is None or isinstance(group, OutOfMemory):
+            return group
+        groups.append(group)
+
+    return combine(cfg, problem, groups)
+
+
+def combine(cfg: Config, problem: Problem, groups: list[Group]) -> Path:
+    """
+    Path of all agents, made from the independent paths of the groups
+    """
+    num_agents = len(problem.starts)
+    length = max(len(group.positions) for group in groups)
+
+    states = []
+    for time in range(length):
+        agents: list[Optional[Agent]] = [None] * num_agents
+        for group in groups:
+            for index, agent in enumerate(group.agents):
+                agents[agent] = group.agent(problem, index, time)
+
+        actual = tuple(agents)
+        identifier = Identifier(actual, actual)
+        states.append(State(cfg, identifier))
+
+    # the groups are independent, so their costs add up
+    states[-1].cost = sum(group.cost for group in groups)
+
+    return Path(states)
+
+
+def independence_detection(cfg: Config, problem: Problem) -> Union[Path, OutOfMemory, None]:
+    """
+    Solves the problem with independence detection: groups of agents are only planned
+    together when their paths collide. With inmatch the initial groups are the teams
+    of every colour. With prematch every agent starts in its own group, and this is
+    done for every matching (every agent gets its own colour, so the groups can only
+    go to the goal they're matched with).
+    """
+    sub_cfg = copy.copy(cfg)
+    sub_cfg.independence_detection = False
+
+    if cfg.inmatch:
+        colours: dict[int, list[int]] = {}
+        for index, start in enumerate(problem.starts):
+            colours.setdefault(start.color, []).append(index)
+
+        return detect(sub_cfg, problem, list(colours.values()))
+
+    # with a single matching, mstar doesn't have to try others (or start processes)
+    sub_cfg.matching_strategy = MatchingStrategy.Prematch
+    sub_cfg.processes = 1
+
+    grid = Grid(problem.grid)
+    path_cache = PathCache(cfg, grid, problem.goals)
+    starts = [
+        MarkedLocation(index, start.x, start.y)
+        for index, start in enumerate(problem.starts)
+    ]
+
+    def lower_bound(matching: list[MarkedLocation]) -> int:
+        return sum(
+            path_cache.per_goal[Coord(goal.x, goal.y)].lookup[grid.cell_index(start)]
+            for start, goal in zip(starts, matching)
+        )
+
+    all_matchings: Iterable[tuple[int, list[MarkedLocation]]]
+    if cfg.matching_strategy == MatchingStrategy.SortedPruningPrematch:
+        all_matchings = ranked_matchings(problem.starts, problem.goals, path_cache)
+    else:
+        all_matchings = ((lower_bound(i), i) for i in matchings(problem.starts, problem.goals))
+
+    best_path: Optional[Path] = None
+    for bound, matching in all_matchings:
+        if cfg.pruning_prematch and best_path is not None and \
+                bound * cfg.suboptimality_bound >= best_path.cost:
+            if cfg.matching_strategy == MatchingStrategy.SortedPruningPrematch:
+                break
+            continue
+
+        goals = [
+            MarkedLocation(index, goal.x, goal.y)
+            for index, goal in enumerate(matching)
+        ]
+        found_path = detect(
+            sub_cfg,
+            Problem(problem.grid, problem.width, problem.height, starts, goals),
+            [[index] for index in range(len(starts))]
+        )
+
+        if isinstance(found_path, OutOfMemory):
+            return found_path
+
+        if found_path is not None and (best_path is None or found_path.cost < best_path.cost):
+            best_path = found_path
+
+    return best_path
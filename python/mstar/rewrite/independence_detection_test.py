@@ -0,0 +1,49 @@
+import unittest
+
+from mapfmclient import Problem
+
+from python.coord import Coord
+from python.mstar.rewrite import mstar
+from python.mstar.rewrite.config import Config, MatchingStrategy
+from python.mstar.rewrite.find_path_test import problem
+from python.mstar.rewrite.independence_detection import Group, first_conflict
+
+
+# a corridor with a side pocket, so two agents can pass each other
+CORRIDOR = [
+    [0, 0, 0, 0, 0],
+    [1, 1, 0, 1, 1],
+]
+
+
+class TestIndependenceDetection(unittest.TestCase):
+    def check_same_cost(self, p: Problem):
+        for strategy in (MatchingStrategy.Inmatch, MatchingStrategy.SortedPruningPrematch):
+            expected = mstar(Config(matching_strategy=strategy), p)
+            found = mstar(Config(matching_strategy=strategy, independence_detection=True), p)
+            self.assertEqual(found.cost, expected.cost)
+
+    def test_independent(self):
+        p = problem(
+            [[0] * 3 for _ in range(3)],
+            [(0, 0, 0), (1, 0, 2)],
+            [(0, 2, 0), (1, 2, 2)],
+        )
+        self.check_same_cost(p)
+
+    def test_merge(self):
+        # the agents walk into each other, so they have to be planned together
+        p = problem(CORRIDOR, [(0, 0, 0), (1, 4, 0)], [(0, 4, 0), (1, 0, 0)])
+
+        self.check_same_cost(p)
+
+    def test_first_conflict(self):
+        p = problem(CORRIDOR, [(0, 1, 0), (1, 2, 0)], [(0, 2, 0), (1, 1, 0)])
+        a = Group([0], [[Coord(1, 0)], [Coord(1, 0)]], 0)
+        b = Group([1], [[Coord(2, 0)]], 0)
+        self.assertIsNone(first_conflict([a, b], p))
+
+        # swapping positions is a conflict
+        a.positions = [[Coord(1, 0)], [Coord(2, 0)]]
+        b.positions = [[Coord(2, 0)], [Coord(1, 0)]]
+        self.assertEqual(set(first_conflict([a, b], p)), {0, 1})
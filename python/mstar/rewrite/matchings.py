@@ -1,10 +1,17 @@
-from typing import Iterator
+from __future__ import annotations
+
+from math import inf
+from typing import Iterator, Optional
 import copy
+import heapq
 import itertools
 
 from mapfmclient import MarkedLocation
 from collections import defaultdict
 
+from python.coord import Coord
+from python.mstar.rewrite.path_cache import PathCache, UNREACHABLE
+
 
 def matchings(starts: list[MarkedLocation], goals: list[MarkedLocation]) -> Iterator[list[MarkedLocation]]:
     reordered_goals = []
@@ -39,3 +46,181 @@ def matchings(starts: list[MarkedLocation], goals: list[MarkedLocation]) -> Iter
                 curr[a] = reordered_goals[b]
 
         yield curr
+
+
+def assignment(cost: list[list[float]]) -> Optional[tuple[int, list[int]]]:
+    """
+    Cheapest assignment of the rows of a square cost matrix to distinct columns, with
+    the Hungarian algorithm in O(n^3). Entries of inf can't be assigned. Returns the
+    cost and the column of every row, or None when every assignment costs inf.
+    """
+    n = len(cost)
+
+    # 1-indexed, with row/column 0 as the start of augmenting paths
+    u = [0] * (n + 1)
+    v = [0] * (n + 1)
+    # row assigned to every column
+    p = [0] * (n + 1)
+    way = [0] * (n + 1)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [inf] * (n + 1)
+        used = [False] * (n + 1)
+
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            row = cost[i0 - 1]
+            delta = inf
+            j1 = 0
+
+            for j in range(1, n + 1):
+                if not used[j]:
+                    cur = row[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+
+            if delta == inf:
+                return None
+
+            for j in range(n + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        while j0 != 0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    columns = [0] * n
+    for j in range(1, n + 1):
+        columns[p[j] - 1] = j - 1
+
+    return sum(cost[i][columns[i]] for i in range(n)), columns
+
+
+class RankedNode:
+    """
+    Subset of all assignments in Murty's algorithm: the first `fixed` rows are assigned
+    the same columns as in `columns`, and the (row, column) pairs in `forbidden` aren't used.
+    `columns` is the cheapest assignment in the subset.
+    """
+
+    def __init__(self, cost: int, columns: list[int], fixed: int, forbidden: frozenset[tuple[int, int]]):
+        self.cost = cost
+        self.columns = columns
+        self.fixed = fixed
+        self.forbidden = forbidden
+
+    def __lt__(self, other: RankedNode) -> bool:
+        return self.cost < other.cost
+
+
+def solve_subset(
+        cost: list[list[float]],
+        columns: list[int],
+        fixed: int,
+        forbidden: frozenset[tuple[int, int]],
+) -> Optional[RankedNode]:
+    """
+    Cheapest assignment with the first `fixed` rows assigned like in columns, and
+    without the forbidden pairs. Only the remaining rows and columns are solved.
+    """
+    free_columns = sorted(set(range(len(cost))) - set(columns[:fixed]))
+
+    sub_cost = [
+        [
+            inf if (row, column) in forbidden else cost[row][column]
+            for column in free_columns
+        ]
+        for row in range(fixed, len(cost))
+    ]
+
+    res = assignment(sub_cost)
+    if res is None:
+        return None
+
+    sub_total, sub_columns = res
+    new_columns = columns[:fixed] + [free_columns[c] for c in sub_columns]
+    total = sum(cost[row][columns[row]] for row in range(fixed)) + sub_total
+
+    return RankedNode(total, new_columns, fixed, forbidden)
+
+
+def matching_lower_bound(
+        starts: list[MarkedLocation],
+        goals: list[MarkedLocation],
+        path_cache: PathCache,
+) -> float:
+    """
+    Sum of the distances of the agents to their goals in a matching, the same lower bound
+    ranked_matchings yields. inf when an agent can't reach its goal.
+    """
+    grid = path_cache.grid
+
+    total = 0
+    for start, goal in zip(starts, goals):
+        distance = path_cache.per_goal[Coord(goal.x, goal.y)].lookup[grid.cell_index(Coord(start.x, start.y))]
+        if distance == UNREACHABLE:
+            return inf
+        total += distance
+
+    return total
+
+
+def ranked_matchings(
+        starts: list[MarkedLocation],
+        goals: list[MarkedLocation],
+        path_cache: PathCache,
+) -> Iterator[tuple[int, list[MarkedLocation]]]:
+    """
+    Lazily yields every matching in which all agents can reach their goal, in
+    nondecreasing order of the sum of the distances of the agents to their goals,
+    together with that sum (a lower bound on the cost of the matching). Uses Murty's
+    algorithm for ranking assignments, so only the matchings which are looked at are made.
+    """
+    grid = path_cache.grid
+
+    cost: list[list[float]] = []
+    for start in starts:
+        cell = grid.cell_index(Coord(start.x, start.y))
+        row = []
+        for goal in goals:
+            distance = path_cache.per_goal[Coord(goal.x, goal.y)].lookup[cell] \
+                if goal.color == start.color else UNREACHABLE
+            row.append(inf if distance == UNREACHABLE else distance)
+        cost.append(row)
+
+    first = solve_subset(cost, [], 0, frozenset())
+    if first is None:
+        return
+
+    queue = [first]
+    while len(queue) != 0:
+        node = heapq.heappop(queue)
+        yield node.cost, [goals[column] for column in node.columns]
+
+        # partition the rest of this subset: for every row from node.fixed on, the
+        # assignments which agree with node up to that row but use another column for it
+        for row in range(node.fixed, len(starts)):
+            child = solve_subset(
+                cost,
+                node.columns,
+                row,
+                node.forbidden | {(row, node.columns[row])},
+            )
+            if child is not None:
+                heapq.heappush(queue, child)
@@ -0,0 +1,70 @@
+import itertools
+import unittest
+from math import inf
+
+from mapfmclient import MarkedLocation
+
+from python.mstar.rewrite.config import Config
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.matchings import assignment, matchings, matching_lower_bound, ranked_matchings
+from python.mstar.rewrite.path_cache import PathCache
+
+
+class TestAssignment(unittest.TestCase):
+    def test_cheapest(self):
+        cost = [
+            [4, 1, 3],
+            [2, 0, 5],
+            [3, 2, 2],
+        ]
+
+        best = min(
+            sum(cost[row][column] for row, column in enumerate(columns))
+            for columns in itertools.permutations(range(3))
+        )
+        total, columns = assignment(cost)
+        self.assertEqual(total, best)
+        self.assertEqual(sorted(columns), [0, 1, 2])
+
+    def test_infeasible(self):
+        self.assertIsNone(assignment([[1, inf], [2, inf]]))
+
+
+class TestRankedMatchings(unittest.TestCase):
+    def test_all_matchings_in_order(self):
+        grid = [[0] * 4 for _ in range(4)]
+        starts = [MarkedLocation(0, 0, 0), MarkedLocation(0, 3, 0), MarkedLocation(1, 0, 3), MarkedLocation(0, 1, 1)]
+        goals = [MarkedLocation(0, 3, 3), MarkedLocation(1, 2, 2), MarkedLocation(0, 1, 0), MarkedLocation(0, 0, 2)]
+        path_cache = PathCache(Config(), Grid(grid), goals)
+
+        def lower_bound(matching: list[MarkedLocation]) -> int:
+            return sum(abs(s.x - g.x) + abs(s.y - g.y) for s, g in zip(starts, matching))
+
+        ranked = list(ranked_matchings(starts, goals, path_cache))
+        bounds = [bound for bound, _ in ranked]
+
+        self.assertEqual(bounds, sorted(bounds))
+        for bound, matching in ranked:
+            self.assertEqual(bound, lower_bound(matching))
+
+        expected = sorted(
+            tuple((g.x, g.y) for g in matching)
+            for matching in matchings(starts, goals)
+        )
+        found = sorted(
+            tuple((g.x, g.y) for g in matching)
+            for _, matching in ranked
+        )
+        self.assertEqual(found, expected)
+
+        # the bound of a single matching is the same as the one it's ranked with
+        for bound, matching in ranked:
+            self.assertEqual(matching_lower_bound(starts, matching, path_cache), bound)
+
+    def test_unreachable_lower_bound(self):
+        grid = [[0, 1, 0]]
+        starts = [MarkedLocation(0, 0, 0)]
+        goals = [MarkedLocation(0, 2, 0)]
+        path_cache = PathCache(Config(), Grid(grid), goals)
+
+        self.assertEqual(matching_lower_bound(starts, goals, path_cache), inf)
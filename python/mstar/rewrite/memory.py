@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+# Rough sizes in bytes of the objects a search keeps alive, fitted to the memory traced
+# by tracemalloc (CPython 3.11) at the samples of searches with 6 to 30 agents, with and
+# without operator decomposition. The estimates were within 0.8 and 1.2 times the traced
+# memory. Only meant to estimate memory usage cheaply, they are not exact.
+
+# a state, its identifier, collision set and back set, and its entry in the state cache
+STATE_BYTES = 500
+# every agent slot in a state's partial and actual tuples (agents are interned, so
+# only the pointer), together with its part of the packed key
+AGENT_SLOT_BYTES = 8
+# a tuple on the open list plus its version stamp, and the expansions in progress
+OPEN_LIST_ENTRY_BYTES = 300
+
+# number of generated states between two samples of the memory usage
+SAMPLE_INTERVAL = 1024
+
+
+class MemoryStats:
+    """
+    Sample of the memory a search is using. The estimate is based on the number of
+    cached states and open list entries, and the size of the precomputed distances.
+    """
+
+    def __init__(self, num_agents: int, states: int, open_list_entries: int, path_cache_bytes: int):
+        self.num_agents = num_agents
+        self.states = states
+        self.open_list_entries = open_list_entries
+        self.path_cache_bytes = path_cache_bytes
+
+    @property
+    def estimated_bytes(self) -> int:
+        return (
+            self.states * (STATE_BYTES + 2 * self.num_agents * AGENT_SLOT_BYTES) +
+            self.open_list_entries * OPEN_LIST_ENTRY_BYTES +
+            self.path_cache_bytes
+        )
+
+    def __repr__(self):
+        return f"MemoryStats(states={self.states}, open list entries={self.open_list_entries}, " \
+               f"path cache bytes={self.path_cache_bytes}, estimated bytes={self.estimated_bytes})"
+
+
+class OutOfMemory:
+    """
+    Returned instead of a path when a search exceeded cfg.max_memory_usage,
+    together with the sample that exceeded it.
+    """
+
+    def __init__(self, stats: MemoryStats, max_memory_usage: int):
+        self.stats = stats
+        self.max_memory_usage = max_memory_usage
+
+    def __repr__(self):
+        return f"OutOfMemory({self.stats} exceeds {self.max_memory_usage} bytes)"
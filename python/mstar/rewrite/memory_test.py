@@ -0,0 +1,34 @@
+import tracemalloc
+import unittest
+
+from python.mstar.rewrite import mstar
+from python.mstar.rewrite.config import Config, MatchingStrategy, MegaByte
+from python.mstar.rewrite.find_path_test import random_problem
+from python.mstar.rewrite.memory import OutOfMemory
+
+# the estimate may be this many times more or less than the memory traced by tracemalloc
+FACTOR = 2
+
+
+class TestMemoryStats(unittest.TestCase):
+    def test_estimate_close_to_traced(self):
+        # the search stops at the first sample over the limit, which is around its peak usage
+        configs = [
+            {"operator_decomposition": True, "matching_strategy": MatchingStrategy.Inmatch},
+            {"operator_decomposition": True, "matching_strategy": MatchingStrategy.SortedPruningPrematch},
+            {"matching_strategy": MatchingStrategy.SortedPruningPrematch},
+        ]
+        for kwargs in configs:
+            with self.subTest(**kwargs):
+                cfg = Config(max_memory_usage=8 * MegaByte, **kwargs)
+
+                tracemalloc.start()
+                try:
+                    found = mstar(cfg, random_problem(1, num_agents=12, num_teams=3, size=10))
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+
+                self.assertIsInstance(found, OutOfMemory)
+                self.assertLess(found.stats.estimated_bytes, FACTOR * peak)
+                self.assertLess(peak, FACTOR * found.stats.estimated_bytes)
@@ -1,11 +1,13 @@
-from math import inf
 from typing import Optional
 
 from python.mstar.rewrite.agent import Agent
 
 from python.mstar.rewrite.config import Config
+from python.mstar.rewrite.identifier import Identifier
 from python.mstar.rewrite.state import State
-from python.mstar.rewrite.path_cache import PathCache
+from python.mstar.rewrite.path_cache import PathCache, DistanceTable, UNREACHABLE
+from python.mstar.rewrite.collision_avoidance_table import CollisionAvoidanceTable
+from python.mstar.rewrite.team_assignment import TeamAssignments
 
 
 class OptimalPath:
@@ -19,19 +21,53 @@ class OptimalPath:
 
         self.path_cache = path_cache
 
-    def shortest_path_for_agent_inmatch(self, agent: Agent) -> Agent:
-        smallest = inf
+        # only when cfg.collision_avoidance_table, see build_collision_avoidance_table
+        self.collision_avoidance_table: Optional[CollisionAvoidanceTable] = None
+
+        # agent index << 32 | flat cell index -> best move to that cell, so
+        # moves looked up in the precomputed tables are only allocated once
+        self.precomputed_moves: dict[int, list[Agent]] = {}
+
+        # only with inmatch and cfg.assignment_heuristic, agents go to the goal they're assigned to
+        self.team_assignments: Optional[TeamAssignments] = None
+        if self.cfg.assignment_heuristic:
+            self.team_assignments = TeamAssignments(path_cache)
+
+    def build_collision_avoidance_table(self, agents: tuple[Agent, ...], avoid: list[list[int]]):
+        """
+        Fill the collision avoidance table with the individually optimal path of every agent.
+        With inmatch, agents go to the closest goal of their colour, or the goal they're assigned
+        to at the start with cfg.assignment_heuristic. The paths in avoid (of agents which
+        are planned separately) are added as if they were more agents.
+        """
+        start = Identifier(agents, agents)
+
+        self.collision_avoidance_table = CollisionAvoidanceTable()
 
-        for i in self.path_cache.paths_for_colour(agent.colour):
-            c = i[agent.location].move_cost
-            if c < smallest:
-                smallest = c
+        for index, path in enumerate(avoid, len(agents)):
+            self.collision_avoidance_table.set_path(index, 0, path)
 
-        return smallest
+        for agent in agents:
+            if self.cfg.inmatch:
+                distance_to_goal = self.inmatch_goal(agent, start)
+            else:
+                distance_to_goal = self.path_cache.paths_for_agent(agent, self)
+
+            path = [agent.packed]
+            distance = distance_to_goal.lookup[agent.cell]
+            if distance != UNREACHABLE:
+                for _ in range(distance):
+                    _, agent = self.__find_best_move_internal(agent, distance_to_goal)
+                    path.append(agent.packed)
+
+            self.collision_avoidance_table.set_path(agent.index, 0, path)
+
+    def shortest_path_for_agent_inmatch(self, agent: Agent) -> Agent:
+        return self.path_cache.nearest_goal_for_colour(agent.colour).lookup[agent.cell]
 
     def shortest_path_for_agent_prematch(self, agent: Agent) -> Agent:
         v = self.path_cache.paths_for_agent(agent, self)
-        return v[agent.location].move_cost
+        return v.lookup[agent.cell]
 
     def shortest_path_for_agent(self, agent: Agent) -> Agent:
         if self.cfg.inmatch:
@@ -39,46 +75,84 @@ class OptimalPath:
         else:
             return self.shortest_path_for_agent_prematch(agent)
 
-    def __find_best_move_internal(self, agent, distance_to_goal):
-        neighbour_costs = []
-        for neighbour in self.path_cache.grid.get_empty_moves(agent.location):
-            cost = distance_to_goal[neighbour].move_cost
-            neighbour_costs.append((cost, neighbour))
+    def __find_best_move_internal(self, agent: Agent, distance_to_goal: DistanceTable, time: Optional[int] = None):
+        grid = self.path_cache.grid
+        lookup = distance_to_goal.lookup
+        neighbour_costs = [
+            (lookup[cell], cell)
+            for cell in grid.empty_move_cells(agent.cell)
+        ]
 
         # there's always one minimum. That's because waiting is always possible
         min_cost, min_cost_neighbour = min(neighbour_costs, key=lambda i: i[0])
-
-        return min_cost, agent.with_new_position(min_cost_neighbour)
-
-    def best_move_inmatch(self, agent: Agent) -> list[Agent]:
-        return [
-            self.__find_best_move_internal(agent, distance_to_goal)[1]
-            for distance_to_goal in self.path_cache.paths_for_colour(agent.colour)
-        ]
-
-
-        # cost, best_move = min(
-        #     (
-        #         self.__find_best_move_internal(agent, distance_to_goal)
-        #         for distance_to_goal in self.path_cache.paths_for_colour(agent.colour)
-        #     ),
-        #
-        #     key=lambda i: i[0]
-        # )
-        #
-        # return [best_move]
-
-
-    def best_move_prematch(self, agent: Agent) -> list[Agent]:
+        best_move = agent.with_new_cell(min_cost_neighbour)
+
+        cat = self.collision_avoidance_table
+        if cat is not None and time is not None:
+            # among the equally good moves, take the one with the fewest conflicts after moving
+            best_conflicts = None
+            for cost, neighbour in neighbour_costs:
+                if cost != min_cost:
+                    continue
+
+                move = best_move if neighbour == min_cost_neighbour else agent.with_new_cell(neighbour)
+                conflicts = cat.num_conflicts(move, time + 1, agent)
+                if best_conflicts is None or conflicts < best_conflicts:
+                    if best_conflicts is not None:
+                        cat.tie_breaks += 1
+                    best_conflicts = conflicts
+                    best_move = move
+
+        return min_cost, best_move
+
+    def __precomputed_best_move(self, agent: Agent, distance_to_goal: DistanceTable, time: Optional[int]) -> list[Agent]:
+        if time is not None and self.collision_avoidance_table is not None:
+            # the table only holds one of the best moves, the collision avoidance table may prefer another
+            return [self.__find_best_move_internal(agent, distance_to_goal, time)[1]]
+
+        cell = distance_to_goal.next_lookup[agent.cell]
+        key = agent.index << 32 | cell
+
+        move = self.precomputed_moves.get(key)
+        if move is None:
+            move = [agent.with_new_cell(cell)]
+            self.precomputed_moves[key] = move
+        return move
+
+    def inmatch_goal(self, agent: Agent, identifier: Optional[Identifier]) -> DistanceTable:
+        """
+        Distances to the goal the agent goes to in a standard state: the one it's assigned
+        to with cfg.assignment_heuristic, otherwise the closest goal of its colour.
+        """
+        if self.team_assignments is not None and identifier is not None:
+            assigned = self.team_assignments.goal_of(identifier, agent)
+            if assigned is not None:
+                return assigned
+
+        return self.path_cache.nearest_goal_for_colour(agent.colour)
+
+    def best_move_inmatch(self, agent: Agent, time: Optional[int] = None, identifier: Optional[Identifier] = None) -> list[Agent]:
+        return self.__precomputed_best_move(agent, self.inmatch_goal(agent, identifier), time)
+
+    def best_move_prematch(self, agent: Agent, time: Optional[int] = None) -> list[Agent]:
         distance_to_goal = self.path_cache.paths_for_agent(agent, self)
-        cost, best_move = self.__find_best_move_internal(agent, distance_to_goal)
+        if self.cfg.precompute_paths:
+            return self.__precomputed_best_move(agent, distance_to_goal, time)
+
+        cost, best_move = self.__find_best_move_internal(agent, distance_to_goal, time)
         return [best_move]
 
-    def best_move(self, agent: Agent) -> list[Agent]:
+    def best_move(self, agent: Agent, time: Optional[int] = None, identifier: Optional[Identifier] = None) -> list[Agent]:
+        """
+        Moves along the individually optimal path(s) of an agent. When `time` (of the
+        agent's current position) is given, the collision avoidance table breaks ties.
+        With cfg.assignment_heuristic, the identifier of the standard state the agent
+        moves from decides which goal it goes to.
+        """
         if self.cfg.inmatch:
-            return self.best_move_inmatch(agent)
+            return self.best_move_inmatch(agent, time, identifier)
         else:
-            return self.best_move_prematch(agent)
+            return self.best_move_prematch(agent, time)
 
 
 
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import copy
+from multiprocessing import Pool
+from queue import SimpleQueue
+from typing import Iterable, Iterator, Optional, Union
+
+from mapfmclient import Problem, MarkedLocation
+from tqdm import tqdm
+
+from python.mstar.rewrite.config import Config
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.identifier import Identifier
+from python.mstar.rewrite.incumbent import Incumbent
+from python.mstar.rewrite.matchings import matching_lower_bound
+from python.mstar.rewrite.memory import OutOfMemory
+from python.mstar.rewrite.path import Path
+from python.mstar.rewrite.path_cache import PathCache
+from python.mstar.rewrite.state import State
+from python.mstar.rewrite.statecache import StateCache
+
+# identifiers and costs of the states of a path. Paths are sent between processes like
+# this, since their states point to the rest of the search through their parents
+DetachedPath = list[tuple[Identifier, int]]
+# goals of a matching, and its lower bound if that's already known
+Task = tuple[list[MarkedLocation], Optional[int]]
+# path found for a task, and the expansions and collision avoidance stats of the search
+SearchResult = tuple[Union[DetachedPath, OutOfMemory, None], list[int], dict[str, int]]
+
+# number of tasks handed out per process before results come back
+TASKS_AHEAD = 2
+
+
+class Worker:
+    """
+    Everything a process needs to search matchings, which is the same for all of them
+    """
+
+    def __init__(self, cfg: Config, problem: Problem, avoid: list[list[int]], incumbent: Incumbent):
+        self.cfg = copy.copy(cfg)
+        self.cfg.max_memory_usage = cfg.max_memory_usage // cfg.processes
+        # stats are sent back with every result
+        self.cfg.expansions = []
+        self.cfg.collision_avoidance_stats = {}
+
+        self.avoid = avoid
+        self.incumbent = incumbent
+        self.starts = problem.starts
+
+        self.grid = Grid(problem.grid)
+        self.state_cache = StateCache(self.cfg, State)
+        self.path_cache = PathCache(self.cfg, self.grid, problem.goals)
+        self.start_state = self.state_cache.get(Identifier.from_marked_locations(problem.starts, self.grid.agents))
+
+
+# set in every process of the pool by init_worker
+worker: Optional[Worker] = None
+
+
+def init_worker(cfg: Config, problem: Problem, avoid: list[list[int]], incumbent: Incumbent):
+    global worker
+    worker = Worker(cfg, problem, avoid, incumbent)
+
+
+def search(task: Task) -> SearchResult:
+    """
+    Search one matching, given with its lower bound if that's already known
+    (see ranked_matchings).
+    """
+    from python.mstar.rewrite import MatchingWithHeuristic, search_matching
+
+    goals, lower_bound = task
+    cfg = worker.cfg
+
+    if lower_bound is None and cfg.pruning_prematch:
+        lower_bound = matching_lower_bound(worker.starts, goals, worker.path_cache)
+
+    # another process may have found a good enough path in the meantime.
+    # Checked before the matching is set up, which is most of the work for pruned matchings
+    if lower_bound is not None and lower_bound * cfg.suboptimality_bound >= worker.incumbent.cost:
+        return None, [], {}
+
+    matching = MatchingWithHeuristic(
+        cfg, goals, worker.start_state, worker.state_cache, worker.path_cache, worker.avoid, lower_bound
+    )
+
+    found_path = search_matching(
+        cfg,
+        matching,
+        worker.start_state,
+        worker.grid,
+        worker.state_cache,
+        worker.path_cache,
+        worker.incumbent if cfg.pruning_prematch else None,
+    )
+
+    if isinstance(found_path, Path):
+        worker.incumbent.offer(found_path.cost)
+        found_path = [(state.identifier, state.cost) for state in found_path.path]
+
+    expansions, cfg.expansions = cfg.expansions, []
+    collision_avoidance_stats, cfg.collision_avoidance_stats = cfg.collision_avoidance_stats, {}
+
+    return found_path, expansions, collision_avoidance_stats
+
+
+def attach(cfg: Config, path: DetachedPath) -> Path:
+    states = []
+    for identifier, cost in path:
+        state = State(cfg, identifier)
+        state.cost = cost
+        states.append(state)
+
+    return Path(states)
+
+
+def parallel_prematch(
+        cfg: Config,
+        problem: Problem,
+        tasks: Iterable[Task],
+        avoid: list[list[int]],
+) -> Union[Path, OutOfMemory, None]:
+    """
+    Search all matchings with cfg.processes processes. Matchings are handed out in
+    order, and with pruning prematch, the processes share the cost of the best path
+    found so far to prune matchings and states.
+    """
+    incumbent = Incumbent()
+
+    def unpruned(tasks: Iterable[Task]) -> Iterator[Task]:
+        for goals, lower_bound in tasks:
+            # ranked matchings come in order of their lower bound, so all
+            # the next ones can be pruned too
+            if lower_bound is not None and lower_bound * cfg.suboptimality_bound >= incumbent.cost:
+                return
+            yield goals, lower_bound
+
+    best_path: Optional[Path] = None
+    with Pool(cfg.processes, initializer=init_worker, initargs=(cfg, problem, avoid, incumbent)) as p:
+        # only a few tasks are handed out ahead, so matchings are only made (and checked
+        # against the incumbent) shortly before a process is free to search them
+        remaining = unpruned(tasks)
+        results: SimpleQueue[Union[SearchResult, BaseException]] = SimpleQueue()
+        in_flight = 0
+
+        def submit():
+            nonlocal in_flight
+            task = next(remaining, None)
+            if task is not None:
+                p.apply_async(search, (task,), callback=results.put, error_callback=results.put)
+                in_flight += 1
+
+        for _ in range(TASKS_AHEAD * cfg.processes):
+            submit()
+
+        with tqdm() as progress:
+            while in_flight != 0:
+                res = results.get()
+                in_flight -= 1
+                progress.update()
+
+                if isinstance(res, BaseException):
+                    raise res
+                found_path, expansions, collision_avoidance_stats = res
+
+                cfg.expansions.extend(expansions)
+                cfg.report_collision_avoidance(collision_avoidance_stats)
+
+                # leaving the with block stops the other processes
+                if isinstance(found_path, OutOfMemory):
+                    return found_path
+
+                if found_path is not None:
+                    path = attach(cfg, found_path)
+                    if best_path is None or path.cost < best_path.cost:
+                        best_path = path
+
+                submit()
+
+    return best_path
@@ -0,0 +1,94 @@
+import unittest
+from typing import Optional
+
+from python.mstar.rewrite import mstar, MatchingWithHeuristic, search_matching
+from python.mstar.rewrite.config import Config, MatchingStrategy
+from python.mstar.rewrite.find_path_test import obstacles, obstacles_problem, problem
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.identifier import Identifier
+from python.mstar.rewrite.incumbent import Incumbent
+from python.mstar.rewrite.path_cache import PathCache
+from python.mstar.rewrite.state import State
+from python.mstar.rewrite.statecache import StateCache
+
+
+PROBLEMS = [
+    obstacles_problem(),
+    problem(
+        obstacles(),
+        [(0, 0, 0), (1, 3, 0), (0, 0, 3), (1, 3, 3)],
+        [(1, 0, 1), (0, 3, 2), (1, 2, 3), (0, 1, 0)],
+    ),
+    # both teams have to pass through the gap in the middle
+    problem(
+        [
+            [0, 0, 0, 0, 0],
+            [1, 1, 0, 1, 1],
+            [0, 0, 0, 0, 0],
+        ],
+        [(0, 0, 0), (1, 4, 0), (0, 1, 0), (1, 0, 2)],
+        [(1, 0, 0), (0, 4, 2), (0, 0, 2), (1, 3, 2)],
+    ),
+]
+
+
+class TestParallelPrematch(unittest.TestCase):
+    def test_same_cost_as_sequential(self):
+        for strategy in (MatchingStrategy.Prematch, MatchingStrategy.SortedPruningPrematch):
+            for i, p in enumerate(PROBLEMS):
+                with self.subTest(strategy=strategy, problem=i):
+                    expected = mstar(Config(matching_strategy=MatchingStrategy.SortedPruningPrematch), p)
+
+                    cfg = Config(matching_strategy=strategy, processes=2, report_expansions=True)
+                    found = mstar(cfg, p)
+
+                    self.assertEqual(found.cost, expected.cost)
+                    # the expansions of the searches in the worker processes are sent back
+                    self.assertNotEqual(len(cfg.expansions), 0)
+
+    def test_collision_avoidance_stats(self):
+        cfg = Config(
+            matching_strategy=MatchingStrategy.SortedPruningPrematch,
+            processes=2,
+            collision_avoidance_table=True,
+        )
+        mstar(cfg, PROBLEMS[0])
+
+        self.assertNotEqual(cfg.collision_avoidance_stats.get("lookups", 0), 0)
+
+    def test_incumbent_only_lowers(self):
+        incumbent = Incumbent()
+        self.assertEqual(incumbent.cost, float("inf"))
+
+        incumbent.offer(10)
+        self.assertEqual(incumbent.cost, 10)
+        incumbent.offer(12)
+        self.assertEqual(incumbent.cost, 10)
+        incumbent.offer(7)
+        self.assertEqual(incumbent.cost, 7)
+
+    def test_abandon_at_incumbent(self):
+        p = PROBLEMS[0]
+        cfg = Config(matching_strategy=MatchingStrategy.SortedPruningPrematch)
+        # every agent goes to a goal of its own colour
+        goals = [p.goals[0], p.goals[2], p.goals[1]]
+
+        def search(incumbent_cost: Optional[int]):
+            grid = Grid(p.grid)
+            state_cache = StateCache(cfg, State)
+            path_cache = PathCache(cfg, grid, p.goals)
+            start_state = state_cache.get(Identifier.from_marked_locations(p.starts, grid.agents))
+
+            incumbent = None
+            if incumbent_cost is not None:
+                incumbent = Incumbent()
+                incumbent.offer(incumbent_cost)
+
+            matching = MatchingWithHeuristic(cfg, goals, start_state, state_cache, path_cache, [])
+            return search_matching(cfg, matching, start_state, grid, state_cache, path_cache, incumbent)
+
+        cost = search(None).cost
+
+        # no state can lead to a path cheaper than the incumbent
+        self.assertIsNone(search(cost))
+        self.assertEqual(search(cost + 1).cost, cost)
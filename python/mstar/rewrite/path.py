@@ -5,6 +5,6 @@ class Path:
     def __init__(self, path: list[State]):
         self.path = path
 
-    @property
-    def cost(self) -> int:
-        return self.path[-1].cost
+        # states are reused when searching for the next matching, which overwrites
+        # their cost, so remember the cost of this path when it's found
+        self.cost: int = self.path[-1].cost
@@ -1,52 +1,160 @@
 from __future__ import annotations
 
-from collections import defaultdict, deque
+from collections import defaultdict
 
+import numpy as np
 from mapfmclient import MarkedLocation
 
 from python.coord import Coord
-from python.mstar.bfsnode import BFSNode
 from python.mstar.rewrite.agent import Agent
 from python.mstar.rewrite.config import Config
-from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.distance_cache import DistanceCache, grid_digest
+from python.mstar.rewrite.grid import Grid, directions
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 if TYPE_CHECKING:
     from python.mstar.rewrite import OptimalPath
 
+# distance stored for cells from which a goal can't be reached
+UNREACHABLE = np.iinfo(np.uint16).max
+
+
+class DistanceTable:
+    """
+    Distance from every cell of a grid to one goal. Stored as a contiguous uint16 array
+    indexed by flat cell index (see Grid.cell_index). Cells from which the goal can't be
+    reached hold UNREACHABLE.
+    """
+
+    def __init__(self, distances: np.ndarray):
+        assert distances.dtype == np.uint16 and distances.flags.c_contiguous
+
+        self.distances = distances
+        # indexing a memoryview returns plain ints, and is a lot faster than indexing numpy
+        self.lookup = memoryview(distances)
+
+        # only when cfg.precompute_paths, see precompute_next_cells
+        self.next_cells: Optional[np.ndarray] = None
+        self.next_lookup: Optional[memoryview] = None
+
+    def __getitem__(self, cell: int) -> int:
+        return self.lookup[cell]
+
+    def precompute_next_cells(self, grid: Grid):
+        self.next_cells = next_cells(self.distances, grid)
+        self.next_lookup = memoryview(self.next_cells)
+
+    @property
+    def nbytes(self) -> int:
+        if self.next_cells is None:
+            return self.distances.nbytes
+        return self.distances.nbytes + self.next_cells.nbytes
+
+
 PerColourTable = dict[
     int,  # colour
-    list[
-        dict[
-            Coord,
-            BFSNode
-        ]
-    ]
+    list[DistanceTable]
 ]
 
 PerGoalTable = dict[
     Coord,  # goal location
-    dict[
-        Coord,
-        BFSNode
-    ]
+    DistanceTable
 ]
 
 
-def BFS(goal: Coord, grid: Grid):
-    visited = {}
-    q = deque()
-    start_node = BFSNode(goal, 0, None)
-    q.append(start_node)
+def BFS(goal: Coord, grid: Grid) -> DistanceTable:
+    """
+    Breadth first search from the goal over the whole grid at once. Every iteration
+    grows the frontier by one step in all four directions using shifted masks.
+    """
+    return multi_source_BFS([goal], grid)
+
+
+def multi_source_BFS(goals: list[Coord], grid: Grid) -> DistanceTable:
+    """
+    BFS from all goals at the same time, the distance from every cell to the closest of them.
+    """
+    free = grid.padded_free
+
+    distances = np.full(free.shape, UNREACHABLE, dtype=np.uint16)
+    unvisited = free.copy()
+
+    frontier = np.zeros(free.shape, dtype=bool)
+    for goal in goals:
+        frontier[goal.y + 1, goal.x + 1] = True
+        unvisited[goal.y + 1, goal.x + 1] = False
+
+    distance = 0
+    while frontier.any():
+        assert distance < UNREACHABLE, "grid too large for uint16 distance tables"
+        distances[frontier] = distance
+        distance += 1
+
+        next_frontier = np.zeros_like(frontier)
+        next_frontier[1:, :] |= frontier[:-1, :]
+        next_frontier[:-1, :] |= frontier[1:, :]
+        next_frontier[:, 1:] |= frontier[:, :-1]
+        next_frontier[:, :-1] |= frontier[:, 1:]
+        next_frontier &= unvisited
+
+        unvisited &= ~next_frontier
+        frontier = next_frontier
+
+    return DistanceTable(np.ascontiguousarray(distances[1:-1, 1:-1]).reshape(-1))
+
+
+def manhattan_distances(goals: list[Coord], grid: Grid) -> DistanceTable:
+    """
+    Manhattan distance from every cell to the closest of the goals, ignoring walls.
+    """
+    ys, xs = np.divmod(np.arange(grid.width * grid.height, dtype=np.int64), grid.width)
+
+    distances = np.full(grid.width * grid.height, UNREACHABLE, dtype=np.int64)
+    for goal in goals:
+        np.minimum(distances, np.abs(xs - goal.x) + np.abs(ys - goal.y), out=distances)
+
+    return DistanceTable(distances.astype(np.uint16))
+
 
-    while len(q) != 0:
-        curr = q.popleft()
-        if curr.pos not in visited:
-            visited[curr.pos] = curr
-            for n in grid.get_empty_neighbours(curr.pos):
-                if n not in visited:
-                    q.append(BFSNode(n, curr.move_cost + 1, curr.pos))
-    return visited
+def cached_BFS(goal: Coord, grid: Grid, distance_cache: Optional[DistanceCache], digest: Optional[str]) -> DistanceTable:
+    """
+    BFS, but the distances are loaded from distance_cache when they're stored there,
+    and stored there otherwise. digest is grid_digest(grid).
+    """
+    if distance_cache is None:
+        return BFS(goal, grid)
+
+    distances = distance_cache.load(digest, grid, goal)
+    if distances is not None:
+        return DistanceTable(distances)
+
+    table = BFS(goal, grid)
+    distance_cache.store(digest, grid, goal, table.distances)
+    return table
+
+
+def next_cells(distances: np.ndarray, grid: Grid) -> np.ndarray:
+    """
+    For every cell, the flat index of the cell an agent on it should move to to get closest
+    to the goal. Waiting comes first, and ties are broken in the order of Grid.get_empty_moves,
+    so this is the move OptimalPath would find by looking at all neighbours.
+    """
+    height, width = grid.height, grid.width
+
+    # walls are already unreachable, the border makes moving off the grid unreachable too
+    padded = np.pad(distances.reshape(height, width), 1, constant_values=UNREACHABLE)
+
+    moves = [(0, 0)] + [(d.x, d.y) for d in directions]
+    distance_after_move = np.stack([
+        padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+        for dx, dy in moves
+    ])
+    # argmin returns the first of equal minimums
+    best_move = np.argmin(distance_after_move, axis=0)
+
+    offsets = np.array([dy * width + dx for dx, dy in moves], dtype=np.int32)
+    cells = np.arange(height * width, dtype=np.int32)
+    return np.ascontiguousarray(cells + offsets[best_move.reshape(-1)])
 
 
 class PathCache:
@@ -59,20 +167,84 @@ class PathCache:
         self.grid = grid
         self.goals = goals
 
-        self.per_colour: PerColourTable = defaultdict(list)
+        # only with cfg.distance_cache
+        self.distance_cache: Optional[DistanceCache] = None
+        digest = None
+        if self.cfg.distance_cache is not None:
+            self.distance_cache = DistanceCache(self.cfg.distance_cache, self.cfg.distance_cache_max_bytes)
+            digest = grid_digest(self.grid)
+
         self.per_goal: PerGoalTable = {}
-        for index, goal in enumerate(self.goals):
-            res = BFS(Coord(goal.x, goal.y), self.grid)
+        # distances to every goal of every colour (and the next cells towards them),
+        # only with inmatch and cfg.assignment_heuristic
+        self.per_colour: PerColourTable = {}
+
+        # distance to the closest goal of every colour, and which cell to move to to get
+        # closer to it. Only with inmatch.
+        self.nearest_per_colour: dict[int, DistanceTable] = {}
+        # manhattan distance to the closest goal of every colour, only with inmatch
+        # when the heuristic isn't precomputed (and isn't the assignment heuristic)
+        self.nearest_manhattan_per_colour: dict[int, DistanceTable] = {}
+
+        if self.cfg.inmatch:
+            goals_per_colour: dict[int, list[Coord]] = defaultdict(list)
+            for goal in self.goals:
+                goals_per_colour[goal.color].append(Coord(goal.x, goal.y))
+
+            for colour, coords in goals_per_colour.items():
+                res = multi_source_BFS(coords, self.grid)
+                res.precompute_next_cells(self.grid)
+                self.nearest_per_colour[colour] = res
 
-            self.per_colour[goal.color].append(res)
-            self.per_goal[Coord(goal.x, goal.y)] = res
+                if self.cfg.assignment_heuristic:
+                    self.per_colour[colour] = [
+                        cached_BFS(coord, self.grid, self.distance_cache, digest)
+                        for coord in coords
+                    ]
+                    # agents follow the path to the goal they're assigned to
+                    for table in self.per_colour[colour]:
+                        table.precompute_next_cells(self.grid)
+                elif not self.cfg.precompute_heuristic:
+                    self.nearest_manhattan_per_colour[colour] = manhattan_distances(coords, self.grid)
+        else:
+            for goal in self.goals:
+                res = cached_BFS(Coord(goal.x, goal.y), self.grid, self.distance_cache, digest)
+                if self.cfg.precompute_paths:
+                    res.precompute_next_cells(self.grid)
 
-    def paths_for_colour(self, color: int) -> list[dict[Coord, BFSNode]]:
+                self.per_goal[Coord(goal.x, goal.y)] = res
+
+        if self.distance_cache is not None and self.distance_cache.stored != 0:
+            self.distance_cache.evict()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(table.nbytes for table in self.per_goal.values()) + \
+            sum(table.nbytes for tables in self.per_colour.values() for table in tables) + \
+            sum(table.nbytes for table in self.nearest_per_colour.values()) + \
+            sum(table.nbytes for table in self.nearest_manhattan_per_colour.values())
+
+    def paths_for_colour(self, color: int) -> list[DistanceTable]:
+        """
+        Only use with inmatch and cfg.assignment_heuristic!
+        """
         return self.per_colour[color]
 
-    def paths_for_agent(self, agent: Agent, optimal_path: OptimalPath) -> dict[Coord, BFSNode]:
+    def nearest_goal_for_colour(self, color: int) -> DistanceTable:
+        """
+        Only use with inmatch!
+        """
+        return self.nearest_per_colour[color]
+
+    def nearest_manhattan_for_colour(self, color: int) -> DistanceTable:
+        """
+        Only use with inmatch, when the heuristic isn't precomputed!
+        """
+        return self.nearest_manhattan_per_colour[color]
+
+    def paths_for_agent(self, agent: Agent, optimal_path: OptimalPath) -> DistanceTable:
         """
         Only use with prematch!
         """
-        goal_location = optimal_path.goal_state.identifier.actual[agent.index]
+        goal_location = optimal_path.goal_state.identifier.actual[agent.index].location
         return self.per_goal[goal_location]
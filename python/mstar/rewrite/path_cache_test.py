@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+from mapfmclient import MarkedLocation
+
+from python.coord import Coord
+from python.mstar.rewrite.config import Config, MatchingStrategy
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.path_cache import BFS, PathCache, UNREACHABLE
+
+
+class TestNearestPerColour(unittest.TestCase):
+    def setUp(self):
+        grid = [
+            [0, 0, 0, 1, 0],
+            [0, 1, 0, 1, 0],
+            [0, 1, 0, 0, 0],
+            [0, 0, 0, 1, 1],
+        ]
+        self.grid = Grid(grid)
+        self.goals = [MarkedLocation(0, 4, 0), MarkedLocation(0, 0, 3), MarkedLocation(1, 2, 0), MarkedLocation(1, 4, 2)]
+        self.path_cache = PathCache(Config(matching_strategy=MatchingStrategy.Inmatch), self.grid, self.goals)
+
+    def goals_of(self, colour: int) -> list[Coord]:
+        return [Coord(goal.x, goal.y) for goal in self.goals if goal.color == colour]
+
+    def test_distance_to_closest_goal(self):
+        for colour in (0, 1):
+            expected = np.minimum.reduce([BFS(goal, self.grid).distances for goal in self.goals_of(colour)])
+            table = self.path_cache.nearest_goal_for_colour(colour)
+            self.assertEqual(list(table.distances), list(expected))
+
+            for cell, coord in enumerate(self.grid.cell_coords):
+                manhattan = min(goal.manhattan_distance(coord) for goal in self.goals_of(colour))
+                self.assertEqual(self.path_cache.nearest_manhattan_for_colour(colour)[cell], manhattan)
+
+    def test_next_cell_gets_closer(self):
+        for colour in (0, 1):
+            table = self.path_cache.nearest_goal_for_colour(colour)
+            for cell in range(self.grid.width * self.grid.height):
+                distance = table[cell]
+                if distance == UNREACHABLE:
+                    continue
+
+                next_cell = table.next_lookup[cell]
+                self.assertEqual(table[next_cell], max(distance - 1, 0))
+                self.assertIn(next_cell, self.grid.empty_move_cells(cell))
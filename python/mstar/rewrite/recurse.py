@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Optional, Union
 
 from python.mstar.rewrite.goal import Goal
 from python.mstar.rewrite.statecache import StateCache
@@ -9,11 +9,17 @@ from python.mstar.rewrite.state import State
 from python.mstar.rewrite.identifier import Identifier
 
 from python.mstar.rewrite.find_path_params import FindPathParams
+from python.mstar.rewrite.memory import OutOfMemory
 
 
-def recurse_mstar(start_state: State, goal: Goal, cache: StateCache, params: FindPathParams) -> Optional[dict[int, Agent]]:
+def recurse_mstar(start_state: State, goal: Goal, cache: StateCache, params: FindPathParams, time: int) -> Union[dict[int, Agent], OutOfMemory, None]:
+    """
+    The next positions of the agents of a sub search, None when they can't reach their
+    goals, or OutOfMemory when the sub search used more than cfg.max_memory_usage.
+    """
     from python.mstar.rewrite.find_path import find_path
 
+    start_state.time = time
 
     paths = find_path(
         start_state,
@@ -27,39 +33,46 @@ def recurse_mstar(start_state: State, goal: Goal, cache: StateCache, params: Fin
             state_cache=cache,
             heuristic=params.heuristic,
 
-            state_cache_cache=params.state_cache_cache
+            state_cache_cache=params.state_cache_cache,
+            path_cache=params.path_cache,
         )
     )
 
 
-    processed_start_state = cache.get(start_state.identifier)
+    if isinstance(paths, OutOfMemory):
+        return paths
+
+    if paths is None:
+        # the search ran out of states, so the agents of the group can't reach their goals
+        return None
+
+    cat = params.optimal_path.collision_avoidance_table
+    if cat is not None:
+        # other groups should avoid the path found for this group
+        for index, agent in enumerate(start_state.identifier.actual):
+            cat.set_path(agent.index, time, [state.identifier.actual[index].packed for state in paths.path])
 
-    optimal_policy: Optional[list[Agent]] = None
+    processed_start_state = cache.get(start_state.identifier)
 
     if goal.is_goal(processed_start_state):
         optimal_policy = start_state.identifier.actual
-    elif processed_start_state.child is None:
-        # there was no solution
-        assert paths is None
-
     else:
-        next_state: State = processed_start_state.child
+        # a path was found, so find_path set the child pointers from the start to the goal
+        next_state: Optional[State] = processed_start_state.child
         while next_state is not None and not next_state.is_standard:
             next_state = next_state.child
 
-        if next_state is not None:
-            optimal_policy = next_state.identifier.actual
+        assert next_state is not None, "the path of a sub search has a next standard state"
+        optimal_policy = next_state.identifier.actual
 
-    if optimal_policy is not None:
-        return {agent.index: agent for agent in optimal_policy}
-    else:
-        return None
+    return {agent.index: agent for agent in optimal_policy}
 
 
 def optimal_policy(disjoint_collision_group: frozenset[int],
                    agents: tuple[Agent, ...],
                    params: FindPathParams,
-                   ) -> Optional[dict[int, Agent]]:
+                   time: int,
+                   ) -> Union[dict[int, Agent], OutOfMemory, None]:
 
     associated_agents = tuple(agent for agent in agents if agent.index in disjoint_collision_group)
 
@@ -78,9 +91,13 @@ def optimal_policy(disjoint_collision_group: frozenset[int],
     if disjoint_collision_group in params.state_cache_cache:
         cache = params.state_cache_cache.get(disjoint_collision_group)
 
+        # the states of the cache still have the costs and pointers of an earlier sub search,
+        # which may have started somewhere else. find_path couldn't improve on those costs, and
+        # would run out of states. Only their collision sets carry over, see State.reset
+        cache.reset()
         sub_start_state = cache.get(sub_start_identifier)
 
-        generated_optimal_policy = recurse_mstar(sub_start_state, sub_goal, cache, params)
+        generated_optimal_policy = recurse_mstar(sub_start_state, sub_goal, cache, params, time)
     else:
         if len(disjoint_collision_group) > 1:
             # there more than one agent in this subgraph
@@ -89,11 +106,11 @@ def optimal_policy(disjoint_collision_group: frozenset[int],
 
             sub_start_state = cache.get(sub_start_identifier)
 
-            generated_optimal_policy = recurse_mstar(sub_start_state, sub_goal, cache, params)
+            generated_optimal_policy = recurse_mstar(sub_start_state, sub_goal, cache, params, time)
 
         elif len(disjoint_collision_group) == 1:
             generated_optimal_policy = {
-                associated_agents[0].index: params.optimal_path.best_move(associated_agents[0])[-1]
+                associated_agents[0].index: params.optimal_path.best_move(associated_agents[0], time)[-1]
             }
 
         else:
@@ -17,6 +17,11 @@ if TYPE_CHECKING:
 
 
 class State:
+    __slots__ = (
+        "identifier", "collision_set", "back_set", "parent", "child", "cost", "heuristic",
+        "time", "conflicts", "partial_delta", "generation", "shared_collision_sets",
+    )
+
     def __init__(self, cfg: Optional[Config], identifier: Identifier, collision_set: Optional[CollisionSet] = None):
         self.identifier: Identifier = identifier
 
@@ -39,21 +44,49 @@ class State:
         self.cost = inf
         self.heuristic = None
 
-        self.hash = None
+        # number of steps from the start of the search to the actual positions
+        self.time = 0
+        # number of conflicts with the collision avoidance table on the way here
+        self.conflicts = 0
 
-    def __hash__(self):
-        if self.hash is None:
-            self.hash = hash(self.identifier.partial)
+        # only with cfg.partial_expansion: Δf of the children generated when this state is
+        # expanded next, or None when the children with a Δf of at most 0 are next
+        self.partial_delta: Optional[int] = None
+
+        # generation of the StateCache this state was last used in, see StateCache.reset
+        self.generation = 0
 
-        return self.hash
+        # collision sets by position shared with the states of other searches, see StateCache
+        self.shared_collision_sets: Optional[dict[bytes, CollisionSet]] = None
 
-    def reset(self):
+    def __hash__(self):
+        return self.identifier.hash
+
+    def reset(self, keep_collision_set: bool):
+        """
+        Forget everything found about this state in an earlier search. The heuristic depends
+        on the goal, and costs, pointers and back sets on the start and the paths taken. The
+        collision set is only about which agents collide at these positions, so it may be kept.
+        """
         self.cost = inf
+        self.heuristic = None
+        self.parent = None
+        self.child = None
+        self.back_set = {}
+        self.time = 0
+        self.conflicts = 0
+        self.partial_delta = None
+
+        if not keep_collision_set:
+            self.collision_set = self.collision_set.__class__()
 
     def copy(self) -> State:
         s = State(None, self.identifier, self.collision_set)
         s.cost = self.cost
         s.heuristic = self.heuristic
+        s.time = self.time
+        s.conflicts = self.conflicts
+        s.partial_delta = self.partial_delta
         s.parent = self.parent
         s.back_set = self.back_set.copy()
         return s
@@ -64,7 +97,7 @@ class State:
 
     @property
     def is_standard(self) -> bool:
-        return self.identifier.partial == self.identifier.actual
+        return self.identifier.is_standard
 
     def merge(self, other_collision_set: set[int]):
         self.collision_set = self.collision_set.union(other_collision_set)
@@ -73,7 +106,7 @@ class State:
         return other_set.issubset(self.collision_set)
 
     def add_back_set(self, state: State):
-        self.back_set[state.identifier] = state
+        self.back_set[state.identifier.key] = state
 
     def get_back_set(self):
         return self.back_set.values()
@@ -93,7 +126,7 @@ class State:
         return Path(self.__backtrack_internal(None))
 
     def __eq__(self, other: State) -> bool:
-        return self.identifier == other.identifier
+        return self.identifier.key == other.identifier.key
 
     def __gt__(self, other: State) -> bool:
         return self.priority > other.priority
@@ -107,12 +140,27 @@ class State:
     def __le__(self, other: State) -> bool:
         return self.priority <= other.priority
 
-    def set_heuristic(self, heuristic: Heuristic):
-        self.heuristic = heuristic.heuristic(self)
+    def set_heuristic(self, heuristic: Heuristic, parent: Optional[State] = None):
+        """
+        Calculates the heuristic if it wasn't known yet. When given the parent
+        this state was generated from, only the agents which changed are evaluated.
+        """
+        if self.heuristic is not None:
+            return
+
+        if parent is not None and parent.heuristic is not None:
+            self.heuristic = heuristic.child_heuristic(parent, self)
+        else:
+            self.heuristic = heuristic.heuristic(self)
 
     def merge_collision_sets(self, other: CollisionSet):
         self.collision_set = self.collision_set.merge(other)
 
+        if self.shared_collision_sets is not None:
+            key = self.identifier.key
+            shared = self.shared_collision_sets.get(key)
+            self.shared_collision_sets[key] = self.collision_set if shared is None else shared.merge(self.collision_set)
+
     def __repr__(self):
         return f"cost: {self.cost}, heuristic: {self.heuristic}, identifier: {self.identifier}"
 
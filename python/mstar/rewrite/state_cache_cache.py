@@ -28,3 +28,6 @@ class StateCacheCache:
 
     def get(self, item: frozenset[int]) -> StateCache:
         return self.cache[item]
+
+    def num_states(self) -> int:
+        return sum(len(cache) for cache in self.cache.values())
@@ -1,27 +1,97 @@
+from python.mstar.rewrite.collisionset import CollisionSet
 from python.mstar.rewrite.identifier import Identifier
 from python.mstar.rewrite.state import State
 from python.mstar.rewrite.config import Config
-from typing import Type, TypeVar
+from typing import Optional, Type, TypeVar
 
 T = TypeVar("T", bound=State)
 
 
 class StateCache:
-    def __init__(self, cfg: Config, constructor: Type[T]):
-        self.cache = dict()
+    """
+    Maps the packed key of an identifier to its state.
+
+    State caches of searches running side by side can share `identifiers`, so states
+    with the same positions in different searches use the same identifier object.
+    They can also share `collision_sets`, the collision sets found so far by position.
+    New states start out with the collision set found for their positions by the other
+    searches, and their merged collision sets are added to it. Costs, pointers and back
+    sets stay with the state of every search.
+
+    States are reused between searches (for every matching). Resetting only bumps the
+    generation of the cache, states of an older generation are reset when they're
+    first looked up again. See State.reset for what carries over.
+    """
+
+    def __init__(
+            self,
+            cfg: Config,
+            constructor: Type[T],
+            identifiers: Optional[dict[bytes, Identifier]] = None,
+            collision_sets: Optional[dict[bytes, CollisionSet]] = None,
+    ):
+        self.cache: dict[bytes, T] = dict()
         self.constructor = constructor
         self.cfg = cfg
+        self.identifiers = identifiers
+        self.collision_sets = collision_sets if cfg.reuse_collision_sets else None
+
+        self.generation = 0
+
+        # number of lookups which found a state of the current generation
+        self.hits = 0
+        # number of states made
+        self.created = 0
+        # number of states of an earlier generation which were reset and reused
+        self.reused = 0
+        # number of reused states which kept a non-empty collision set
+        self.kept_collision_sets = 0
+        # number of states made with a non-empty collision set from collision_sets
+        self.shared_collision_sets = 0
 
     def get(self,
             identifier: Identifier,
             insert: bool = True
             ) -> T:
-        if identifier in self.cache:
-            return self.cache[identifier]
+        state = self.cache.get(identifier.key)
+        if state is not None:
+            if state.generation == self.generation:
+                self.hits += 1
+                return state
+
+            state.reset(self.cfg.reuse_collision_sets)
+            state.generation = self.generation
+            self.reused += 1
+            if len(state.collision_set) != 0:
+                self.kept_collision_sets += 1
+            return state
         elif insert:
-            self.cache[identifier] = self.constructor(self.cfg, identifier)
-            return self.cache[identifier]
+            if self.identifiers is not None:
+                identifier = self.identifiers.setdefault(identifier.key, identifier)
+            state = self.constructor(self.cfg, identifier)
+            state.generation = self.generation
+            if self.collision_sets is not None:
+                state.shared_collision_sets = self.collision_sets
+                collision_set = self.collision_sets.get(identifier.key)
+                if collision_set is not None:
+                    state.collision_set = collision_set
+                    self.shared_collision_sets += 1
+            self.cache[identifier.key] = state
+            self.created += 1
+            return state
+
+    def __len__(self) -> int:
+        return len(self.cache)
 
     def reset(self):
-        for i in self.cache.values():
-            i.reset()
+        self.generation += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "states": len(self.cache),
+            "hits": self.hits,
+            "created": self.created,
+            "reused": self.reused,
+            "kept collision sets": self.kept_collision_sets,
+            "shared collision sets": self.shared_collision_sets,
+        }
@@ -0,0 +1,60 @@
+import unittest
+from math import inf
+
+from python.coord import Coord
+from python.mstar.rewrite.collisionset import NormalCollisionSet
+from python.mstar.rewrite.config import Config
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.identifier import Identifier
+from python.mstar.rewrite.state import State
+from python.mstar.rewrite.statecache import StateCache
+
+
+GRID = Grid([[0] * 2 for _ in range(2)])
+
+
+def identifier(x: int) -> Identifier:
+    agents = (GRID.agents.get(Coord(x, 0), 0, 0), GRID.agents.get(Coord(x, 1), 0, 1))
+    return Identifier(agents, agents)
+
+
+class TestStateCache(unittest.TestCase):
+    def test_reset_on_lookup(self):
+        cache = StateCache(Config(), State)
+        state = cache.get(identifier(0))
+        parent = cache.get(identifier(1))
+
+        state.cost = 3
+        state.heuristic = 2
+        state.parent = parent
+        state.add_back_set(parent)
+        state.merge_collision_sets(NormalCollisionSet.from_colliding_indices([(0, 1)]))
+
+        cache.reset()
+        # nothing changes until the state is looked up again
+        self.assertEqual(state.cost, 3)
+
+        self.assertIs(cache.get(identifier(0)), state)
+        self.assertEqual(state.cost, inf)
+        self.assertIsNone(state.heuristic)
+        self.assertIsNone(state.parent)
+        self.assertEqual(len(state.get_back_set()), 0)
+        # collision sets carry over by default
+        self.assertEqual(len(state.collision_set), 2)
+
+        self.assertEqual(cache.stats()["reused"], 1)
+        self.assertEqual(cache.stats()["kept collision sets"], 1)
+
+        # only reset once per generation
+        state.cost = 5
+        cache.get(identifier(0))
+        self.assertEqual(state.cost, 5)
+
+    def test_drop_collision_sets(self):
+        cache = StateCache(Config(reuse_collision_sets=False), State)
+        state = cache.get(identifier(0))
+        state.merge_collision_sets(NormalCollisionSet.from_colliding_indices([(0, 1)]))
+
+        cache.reset()
+        cache.get(identifier(0))
+        self.assertEqual(len(state.collision_set), 0)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from math import inf
+from typing import Optional
+
+from python.mstar.rewrite.agent import Agent
+from python.mstar.rewrite.identifier import Identifier
+from python.mstar.rewrite.matchings import assignment
+from python.mstar.rewrite.path_cache import PathCache, DistanceTable, UNREACHABLE
+
+# number of team positions of which the assignment is kept before the cache is cleared
+ASSIGNMENT_CACHE_SIZE = 1 << 20
+
+
+class TeamAssignment:
+    """
+    Cheapest assignment of the agents of a team to the goals of its colour,
+    for one set of cells the agents are on.
+    """
+
+    __slots__ = ("cost", "goals")
+
+    def __init__(self, cost: int, goals: Optional[dict[int, DistanceTable]]):
+        self.cost = cost
+        # cell of an agent -> distances to the goal it's assigned to, or
+        # None when the team can't get to its goals
+        self.goals = goals
+
+
+class TeamAssignments:
+    """
+    With inmatch and cfg.assignment_heuristic: the cheapest assignment (see matchings.assignment)
+    of every team to its goals, using the distances in the path cache. Only depends on the set of
+    cells the team is on, so it's cached with the colour and sorted cells as key.
+    """
+
+    def __init__(self, path_cache: PathCache):
+        self.path_cache = path_cache
+
+        self.cache: dict[tuple[int, ...], TeamAssignment] = {}
+        # colour -> indices of the agents in the team, see teams
+        self.__teams: Optional[dict[int, list[int]]] = None
+
+    def teams(self, identifier: Identifier) -> dict[int, list[int]]:
+        if self.__teams is None:
+            self.__teams = {}
+            for agent in identifier.actual:
+                self.__teams.setdefault(agent.colour, []).append(agent.index)
+        return self.__teams
+
+    def with_teams(self, identifier: Identifier, collisions: list[tuple[int, int]]) -> list[tuple[int, int]]:
+        """
+        The collisions, plus the agents colliding with every other agent of their team.
+
+        Agents which aren't in a collision set follow the assignment of their team, so when
+        one agent of a team deviates from it the others have to be able to deviate too.
+        Otherwise, when a team has multiple cheapest assignments, the rest of the team keeps
+        following the one the colliding agent left and the optimal path is never found.
+        Teams then take the place of agents in M*: teams of different colours never share
+        goals, so they only interact by colliding.
+        """
+        teams = self.teams(identifier)
+        res = list(collisions)
+        for index in {i for pair in collisions for i in pair}:
+            res.extend((index, other) for other in teams[identifier.actual[index].colour] if other != index)
+        return res
+
+    def get(self, colour: int, cells: list[int]) -> TeamAssignment:
+        cells.sort()
+        key = (colour, *cells)
+
+        res = self.cache.get(key)
+        if res is None:
+            tables = self.path_cache.paths_for_colour(colour)
+            matrix: list[list[float]] = [
+                [inf if table.lookup[cell] == UNREACHABLE else table.lookup[cell] for table in tables]
+                for cell in cells
+            ]
+            # with more goals than agents, the rest of the goals go to agents which are already there
+            matrix.extend([0] * len(tables) for _ in range(len(tables) - len(cells)))
+
+            found = assignment(matrix)
+            if found is None:
+                # the team can't get to its goals, so any estimate is a lower bound
+                res = TeamAssignment(UNREACHABLE * len(cells), None)
+            else:
+                cost, columns = found
+                res = TeamAssignment(int(cost), {cell: tables[column] for cell, column in zip(cells, columns)})
+
+            if len(self.cache) >= ASSIGNMENT_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[key] = res
+
+        return res
+
+    def for_team(self, identifier: Identifier, colour: int) -> TeamAssignment:
+        """
+        Assignment of the team at the positions of a state. Agents which haven't been
+        assigned a move yet in a partial state are on their actual position.
+        """
+        cells = []
+        for index in self.teams(identifier)[colour]:
+            agent = identifier.partial[index]
+            if agent.is_uncalculated():
+                agent = identifier.actual[index]
+            cells.append(agent.cell)
+
+        return self.get(colour, cells)
+
+    def goal_of(self, identifier: Identifier, agent: Agent) -> Optional[DistanceTable]:
+        """
+        Distances to the goal agent is assigned to in a standard state, or None
+        when its team can't get to its goals.
+        """
+        goals = self.for_team(identifier, agent.colour).goals
+        if goals is None:
+            return None
+        return goals[agent.cell]
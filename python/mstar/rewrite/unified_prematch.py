@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import heapq
+from typing import Optional, Union
+
+from mapfmclient import Problem
+
+from python.mstar.rewrite.collisionset import CollisionSet
+from python.mstar.rewrite.config import Config
+from python.mstar.rewrite.find_path import Search
+from python.mstar.rewrite.find_path_params import FindPathParams
+from python.mstar.rewrite.grid import Grid
+from python.mstar.rewrite.identifier import Identifier
+from python.mstar.rewrite.matchings import ranked_matchings
+from python.mstar.rewrite.memory import MemoryStats, OutOfMemory
+from python.mstar.rewrite.path import Path
+from python.mstar.rewrite.path_cache import PathCache
+from python.mstar.rewrite.state import State
+from python.mstar.rewrite.statecache import StateCache
+
+
+def report_stats(cfg: Config, search: Search):
+    if search.cat is not None:
+        cfg.report_collision_avoidance(search.cat.stats())
+    cfg.report_state_cache(search.params.state_cache.stats())
+    if cfg.transient_od_states:
+        cfg.report_state_cache(search.stats())
+
+
+def memory_stats(searches: list[Optional[Search]], path_cache: PathCache) -> MemoryStats:
+    states = 0
+    open_list_entries = 0
+    num_agents = 0
+    for search in searches:
+        if search is not None:
+            stats = search.memory_stats()
+            states += stats.states
+            open_list_entries += stats.open_list_entries
+            num_agents = stats.num_agents
+
+    return MemoryStats(
+        num_agents=num_agents,
+        states=states,
+        open_list_entries=open_list_entries,
+        path_cache_bytes=path_cache.nbytes,
+    )
+
+
+def unified_prematch(
+        cfg: Config,
+        problem: Problem,
+        grid: Grid,
+        path_cache: PathCache,
+        avoid: list[list[int]],
+) -> Union[Path, OutOfMemory, None]:
+    """
+    One best-first search over all matchings: every matching has its own search, and the
+    one with the lowest priority on its open list is expanded next. The first goal found
+    is the best path over all matchings (within the suboptimality bound).
+
+    Matchings are started in order of their lower bound (see ranked_matchings), once the
+    lowest priority of the running searches reaches it. States of a matching which isn't
+    started yet have at least that priority, so it couldn't have been expanded before.
+
+    Collision sets only depend on the positions of the agents, so the matchings share
+    them (unless cfg.reuse_collision_sets is False): a matching started later begins with
+    the collisions found around the start by the matchings before it.
+    """
+    from python.mstar.rewrite import MatchingWithHeuristic
+
+    # shared by the state caches of all matchings
+    identifiers: dict[bytes, Identifier] = {}
+    collision_sets: dict[bytes, CollisionSet] = {}
+
+    # None once a search is done
+    searches: list[Optional[Search]] = []
+    # (lowest priority on the open list, index in searches) of every search which isn't done
+    frontier: list[tuple[int, int]] = []
+
+    ranked = ranked_matchings(problem.starts, problem.goals, path_cache)
+    next_matching = next(ranked, None)
+
+    while True:
+        while next_matching is not None and (len(frontier) == 0 or next_matching[0] <= frontier[0][0]):
+            lower_bound, goals = next_matching
+
+            state_cache = StateCache(cfg, State, identifiers, collision_sets)
+            start_state = state_cache.get(Identifier.from_marked_locations(problem.starts, grid.agents))
+            matching = MatchingWithHeuristic(cfg, goals, start_state, state_cache, path_cache, avoid, lower_bound)
+
+            search = Search(
+                start_state,
+
+                FindPathParams(
+                    cfg=cfg,
+                    goal=matching.goal,
+
+                    num_agents=len(problem.starts),
+
+                    grid=grid,
+                    optimal_path=matching.optimal_path,
+                    state_cache=state_cache,
+                    heuristic=matching.heuristic,
+                    state_cache_cache=matching.state_cache_cache,
+                    path_cache=path_cache,
+                ),
+                # the searches of all matchings share the memory limit
+                lambda: memory_stats(searches, path_cache),
+            )
+
+            heapq.heappush(frontier, (search.pq.peek_priority(), len(searches)))
+            searches.append(search)
+            next_matching = next(ranked, None)
+
+        if len(frontier) == 0:
+            return None
+
+        _, index = heapq.heappop(frontier)
+        search = searches[index]
+
+        found_path = search.step()
+        if found_path is not None:
+            for search in searches:
+                if search is not None:
+                    report_stats(cfg, search)
+            return found_path
+
+        if search.done:
+            report_stats(cfg, search)
+            searches[index] = None
+        else:
+            heapq.heappush(frontier, (search.pq.peek_priority(), index))
@@ -0,0 +1,58 @@
+import unittest
+
+from mapfmclient import Problem, MarkedLocation
+
+from python.mstar.rewrite import mstar
+from python.mstar.rewrite.config import Config, MatchingStrategy
+from python.mstar.rewrite.find_path_test import obstacles_problem
+
+
+class TestUnifiedPrematch(unittest.TestCase):
+    def test_same_cost_as_prematch(self):
+        p = obstacles_problem()
+
+        for kwargs in ({}, {"recursive": True}, {"collision_avoidance_table": True}):
+            expected = mstar(Config(matching_strategy=MatchingStrategy.Prematch, **kwargs), p)
+            found = mstar(Config(matching_strategy=MatchingStrategy.UnifiedPrematch, **kwargs), p)
+            self.assertEqual(found.cost, expected.cost)
+
+    def test_reuse_collision_sets(self):
+        # both agents have to pass through the gap in the middle, whichever goal they go to.
+        # The collision there is found by the first matching, the second starts out with it
+        grid = [
+            [0, 0, 0, 0, 0],
+            [1, 1, 0, 1, 1],
+            [0, 0, 0, 0, 0],
+        ]
+        p = Problem(
+            grid, 5, 3,
+            [MarkedLocation(0, 0, 0), MarkedLocation(0, 4, 0)],
+            [MarkedLocation(0, 0, 2), MarkedLocation(0, 4, 2)],
+        )
+
+        results = {}
+        for reuse in (True, False):
+            cfg = Config(
+                matching_strategy=MatchingStrategy.UnifiedPrematch,
+                reuse_collision_sets=reuse,
+                report_expansions=True,
+            )
+            path = mstar(cfg, p)
+            results[reuse] = (path.cost, len(cfg.expansions), cfg.state_cache_stats["shared collision sets"])
+
+        shared_cost, shared_expansions, shared = results[True]
+        separate_cost, separate_expansions, not_shared = results[False]
+
+        self.assertEqual(shared_cost, separate_cost)
+        self.assertGreater(shared, 0)
+        self.assertEqual(not_shared, 0)
+        self.assertLess(shared_expansions, separate_expansions)
+
+    def test_no_solution(self):
+        # the goal is walled off
+        grid = [
+            [0, 1, 0],
+        ]
+        p = Problem(grid, 3, 1, [MarkedLocation(0, 0, 0)], [MarkedLocation(0, 2, 0)])
+
+        self.assertIsNone(mstar(Config(matching_strategy=MatchingStrategy.UnifiedPrematch), p))
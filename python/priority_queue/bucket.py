@@ -0,0 +1,95 @@
+import heapq
+from typing import List, Tuple
+
+from python.priority_queue import T
+from python.priority_queue.lazy_deletion import LazyDeletionPriorityQueue
+
+
+class BucketPriorityQueue(LazyDeletionPriorityQueue):
+    """
+    Priority queue for small non-negative integer priorities and tie breaks.
+
+    Entries are stored in buckets indexed by priority, and every bucket is split into
+    LIFO stacks indexed by tie break. Pushing is O(1), and popping is amortised O(1)
+    as long as the lowest priority only moves up slowly, which is the case for A*
+    searches with a consistent heuristic. Stale entries are handled exactly like
+    in LazyDeletionPriorityQueue.
+
+    Entries with a priority of max_priority or more (like states with an unreachable goal,
+    see path_cache.UNREACHABLE) would need as many buckets, so they go to an overflow heap
+    instead. They're only popped once the buckets are empty.
+    """
+
+    def __init__(self, max_priority: int = (1 << 16) - 1):
+        super().__init__()
+
+        # buckets[priority][tie_break] is a stack of (counter, item)
+        self.buckets: List[List[List[Tuple[int, T]]]] = []
+        # lowest tie break in every bucket which may be non-empty
+        self.min_tie_break: List[int] = []
+
+        # lowest priority which may have a non-empty bucket
+        self.min_priority = 0
+        # number of entries in the buckets
+        self.entries = 0
+
+        self.max_priority = max_priority
+        # (priority, tie break, counter, item) of the entries with a priority of at least max_priority
+        self.overflow: List[Tuple[int, int, int, T]] = []
+
+    def _push(self, priority: int, tie_break: int, counter: int, item: T):
+        assert priority >= 0 and tie_break >= 0, "bucket queue needs non negative integer priorities"
+
+        if priority >= self.max_priority:
+            heapq.heappush(self.overflow, (priority, tie_break, counter, item))
+            return
+
+        while len(self.buckets) <= priority:
+            self.buckets.append([])
+            self.min_tie_break.append(0)
+
+        bucket = self.buckets[priority]
+        while len(bucket) <= tie_break:
+            bucket.append([])
+
+        bucket[tie_break].append((counter, item))
+
+        if priority < self.min_priority:
+            self.min_priority = priority
+        if tie_break < self.min_tie_break[priority]:
+            self.min_tie_break[priority] = tie_break
+
+        self.entries += 1
+
+    def _pop(self) -> Tuple[int, T]:
+        if self.entries == 0:
+            if len(self.overflow) == 0:
+                raise IndexError("pop from empty priority queue")
+
+            _, _, counter, item = heapq.heappop(self.overflow)
+            return counter, item
+
+        priority = self.min_priority
+        while True:
+            bucket = self.buckets[priority]
+            tie_break = self.min_tie_break[priority]
+
+            while tie_break < len(bucket) and not bucket[tie_break]:
+                tie_break += 1
+
+            if tie_break < len(bucket):
+                break
+
+            # this bucket is empty, release it
+            self.buckets[priority] = []
+            self.min_tie_break[priority] = 0
+            priority += 1
+
+        self.min_priority = priority
+        self.min_tie_break[priority] = tie_break
+        self.entries -= 1
+
+        return bucket[tie_break].pop()
+
+    def _num_entries(self) -> int:
+        return self.entries + len(self.overflow)
@@ -0,0 +1,72 @@
+import heapq
+from typing import Any, Callable, List, Tuple
+
+from python.priority_queue import T
+from python.priority_queue.lazy_deletion import LazyDeletionPriorityQueue
+
+
+class FocalPriorityQueue(LazyDeletionPriorityQueue):
+    """
+    Focal search open list. Items are dequeued from FOCAL: the items with a priority of at
+    most `weight` times the lowest priority in the queue, ordered by `focal_key(item)` and
+    then by priority and tie break. With an admissible heuristic, the first goal dequeued
+    costs at most `weight` times the optimal cost.
+
+    Entries with a priority above the bound wait in `pending` (ordered by priority) until
+    the bound goes up. Since the lowest priority can also go down, entries taken from FOCAL
+    above the current bound are moved back to `pending`.
+
+    An entry is kept in `open` and in either `pending` or FOCAL. Stale entries are dropped
+    from the top of `open` when looking for the lowest priority, and from `pending` when
+    they would move to FOCAL. Stale entries in FOCAL are returned by _pop as they are, and
+    skipped by dequeue.
+    """
+
+    def __init__(self, weight: float, focal_key: Callable[[T], Any]):
+        super().__init__()
+        assert weight >= 1, "focal weight must be at least 1"
+
+        self.weight = weight
+        self.focal_key = focal_key
+
+        # (priority, tie break, counter, item) of every entry, to find the lowest priority
+        self.open: List[Tuple[int, int, int, T]] = []
+        # (priority, tie break, counter, item) of entries not in focal
+        self.pending: List[Tuple[int, int, int, T]] = []
+        # (focal key, priority, tie break, counter, item)
+        self.focal: List[Tuple[Any, int, int, int, T]] = []
+
+        # weight times the lowest priority, when it was last looked at
+        self.bound = -1
+
+    def _push(self, priority: int, tie_break: int, counter: int, item: T):
+        heapq.heappush(self.open, (priority, tie_break, counter, item))
+
+        if priority <= self.bound:
+            heapq.heappush(self.focal, (self.focal_key(item), priority, tie_break, counter, item))
+        else:
+            heapq.heappush(self.pending, (priority, tie_break, counter, item))
+
+    def _pop(self) -> Tuple[int, T]:
+        open_list = self.open
+        while self.versions.get(open_list[0][3]) != open_list[0][2]:
+            heapq.heappop(open_list)
+        self.bound = self.weight * open_list[0][0]
+
+        pending = self.pending
+        while len(pending) != 0 and pending[0][0] <= self.bound:
+            priority, tie_break, counter, item = heapq.heappop(pending)
+            if self.versions.get(item) == counter:
+                heapq.heappush(self.focal, (self.focal_key(item), priority, tie_break, counter, item))
+
+        # the entry with the lowest priority is always in focal, so this terminates
+        while True:
+            _, priority, tie_break, counter, item = heapq.heappop(self.focal)
+            # stale entries are returned too, dequeue skips them
+            if priority <= self.bound or self.versions.get(item) != counter:
+                return counter, item
+
+            heapq.heappush(pending, (priority, tie_break, counter, item))
+
+    def _num_entries(self) -> int:
+        return len(self.open) + len(self.pending) + len(self.focal)
@@ -0,0 +1,110 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+from python.priority_queue import PriorityQueue, T
+
+# version stamp of an item which has been dequeued, and is not in the queue anymore
+CLOSED = -1
+
+
+class LazyDeletionPriorityQueue(PriorityQueue):
+    """
+    Heap of (priority, tie break, counter, item) tuples. Because the counter is unique,
+    heap comparisons never reach the item and stay in C.
+
+    Enqueueing an item which is already in the queue doesn't remove the old entry. Instead,
+    every item remembers the counter of its newest entry (its version stamp), and entries
+    with an older counter are skipped when they are popped.
+    """
+
+    def __init__(self):
+        self.pq: List[Tuple[int, int, int, T]] = []
+        self.versions: Dict[T, int] = {}
+        self.counter = 0
+
+        # number of items in the queue, not counting stale entries
+        self.live = 0
+
+        # number of stale entries skipped while dequeueing
+        self.stale_pops = 0
+        # number of times an item was enqueued again after being dequeued
+        self.reopens = 0
+
+    def __contains__(self, item: T) -> bool:
+        return self.versions.get(item, CLOSED) != CLOSED
+
+    def __len__(self) -> int:
+        return self.live
+
+    def enqueue(self, item: T, priority: Optional[int] = None, tie_break: int = 0):
+        if priority is None:
+            priority = item.priority
+
+        version = self.versions.get(item)
+        if version is None:
+            self.live += 1
+        elif version == CLOSED:
+            self.live += 1
+            self.reopens += 1
+
+        self.counter += 1
+        self.versions[item] = self.counter
+        self._push(priority, tie_break, self.counter, item)
+
+    def dequeue(self) -> T:
+        while True:
+            counter, item = self._pop()
+
+            # forgotten items have no version stamp, all their entries are stale
+            if self.versions.get(item) == counter:
+                self.versions[item] = CLOSED
+                self.live -= 1
+                return item
+
+            self.stale_pops += 1
+
+    def empty(self) -> bool:
+        return self.live == 0
+
+    def forget(self, item: T):
+        """
+        Drop the version stamp of a dequeued item, so the queue doesn't keep it alive
+        (apart from its stale entries, until they're popped). Enqueueing it again
+        afterwards doesn't count as a reopen.
+        """
+        assert self.versions[item] == CLOSED
+        del self.versions[item]
+
+    def peek_priority(self) -> int:
+        """
+        Priority of the item dequeue would return next. Only for this heap, subclasses
+        don't keep their entries in self.pq.
+        """
+        while True:
+            priority, _, counter, item = self.pq[0]
+            if self.versions.get(item) == counter:
+                return priority
+
+            heapq.heappop(self.pq)
+            self.stale_pops += 1
+
+    def _push(self, priority: int, tie_break: int, counter: int, item: T):
+        heapq.heappush(self.pq, (priority, tie_break, counter, item))
+
+    def _pop(self) -> Tuple[int, T]:
+        """
+        Pops the entry with the lowest priority and tie break, which may be stale
+        """
+        _, _, counter, item = heapq.heappop(self.pq)
+        return counter, item
+
+    def _num_entries(self) -> int:
+        return len(self.pq)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "open list size": self.live,
+            "entries": self._num_entries(),
+            "stale pops": self.stale_pops,
+            "reopens": self.reopens,
+        }
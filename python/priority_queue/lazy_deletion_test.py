@@ -0,0 +1,77 @@
+import unittest
+
+from python.priority_queue.bucket import BucketPriorityQueue
+from python.priority_queue.focal import FocalPriorityQueue
+from python.priority_queue.lazy_deletion import LazyDeletionPriorityQueue
+
+
+def queues():
+    return [
+        LazyDeletionPriorityQueue(),
+        BucketPriorityQueue(),
+        FocalPriorityQueue(1.5, lambda item: 0),
+    ]
+
+
+class TestLazyDeletion(unittest.TestCase):
+    def test_forget_with_stale_entries(self):
+        for pq in queues():
+            with self.subTest(queue=type(pq).__name__):
+                # "a" gets cheaper while it's queued, the entry with priority 5 becomes stale
+                pq.enqueue("a", 5)
+                pq.enqueue("b", 3)
+                pq.enqueue("a", 1)
+
+                self.assertEqual(pq.dequeue(), "a")
+                pq.forget("a")
+
+                pq.enqueue("c", 6)
+                self.assertEqual(pq.dequeue(), "b")
+                self.assertEqual(pq.dequeue(), "c")
+                self.assertTrue(pq.empty())
+                self.assertEqual(pq.stats()["reopens"], 0)
+
+    def test_forgotten_item_enqueued_again(self):
+        for pq in queues():
+            with self.subTest(queue=type(pq).__name__):
+                pq.enqueue("a", 4)
+                pq.enqueue("a", 2)
+                self.assertEqual(pq.dequeue(), "a")
+                pq.forget("a")
+
+                # the new entry is live, the one with priority 4 is still stale
+                pq.enqueue("a", 3)
+                pq.enqueue("b", 5)
+                self.assertEqual(pq.dequeue(), "a")
+                self.assertEqual(pq.dequeue(), "b")
+                self.assertTrue(pq.empty())
+
+    def test_large_priorities(self):
+        for pq in queues():
+            with self.subTest(queue=type(pq).__name__):
+                # the priority of a state with unreachable goals, summed over agents
+                pq.enqueue("far", 4 * 65535, 65535)
+                pq.enqueue("a", 3, 1)
+                pq.enqueue("b", 3, 0)
+
+                self.assertEqual(pq.dequeue(), "b")
+                self.assertEqual(pq.dequeue(), "a")
+                self.assertEqual(pq.dequeue(), "far")
+                self.assertTrue(pq.empty())
+
+    def test_unreachable_overflow(self):
+        pq = BucketPriorityQueue(65535)
+        pq.enqueue("far", 4 * 65535, 65535)
+        pq.enqueue("farther", 5 * 65535, 0)
+        pq.enqueue("a", 3, 1)
+
+        # only the buckets up to priority 3 are made
+        self.assertEqual(len(pq.buckets), 4)
+        self.assertEqual(pq.stats()["entries"], 3)
+
+        self.assertEqual(pq.dequeue(), "a")
+        pq.enqueue("b", 2, 0)
+        self.assertEqual(pq.dequeue(), "b")
+        self.assertEqual(pq.dequeue(), "far")
+        self.assertEqual(pq.dequeue(), "farther")
+        self.assertTrue(pq.empty())
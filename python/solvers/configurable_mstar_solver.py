@@ -4,7 +4,8 @@ from mapfmclient import Problem, Solution
 from python.algorithm import MapfAlgorithm
 from python.mstar.rewrite import Config
 from python.mstar.rewrite import mstar
-from python.mstar.rewrite.config import MatchingStrategy
+from python.mstar.rewrite.config import MatchingStrategy, OpenListStrategy
+from python.mstar.rewrite.memory import OutOfMemory
 
 from tqdm import tqdm
 
@@ -22,13 +23,16 @@ class ConfigurableMStar(MapfAlgorithm):
 
         # tqdm.write(f"{(time.time() - start) * 1000}ms")
 
+        if isinstance(solution, OutOfMemory):
+            raise MemoryError(repr(solution))
+
         if solution is None:
             tqdm.write("no solution")
             exit()
 
         paths = [[] for _ in solution.path[0].identifier.actual]
         for path in solution.path:
-            for index, coord in enumerate(path.identifier.actual):
+            for index, coord in enumerate(path.identifier.positions()):
                 paths[index].append((coord.x, coord.y))
 
         return Solution.from_paths(paths)
@@ -41,6 +45,8 @@ class ConfigurableMStar(MapfAlgorithm):
             name = "pruning prematch "
         elif self.cfg.matching_strategy == MatchingStrategy.SortedPruningPrematch:
             name = "sorted pruning prematch "
+        elif self.cfg.matching_strategy == MatchingStrategy.UnifiedPrematch:
+            name = "unified prematch "
         elif self.cfg.matching_strategy == MatchingStrategy.Inmatch:
             name = "inmatch "
         else:
@@ -53,8 +59,16 @@ class ConfigurableMStar(MapfAlgorithm):
 
         if self.cfg.operator_decomposition:
             name += " + OD"
+            if self.cfg.transient_od_states:
+                name += " (transient)"
+        if self.cfg.partial_expansion:
+            name += " + EPE"
+        if self.cfg.vectorized_expansion:
+            name += " + VE"
         if self.cfg.precompute_heuristic:
             name += " + PH"
+        if self.cfg.assignment_heuristic:
+            name += " + AH"
 
         if self.cfg.precompute_paths:
             name += " + PP"
@@ -62,4 +76,15 @@ class ConfigurableMStar(MapfAlgorithm):
         if self.cfg.collision_avoidance_table:
             name += " + CAT"
 
+        if self.cfg.independence_detection:
+            name += " + ID"
+
+        if self.cfg.open_list == OpenListStrategy.Buckets:
+            name += " + BQ"
+        elif self.cfg.open_list == OpenListStrategy.Focal:
+            name += f" + focal {self.cfg.focal_weight}"
+
+        if self.cfg.inflation != 1:
+            name += f" (inflation {self.cfg.inflation})"
+
         return name
\ No newline at end of file
@@ -1,11 +1,17 @@
+from typing import Optional
+
 from mapfmclient import Problem, Solution
 
 from python.algorithm import MapfAlgorithm
 from python.mstar.heuristic import Heuristics
 from python.mstar.prematch.mstar import PrematchMStar
+from python.mstar.rewrite.distance_cache import DistanceCache
 
 
 class MStar(MapfAlgorithm):
+    def __init__(self, distance_cache: Optional[DistanceCache] = None):
+        self.distance_cache = distance_cache
+
     def solve(self, problem: Problem) -> Solution:
         solution = PrematchMStar(
             problem.grid,
@@ -13,6 +19,7 @@ class MStar(MapfAlgorithm):
             problem.goals,
             problem.width,
             problem.height,
+            self.distance_cache,
         ).search_matchings()
 
         paths = [[] for _ in solution[0].identifier.actual]